@@ -25,7 +25,8 @@ export default function CategoryManager() {
     setError("");
     try {
       const token = localStorage.getItem("token");
-      const res = await fetch(`${API_URL}/categories/`, {
+      // Дерево целиком одним запросом, с числом товаров в каждом поддереве
+      const res = await fetch(`${API_URL}/categories/tree`, {
         headers: { Authorization: `Bearer ${token}` },
       });
 
@@ -33,8 +34,16 @@ export default function CategoryManager() {
         throw new Error("Не удалось загрузить категории");
       }
 
-      const data = await res.json();
-      setCategories(data);
+      // Разворачиваем в плоский список в порядке обхода, depth — для отступа
+      const flat = [];
+      const walk = (nodes, depth) => {
+        for (const node of nodes) {
+          flat.push({ ...node, depth });
+          walk(node.children, depth + 1);
+        }
+      };
+      walk(await res.json(), 0);
+      setCategories(flat);
     } catch (err) {
       console.error("Ошибка загрузки категорий:", err);
       setError(err.message || "Ошибка загрузки категорий");
@@ -69,11 +78,11 @@ export default function CategoryManager() {
 
       if (!res.ok) {
         const errorData = await res.json().catch(() => ({}));
-        throw new Error(errorData?.message || "Ошибка при добавлении категории");
+        throw new Error(errorData?.detail || errorData?.message || "Ошибка при добавлении категории");
       }
 
-      const newCat = await res.json();
-      setCategories((prev) => [...prev, newCat]);
+      await res.json();
+      fetchCategories();
       setNewCategoryName("");
       setNewParentId("");
     } catch (err) {
@@ -100,7 +109,8 @@ export default function CategoryManager() {
         throw new Error(errorData?.message || "Ошибка при удалении категории");
       }
 
-      setCategories((prev) => prev.filter((cat) => cat.id !== id));
+      // Дочерние категории поднимаются на уровень выше — перечитываем дерево
+      fetchCategories();
     } catch (err) {
       console.error(err);
       setError(err.message || "Ошибка при удалении категории");
@@ -138,14 +148,12 @@ export default function CategoryManager() {
 
       if (!res.ok) {
         const errorData = await res.json().catch(() => ({}));
-        throw new Error(errorData?.message || "Ошибка при редактировании категории");
+        throw new Error(errorData?.detail || errorData?.message || "Ошибка при редактировании категории");
       }
 
-      const updatedCat = await res.json();
-      // Обновляем в списке
-      setCategories((prev) =>
-        prev.map((c) => (c.id === updatedCat.id ? updatedCat : c))
-      );
+      await res.json();
+      // Категория могла переехать в другую ветку — перечитываем дерево
+      fetchCategories();
       closeEditModal();
     } catch (err) {
       console.error("Ошибка при редактировании категории:", err);
@@ -220,6 +228,7 @@ export default function CategoryManager() {
                 <th>ID</th>
                 <th>Название</th>
                 <th>Parent ID</th>
+                <th>Товаров</th>
                 <th>Действия</th>
               </tr>
             </thead>
@@ -227,8 +236,9 @@ export default function CategoryManager() {
               {categories.map((cat) => (
                 <tr key={cat.id}>
                   <td>{cat.id}</td>
-                  <td>{cat.name}</td>
+                  <td style={{ paddingLeft: `${1 + cat.depth * 1.5}rem` }}>{cat.name}</td>
                   <td>{cat.parent_id || ""}</td>
+                  <td>{cat.product_count}</td>
                   <td>
                     <button
                       onClick={() => startEdit(cat)}
@@ -248,7 +258,7 @@ export default function CategoryManager() {
 
               {categories.length === 0 && (
                 <tr>
-                  <td colSpan={4} className="text-center py-4">
+                  <td colSpan={5} className="text-center py-4">
                     Категории не найдены
                   </td>
                 </tr>
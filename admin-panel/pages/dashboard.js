@@ -3,6 +3,8 @@ import { useState, useEffect } from 'react';
 
 export default function Dashboard() {
   const [stats, setStats] = useState({});
+  // Продажи за последние 30 дней (/orders/analytics)
+  const [sales, setSales] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -13,16 +15,19 @@ export default function Dashboard() {
     setError('');
     try {
       const token = localStorage.getItem("token");
-      const res = await fetch(`${API_URL}/stats/summary`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
+      const headers = { 'Authorization': `Bearer ${token}` };
+      const since = new Date(Date.now() - 30 * 24 * 3600 * 1000).toISOString();
+      const [res, salesRes] = await Promise.all([
+        fetch(`${API_URL}/stats/summary`, { headers }),
+        fetch(`${API_URL}/orders/analytics?start=${encodeURIComponent(since)}`, { headers }),
+      ]);
 
-      if (!res.ok) {
+      if (!res.ok || !salesRes.ok) {
         throw new Error('Не удалось загрузить статистику');
       }
 
-      const data = await res.json();
-      setStats(data);
+      setStats(await res.json());
+      setSales(await salesRes.json());
     } catch (err) {
       console.error("Ошибка загрузки статистики:", err);
       setError(err.message || 'Ошибка загрузки статистики');
@@ -57,6 +62,70 @@ export default function Dashboard() {
         </div>
       )}
 
+      {!loading && !error && sales && (
+        <div className="mb-8">
+          <h2 className="text-xl font-semibold mb-3">Продажи за 30 дней</h2>
+          <div className="grid grid-cols-2 md:grid-cols-5 gap-4 mb-4">
+            {[
+              ['Выручка', sales.revenue],
+              ['Заказов', sales.orders],
+              ['Оплачено', sales.paid],
+              ['Ожидают', sales.pending],
+              ['Конверсия', sales.conversion === null ? '—' : `${(sales.conversion * 100).toFixed(1)}%`],
+            ].map(([label, value]) => (
+              <div key={label} className="bg-white shadow p-4 rounded">
+                <div className="text-gray-500 uppercase text-sm mb-1">{label}</div>
+                <div className="text-3xl font-bold">{value}</div>
+              </div>
+            ))}
+          </div>
+
+          <div className="grid grid-cols-1 lg:grid-cols-2 gap-4">
+            <table className="min-w-full bg-white border">
+              <thead>
+                <tr>
+                  <th className="px-4 py-2 border-b text-left">Товар</th>
+                  <th className="px-4 py-2 border-b">Заказов</th>
+                  <th className="px-4 py-2 border-b">Оплачено</th>
+                  <th className="px-4 py-2 border-b">Выручка</th>
+                </tr>
+              </thead>
+              <tbody>
+                {sales.by_product.slice(0, 10).map(item => (
+                  <tr key={item.product_id} className="text-center">
+                    <td className="px-4 py-2 border-b text-left">{item.title || `#${item.product_id}`}</td>
+                    <td className="px-4 py-2 border-b">{item.orders}</td>
+                    <td className="px-4 py-2 border-b">{item.paid}</td>
+                    <td className="px-4 py-2 border-b">{item.revenue}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+
+            <table className="min-w-full bg-white border">
+              <thead>
+                <tr>
+                  <th className="px-4 py-2 border-b text-left">День</th>
+                  <th className="px-4 py-2 border-b">Заказов</th>
+                  <th className="px-4 py-2 border-b">Оплачено</th>
+                  <th className="px-4 py-2 border-b">Выручка</th>
+                </tr>
+              </thead>
+              <tbody>
+                {sales.by_day.map(item => (
+                  <tr key={item.day} className="text-center">
+                    <td className="px-4 py-2 border-b text-left">{item.day}</td>
+                    <td className="px-4 py-2 border-b">{item.orders}</td>
+                    <td className="px-4 py-2 border-b">{item.paid}</td>
+                    <td className="px-4 py-2 border-b">{item.revenue}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        </div>
+      )}
+
       {!loading && !error && (
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
           {Object.entries(stats).map(([key, value]) => (
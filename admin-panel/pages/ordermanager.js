@@ -2,25 +2,46 @@ import { useEffect, useState } from 'react';
 
 export default function OrderManager() {
   const [orders, setOrders] = useState([]);
+  // Курсор следующей страницы (null — дальше ничего нет) и общее число заказов
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [success, setSuccess] = useState("");
+  // Выгрузка CSV за период
+  const [exportFrom, setExportFrom] = useState("");
+  const [exportTo, setExportTo] = useState("");
+  const [exporting, setExporting] = useState(false);
 
   const API_URL = process.env.NEXT_PUBLIC_API_URL;
 
+  // Загрузка одной страницы заказов (курсорная пагинация, сначала новые)
+  const fetchOrdersPage = async (cursor) => {
+    const token = localStorage.getItem("token");
+    const params = new URLSearchParams({ limit: "50" });
+    if (cursor) {
+      params.set("cursor", cursor);
+    } else {
+      params.set("with_total", "true");
+    }
+    const res = await fetch(`${API_URL}/orders/?${params}`, {
+      headers: { "Authorization": `Bearer ${token}` }
+    });
+    if (!res.ok) {
+      throw new Error("Не удалось загрузить заказы");
+    }
+    return res.json();
+  };
+
   const fetchOrders = async () => {
     setLoading(true);
     setError("");
     try {
-      const token = localStorage.getItem("token");
-      const res = await fetch(`${API_URL}/orders`, {
-        headers: { "Authorization": `Bearer ${token}` }
-      });
-      if (!res.ok) {
-        throw new Error("Не удалось загрузить заказы");
-      }
-      const data = await res.json();
-      setOrders(data);
+      const data = await fetchOrdersPage(null);
+      setOrders(data.items);
+      setNextCursor(data.next_cursor);
+      setTotal(data.total);
     } catch (err) {
       console.error("Ошибка загрузки заказов:", err);
       setError(err.message || "Ошибка загрузки заказов");
@@ -29,6 +50,23 @@ export default function OrderManager() {
     }
   };
 
+  // Подгрузка следующей страницы
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    setError("");
+    try {
+      const data = await fetchOrdersPage(nextCursor);
+      setOrders(prev => [...prev, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Ошибка загрузки заказов:", err);
+      setError(err.message || "Ошибка загрузки заказов");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchOrders();
   }, [API_URL]);
@@ -62,6 +100,35 @@ export default function OrderManager() {
     }
   };
 
+  // Скачать заказы за период (CSV); сервер отдаёт файл потоком
+  const exportOrders = async () => {
+    setExporting(true);
+    setError("");
+    try {
+      const token = localStorage.getItem("token");
+      const params = new URLSearchParams({ format: "csv" });
+      if (exportFrom) params.set("start", exportFrom);
+      if (exportTo) params.set("end", exportTo);
+      const res = await fetch(`${API_URL}/orders/export?${params}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (!res.ok) {
+        throw new Error("Не удалось выгрузить заказы");
+      }
+      const url = URL.createObjectURL(await res.blob());
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = `orders${exportFrom ? "_" + exportFrom : ""}${exportTo ? "_" + exportTo : ""}.csv`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      console.error("Ошибка выгрузки заказов:", err);
+      setError(err.message || "Ошибка выгрузки заказов");
+    } finally {
+      setExporting(false);
+    }
+  };
+
   return (
     <div className="container mx-auto p-4">
       <h1 className="text-2xl font-bold mb-4">Управление заказами</h1>
@@ -77,12 +144,35 @@ export default function OrderManager() {
         </div>
       )}
 
-      <button 
-        onClick={fetchOrders}
-        className="bg-blue-500 hover:bg-blue-600 text-white px-4 py-2 rounded mb-4"
-      >
-        Обновить
-      </button>
+      <div className="flex flex-wrap items-center gap-2 mb-4">
+        <button 
+          onClick={fetchOrders}
+          className="bg-blue-500 hover:bg-blue-600 text-white px-4 py-2 rounded"
+        >
+          Обновить
+        </button>
+        <span className="ml-4 text-sm text-gray-500">Выгрузка с</span>
+        <input
+          type="date"
+          className="border rounded px-2 py-1"
+          value={exportFrom}
+          onChange={(e) => setExportFrom(e.target.value)}
+        />
+        <span className="text-sm text-gray-500">по</span>
+        <input
+          type="date"
+          className="border rounded px-2 py-1"
+          value={exportTo}
+          onChange={(e) => setExportTo(e.target.value)}
+        />
+        <button
+          onClick={exportOrders}
+          disabled={exporting}
+          className="bg-gray-200 hover:bg-gray-300 px-4 py-2 rounded"
+        >
+          {exporting ? "Выгрузка..." : "Скачать CSV"}
+        </button>
+      </div>
 
       {loading ? (
         <div>Загрузка заказов...</div>
@@ -145,6 +235,25 @@ export default function OrderManager() {
           </tbody>
         </table>
       )}
+
+      {!loading && (
+        <div className="flex items-center gap-4 mt-4">
+          {total !== null && (
+            <span className="text-sm text-gray-500">
+              Показано {orders.length} из {total}
+            </span>
+          )}
+          {nextCursor && (
+            <button
+              onClick={loadMoreOrders}
+              disabled={loadingMore}
+              className="bg-gray-200 hover:bg-gray-300 px-4 py-2 rounded"
+            >
+              {loadingMore ? "Загрузка..." : "Загрузить ещё"}
+            </button>
+          )}
+        </div>
+      )}
     </div>
   );
 }
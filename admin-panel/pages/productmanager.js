@@ -3,6 +3,10 @@ import { useState, useEffect } from "react";
 
 export default function ProductManager() {
   const [products, setProducts] = useState([]);
+  // Курсор следующей страницы (null — дальше ничего нет) и общее число товаров
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [newProduct, setNewProduct] = useState({
     title: "",
     description: "",
@@ -18,20 +22,33 @@ export default function ProductManager() {
 
   const API_URL = process.env.NEXT_PUBLIC_API_URL;
 
-  // Функция для загрузки списка продуктов
+  // Загрузка одной страницы продуктов (курсорная пагинация)
+  const fetchProductsPage = async (cursor) => {
+    const token = localStorage.getItem("token");
+    const params = new URLSearchParams({ limit: "50" });
+    if (cursor) {
+      params.set("cursor", cursor);
+    } else {
+      params.set("with_total", "true");
+    }
+    const res = await fetch(`${API_URL}/products/?${params}`, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    if (!res.ok) {
+      throw new Error("Не удалось загрузить продукты");
+    }
+    return res.json();
+  };
+
+  // Функция для загрузки списка продуктов (первая страница)
   const fetchProducts = async () => {
     setLoading(true);
     setError("");
     try {
-      const token = localStorage.getItem("token");
-      const res = await fetch(`${API_URL}/products/`, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      if (!res.ok) {
-        throw new Error("Не удалось загрузить продукты");
-      }
-      const data = await res.json();
-      setProducts(data);
+      const data = await fetchProductsPage(null);
+      setProducts(data.items);
+      setNextCursor(data.next_cursor);
+      setTotal(data.total);
     } catch (err) {
       console.error("Ошибка загрузки продуктов:", err);
       setError(err.message || "Ошибка загрузки продуктов");
@@ -40,6 +57,23 @@ export default function ProductManager() {
     }
   };
 
+  // Подгрузка следующей страницы
+  const loadMoreProducts = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    setError("");
+    try {
+      const data = await fetchProductsPage(nextCursor);
+      setProducts((prev) => [...prev, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Ошибка загрузки продуктов:", err);
+      setError(err.message || "Ошибка загрузки продуктов");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchProducts();
   }, [API_URL]);
@@ -319,6 +353,22 @@ export default function ProductManager() {
               )}
             </tbody>
           </table>
+          <div className="flex items-center gap-4 mt-4">
+            {total !== null && (
+              <span className="text-sm text-gray-500">
+                Показано {products.length} из {total}
+              </span>
+            )}
+            {nextCursor && (
+              <button
+                onClick={loadMoreProducts}
+                disabled={loadingMore}
+                className="btn btn-sm"
+              >
+                {loadingMore ? "Загрузка..." : "Загрузить ещё"}
+              </button>
+            )}
+          </div>
         </div>
       )}
 
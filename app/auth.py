@@ -1,54 +1,188 @@
 # app/auth.py
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+import asyncio
 import os
+import time
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, database
 from  .database import get_db
+from .cache import TTLCache
 
 # Читаем SECRET_KEY из окружения, если нет - fallback для разработки
 SECRET_KEY = os.environ.get("SECRET_KEY", "super_secret_key_change_me")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Стоимость bcrypt. min=max=rounds: хэш с другой стоимостью считается устаревшим
+# и прозрачно перехэшируется при следующем успешном входе
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt — это ~250мс CPU на проверку. Гоняем его в отдельном пуле потоков
+# (bcrypt отпускает GIL), чтобы не блокировать event loop. Очередь ограничена:
+# при её переполнении логин сразу получает 503, а не копит задержку.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
+class PasswordHashPool:
+    """
+    Пул потоков для bcrypt с лимитом параллельности и метриками очереди.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # Семафор создаётся в первом run(): в Python < 3.10 примитивы asyncio
+        # привязываются к циклу событий при создании, а при импорте его ещё нет
+        self._slots = None
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    async def run(self, fn, *args):
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Слишком много одновременных входов, попробуйте позже",
+            )
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        enqueued_at = time.perf_counter()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        started_at = time.perf_counter()
+        self.wait_seconds += started_at - enqueued_at
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.running -= 1
+            self._slots.release()
+            self.completed += 1
+            self.run_seconds += time.perf_counter() - started_at
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "running": self.running,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 2) if self.completed else None,
+            "avg_run_ms": round(self.run_seconds / self.completed * 1000, 2) if self.completed else None,
+        }
+
+
+password_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
 
 # Вместо OAuth2PasswordBearer(tokenUrl=...) используем HTTPBearer
 auth_scheme = HTTPBearer()
 
+# Кэш админов, уже найденных по токену: ключ — (username,), значение — AdminPrincipal.
+# Короткий TTL ограничивает время жизни удалённого/изменённого в другом процессе админа
+# (например, через create_admin.py); изменения через ORM в этом процессе сбрасывают запись сразу.
+ADMIN_CACHE_TTL = float(os.environ.get("ADMIN_CACHE_TTL", "30"))
+ADMIN_CACHE_SIZE = int(os.environ.get("ADMIN_CACHE_SIZE", "10000"))
+admin_cache = TTLCache(max_bytes=ADMIN_CACHE_SIZE, ttl=ADMIN_CACHE_TTL)
+
+
+@dataclass(frozen=True)
+class AdminPrincipal:
+    """
+    Отвязанный от сессии снимок AdminUser — его безопасно держать в кэше между запросами.
+    Роуты используют только эти поля (в первую очередь client_id).
+    """
+    id: int
+    username: str
+    client_id: int
+    telegram_id: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: models.AdminUser) -> "AdminPrincipal":
+        return cls(id=user.id, username=user.username, client_id=user.client_id, telegram_id=user.telegram_id)
+
+
+@event.listens_for(models.AdminUser, "after_update")
+@event.listens_for(models.AdminUser, "after_delete")
+def _invalidate_cached_admin(mapper, connection, target):
+    admin_cache.delete((target.username,))
+    # При переименовании сбрасываем и старое имя
+    for old_username in inspect(target).attrs.username.history.deleted:
+        admin_cache.delete((old_username,))
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Проверка пароля в password_pool. Возвращает (совпал, новый_хэш_или_None):
+    новый хэш приходит, если сохранённый сделан с другой стоимостью bcrypt.
+    """
+    return await password_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run(pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_admin_user(db: Session, username: str):
-    return db.query(models.AdminUser).filter(models.AdminUser.username == username).first()
+async def get_admin_user(db: AsyncSession, username: str):
+    result = await db.execute(select(models.AdminUser).where(models.AdminUser.username == username))
+    return result.scalars().first()
 
-def authenticate_admin_user(db: Session, username: str, password: str):
-    user = get_admin_user(db, username)
+async def authenticate_admin_user(db: AsyncSession, username: str, password: str):
+    """
+    Проверяем логин/пароль (bcrypt — вне event loop). Если хэш сделан со старой
+    стоимостью, сохраняем пересчитанный.
+    """
+    user = await get_admin_user(db, username)
     if not user:
-        return False
-    if not verify_password(password, user.hashed_password):
-        return False
+        return None
+    verified, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not verified:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
-def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme),
-                      db: Session = Depends(get_db)):
+async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme),
+                            db: AsyncSession = Depends(get_db)) -> AdminPrincipal:
     """
     Читаем заголовок Authorization: Bearer <token>,
     Декодируем JWT, достаём username = payload["sub"].
+    Админа ищем сначала в admin_cache, в БД идём только при промахе.
     """
     token = credentials.credentials  # строка без 'Bearer '
     credentials_exception = HTTPException(
@@ -64,8 +198,19 @@ def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(auth_s
     except JWTError:
         raise credentials_exception
 
-    user = get_admin_user(db, username)
-    if not user:
+    # client_id уже лежит в токене: если он разошёлся с закэшированным админом,
+    # кэшу не верим и перечитываем из БД
+    token_client_id = payload.get("client_id")
+    principal = admin_cache.get((username,))
+    if principal is None or (token_client_id is not None and principal.client_id != token_client_id):
+        user = await get_admin_user(db, username)
+        if not user:
+            raise credentials_exception
+        principal = AdminPrincipal.from_user(user)
+        admin_cache.set((username,), principal, size=1)
+
+    if token_client_id is not None and principal.client_id != token_client_id:
+        # Админа перенесли к другому клиенту — старый токен больше не действует
         raise credentials_exception
 
-    return user
+    return principal
@@ -0,0 +1,113 @@
+# app/cache.py
+import os
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    In-process LRU-кэш с TTL и ограничением по памяти.
+
+    Значения — готовые к отдаче байты (JSON) или небольшие объекты, для которых
+    размер передаётся явно. Ключи — кортежи, первый элемент — группа (для каталога
+    это client_id): так можно сбросить всё, что относится к одному клиенту.
+
+    Кэш живёт в процессе: при нескольких воркерах uvicorn каждый держит свой,
+    а инвалидация доходит только до воркера, обработавшего запись — остальные
+    догонят по TTL.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()      # key -> (expires_at, size, value)
+        self._by_client = {}            # client_id -> set(keys)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, size: int = None):
+        if size is None:
+            size = len(value)
+        if size > self.max_bytes:
+            return  # не кэшируем то, что больше всего бюджета
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self._by_client.setdefault(key[0], set()).add(key)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key):
+        if key in self._data:
+            self._remove(key)
+            self.invalidations += 1
+
+    def invalidate_client(self, client_id: int):
+        for key in self._by_client.pop(client_id, ()):
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+                self.invalidations += 1
+
+    def clear(self):
+        self._data.clear()
+        self._by_client.clear()
+        self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+        keys = self._by_client.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_client[key[0]]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Кэш публичного каталога для ботов: категории/товары клиента в виде готового JSON.
+# Сбрасывается записью в products.py / categories.py, TTL — страховка для других воркеров.
+catalog_cache = TTLCache(
+    max_bytes=int(os.environ.get("CATALOG_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.environ.get("CATALOG_CACHE_TTL", "300")),
+)
+
+# Аналитика заказов (/api/orders/analytics): агрегаты по клиенту и периоду.
+# TTL короткий — оплаты приходят колбэками, сбрасывать кэш на каждый из них не будем.
+analytics_cache = TTLCache(
+    max_bytes=int(os.environ.get("ANALYTICS_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl=float(os.environ.get("ANALYTICS_CACHE_TTL", "30")),
+)
@@ -0,0 +1,134 @@
+# app/catalog.py
+from sqlalchemy import select, insert, update, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Версионирование каталога клиента для синхронизации ботов.
+#
+# clients.catalog_version растёт на каждой записи в товары/категории; изменённая
+# строка получает эту версию в колонку version, удалённая — запись в
+# catalog_tombstones. Тогда «изменения с версии N» — это строки с version > N
+# плюс tombstones с version > N.
+#
+# UPDATE ... RETURNING берёт блокировку строки клиента до конца транзакции, так что
+# записи одного клиента коммитятся строго в порядке своих версий и дельта ничего
+# не пропускает. Коммит — на вызывающей стороне.
+PRODUCT = "product"
+CATEGORY = "category"
+
+# Поля, которые уходят ботам (в снапшот и дельты)
+CATEGORY_FIELDS = ("id", "name", "parent_id")
+PRODUCT_FIELDS = ("id", "title", "description", "file_url", "file_size", "price", "category_id")
+
+
+async def bump_version(db: AsyncSession, client_id: int) -> int:
+    result = await db.execute(
+        update(models.Client)
+        .where(models.Client.id == client_id)
+        .values(catalog_version=models.Client.catalog_version + 1)
+        .returning(models.Client.catalog_version)
+    )
+    return result.scalar_one()
+
+
+async def touch(db: AsyncSession, client_id: int, obj):
+    """
+    Помечает созданный/изменённый товар или категорию новой версией каталога.
+    """
+    obj.version = await bump_version(db, client_id)
+
+
+async def tombstone(db: AsyncSession, client_id: int, kind: str, object_id: int) -> int:
+    """
+    Фиксирует удаление товара/категории для дельты. Возвращает версию удаления.
+    """
+    version = await bump_version(db, client_id)
+    db.add(models.CatalogTombstone(client_id=client_id, kind=kind, object_id=object_id, version=version))
+    return version
+
+
+async def tombstone_many(db: AsyncSession, client_id: int, kind: str, ids, version: int):
+    """
+    Tombstones для пачки удаляемых объектов одной версией: ids — список или
+    подзапрос id, вставка одним INSERT ... SELECT.
+    """
+    table = models.CatalogTombstone.__table__
+    model = models.Product if kind == PRODUCT else models.Category
+    await db.execute(
+        insert(table).from_select(
+            ["client_id", "kind", "object_id", "version"],
+            select(literal(client_id), literal(kind), model.id, literal(version))
+            .where(model.client_id == client_id, model.id.in_(ids)),
+        )
+    )
+
+
+async def get_version(db: AsyncSession, client_id: int) -> int:
+    result = await db.execute(select(models.Client.catalog_version).where(models.Client.id == client_id))
+    return result.scalar() or 0
+
+
+def _pack(rows, fields):
+    return [{name: getattr(row, name) for name in fields} for row in rows]
+
+
+async def snapshot(db: AsyncSession, client_id: int, version: int) -> dict:
+    """
+    Весь каталог клиента. version нужно прочитать ДО строк: тогда изменения,
+    попавшие между чтениями, придут ещё раз в следующей дельте (upsert
+    идемпотентен), а не потеряются.
+    """
+    categories = await db.execute(
+        select(models.Category).where(models.Category.client_id == client_id).order_by(models.Category.id)
+    )
+    products = await db.execute(
+        select(models.Product).where(models.Product.client_id == client_id).order_by(models.Product.id)
+    )
+    return {
+        "version": version,
+        "categories": _pack(categories.scalars().all(), CATEGORY_FIELDS),
+        "products": _pack(products.scalars().all(), PRODUCT_FIELDS),
+    }
+
+
+async def changes(db: AsyncSession, client_id: int, since: int, version: int) -> dict:
+    """
+    Изменения каталога после версии since: изменённые/созданные строки целиком
+    (в порядке версий) и id удалённых. Объект, удалённый и созданный заново
+    (SQLite может повторно выдать id), отдаётся только как изменённый.
+    """
+    categories = await db.execute(
+        select(models.Category)
+        .where(models.Category.client_id == client_id, models.Category.version > since)
+        .order_by(models.Category.version)
+    )
+    products = await db.execute(
+        select(models.Product)
+        .where(models.Product.client_id == client_id, models.Product.version > since)
+        .order_by(models.Product.version)
+    )
+    tombstones = await db.execute(
+        select(models.CatalogTombstone.kind, models.CatalogTombstone.object_id)
+        .where(models.CatalogTombstone.client_id == client_id, models.CatalogTombstone.version > since)
+    )
+    changed = {
+        CATEGORY: _pack(categories.scalars().all(), CATEGORY_FIELDS),
+        PRODUCT: _pack(products.scalars().all(), PRODUCT_FIELDS),
+    }
+    deleted = {CATEGORY: set(), PRODUCT: set()}
+    for kind, object_id in tombstones.all():
+        deleted[kind].add(object_id)
+    for kind, items in changed.items():
+        deleted[kind] -= {item["id"] for item in items}
+
+    return {
+        "version": version,
+        "since": since,
+        "categories": changed[CATEGORY],
+        "products": changed[PRODUCT],
+        "deleted": {
+            "categories": sorted(deleted[CATEGORY]),
+            "products": sorted(deleted[PRODUCT]),
+        },
+    }
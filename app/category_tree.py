@@ -0,0 +1,199 @@
+# app/category_tree.py
+from sqlalchemy import select, insert, update, delete, func, literal, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Дерево категорий хранится дважды: parent_id (список смежности) и closure-таблица
+# category_closure — все пары (предок, потомок, глубина), включая (id, id, 0).
+# По ней поддерево — один индексный запрос, без рекурсии. Таблица обновляется
+# инкрементально в той же транзакции, что и сама категория; коммит — на вызывающей стороне.
+closure = models.CategoryClosure.__table__
+
+# Разделитель пути категории при импорте/экспорте товаров: "Книги/Фантастика"
+PATH_SEPARATOR = "/"
+
+
+def subtree_ids(category_id: int):
+    """
+    Подзапрос: id категории и всех её потомков.
+    """
+    return select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)
+
+
+async def is_in_subtree(db: AsyncSession, category_id: int, root_id: int) -> bool:
+    result = await db.execute(
+        select(closure.c.depth).where(closure.c.ancestor_id == root_id, closure.c.descendant_id == category_id)
+    )
+    return result.first() is not None
+
+
+async def in_any_subtree(db: AsyncSession, category_id: int, root_ids: list) -> bool:
+    result = await db.execute(
+        select(closure.c.depth)
+        .where(closure.c.ancestor_id.in_(root_ids), closure.c.descendant_id == category_id)
+        .limit(1)
+    )
+    return result.first() is not None
+
+
+async def nested_ids(db: AsyncSession, category_ids: list) -> list:
+    """
+    Те из category_ids, что лежат в поддереве другой категории из того же списка.
+    """
+    result = await db.execute(
+        select(closure.c.descendant_id.distinct())
+        .where(closure.c.ancestor_id.in_(category_ids), closure.c.descendant_id.in_(category_ids),
+               closure.c.depth > 0)
+    )
+    return sorted(result.scalars().all())
+
+
+async def add_node(db: AsyncSession, category: models.Category):
+    """
+    Новая категория (id уже выдан flush'ем): связь с собой и со всеми предками родителя.
+    """
+    await db.execute(insert(closure).values(ancestor_id=category.id, descendant_id=category.id, depth=0))
+    if category.parent_id is not None:
+        await db.execute(
+            insert(closure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(closure.c.ancestor_id, literal(category.id), closure.c.depth + 1)
+                .where(closure.c.descendant_id == category.parent_id),
+            )
+        )
+
+
+async def move_node(db: AsyncSession, category_id: int, new_parent_id):
+    """
+    Перенос одного поддерева (см. move_subtrees). Проверка на цикл — на
+    вызывающей стороне (is_in_subtree).
+    """
+    await move_subtrees(db, [category_id], new_parent_id)
+
+
+async def move_subtrees(db: AsyncSession, root_ids: list, new_parent_id):
+    """
+    Перенос поддеревьев root_ids под new_parent_id двумя запросами на все корни:
+    рвём связи поддеревьев со старыми предками и связываем их с новыми (предки
+    нового родителя x поддеревья). Корни не должны лежать друг в друге (nested_ids),
+    новый родитель — в их поддеревьях (in_any_subtree): это проверяет вызывающая сторона.
+    """
+    moved = select(closure.c.descendant_id).where(closure.c.ancestor_id.in_(root_ids))
+    await db.execute(
+        delete(closure).where(closure.c.descendant_id.in_(moved), closure.c.ancestor_id.not_in(moved))
+    )
+    if new_parent_id is None:
+        return
+    above = closure.alias("above")
+    below = closure.alias("below")
+    await db.execute(
+        insert(closure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+            .where(above.c.descendant_id == new_parent_id, below.c.ancestor_id.in_(root_ids)),
+        )
+    )
+
+
+async def remove_node(db: AsyncSession, category: models.Category, version: int):
+    """
+    Удаление одной категории: её дочерние поднимаются на уровень выше (к родителю
+    удалённой), пути через неё укорачиваются на 1. version — версия каталога
+    удаления, ею помечаются перевешенные дочерние категории.
+    """
+    ancestors = select(closure.c.ancestor_id).where(closure.c.descendant_id == category.id, closure.c.depth > 0)
+    descendants = select(closure.c.descendant_id).where(closure.c.ancestor_id == category.id, closure.c.depth > 0)
+    await db.execute(
+        update(closure)
+        .where(closure.c.ancestor_id.in_(ancestors), closure.c.descendant_id.in_(descendants))
+        .values(depth=closure.c.depth - 1)
+    )
+    await db.execute(
+        delete(closure).where(or_(closure.c.ancestor_id == category.id, closure.c.descendant_id == category.id))
+    )
+    await db.execute(
+        update(models.Category)
+        .where(models.Category.parent_id == category.id)
+        .values(parent_id=category.parent_id, version=version)
+    )
+
+
+async def move_nodes(db: AsyncSession, client_id: int, category_ids: list, new_parent_id, version: int):
+    """
+    Перенос нескольких поддеревьев под одного родителя: closure — одним DELETE и
+    одним INSERT ... SELECT на все корни (move_subtrees), parent_id/version — одним UPDATE.
+    """
+    await move_subtrees(db, category_ids, new_parent_id)
+    await db.execute(
+        update(models.Category)
+        .where(models.Category.client_id == client_id, models.Category.id.in_(category_ids))
+        .values(parent_id=new_parent_id, version=version)
+    )
+
+
+async def remove_subtree(db: AsyncSession, category_ids: list):
+    """
+    Удаление поддерева целиком (category_ids — все его категории, см. subtree_ids):
+    сначала связи closure, которые ссылаются на категории, затем сами категории.
+    Товары поддерева удаляет вызывающая сторона.
+    """
+    await db.execute(delete(closure).where(closure.c.descendant_id.in_(category_ids)))
+    await db.execute(
+        delete(models.Category)
+        .where(models.Category.id.in_(category_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def tree_with_counts(db: AsyncSession, client_id: int) -> list:
+    """
+    Дерево категорий клиента с числом товаров в каждом поддереве — один запрос
+    (категория x её потомки из closure x товары), вложенность собирается в памяти.
+    """
+    result = await db.execute(
+        select(models.Category.id, models.Category.name, models.Category.parent_id,
+               func.count(models.Product.id))
+        .select_from(models.Category)
+        .join(closure, closure.c.ancestor_id == models.Category.id)
+        .outerjoin(models.Product, (models.Product.client_id == client_id)
+                   & (models.Product.category_id == closure.c.descendant_id))
+        .where(models.Category.client_id == client_id)
+        .group_by(models.Category.id, models.Category.name, models.Category.parent_id)
+        .order_by(models.Category.id)
+    )
+    nodes = {
+        cat_id: {"id": cat_id, "name": name, "parent_id": parent_id, "product_count": count, "children": []}
+        for cat_id, name, parent_id, count in result.all()
+    }
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        (parent["children"] if parent else roots).append(node)
+    return roots
+
+
+async def category_paths(db: AsyncSession, client_id: int) -> dict:
+    """
+    {id: "Родитель/Дочерняя/..."} для всех категорий клиента — для импорта/экспорта
+    товаров, где категория задаётся путём по именам.
+    """
+    result = await db.execute(
+        select(models.Category.id, models.Category.name, models.Category.parent_id)
+        .where(models.Category.client_id == client_id)
+    )
+    nodes = {cat_id: (name, parent_id) for cat_id, name, parent_id in result.all()}
+    paths = {}
+
+    def path(cat_id, seen=()):
+        if cat_id not in paths:
+            name, parent_id = nodes[cat_id]
+            if parent_id in nodes and parent_id not in seen:
+                paths[cat_id] = path(parent_id, seen + (cat_id,)) + PATH_SEPARATOR + name
+            else:
+                paths[cat_id] = name
+        return paths[cat_id]
+
+    for cat_id in nodes:
+        path(cat_id)
+    return paths
@@ -0,0 +1,45 @@
+# app/counters.py
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Счётчики строк на клиента (products, categories, orders), которые обновляются
+# в тех же транзакциях, что и сами записи. Дают total для списков без COUNT(*).
+PRODUCTS = "products"
+CATEGORIES = "categories"
+ORDERS = "orders"
+
+
+def upsert(db: AsyncSession, table):
+    """
+    INSERT ... ON CONFLICT для текущего диалекта (SQLite или PostgreSQL).
+    """
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def bump(db: AsyncSession, client_id: int, name: str, delta: int = 1):
+    """
+    Атомарно прибавляет delta к счётчику (создаёт его при первом обращении).
+    Коммит — на вызывающей стороне, вместе с основной записью.
+    """
+    table = models.ClientCounter.__table__
+    stmt = upsert(db, table).values(client_id=client_id, name=name, value=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.client_id, table.c.name],
+        set_={"value": table.c.value + stmt.excluded.value},
+    )
+    await db.execute(stmt)
+
+
+async def get(db: AsyncSession, client_id: int, name: str) -> int:
+    result = await db.execute(
+        select(models.ClientCounter.value).where(
+            models.ClientCounter.client_id == client_id,
+            models.ClientCounter.name == name,
+        )
+    )
+    return result.scalar() or 0
@@ -1,20 +1,120 @@
 # app/database.py
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# Здесь для демонстрации используется SQLite. В боевом решении можно перейти на PostgreSQL.
-SQLALCHEMY_DATABASE_URL = "sqlite:///./shop.db"
+# URL базы берём из окружения. По умолчанию — локальный SQLite (для разработки),
+# в бою — PostgreSQL, например: postgresql://user:pass@db:5432/shop
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./shop.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Настройки пула (для PostgreSQL и файлового SQLite)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))      # сек. ожидания свободного соединения
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))    # сек. жизни соединения
+DB_ECHO = os.environ.get("DB_ECHO", "0") == "1"
+
+# Тюнинг SQLite: WAL позволяет читать параллельно с записью,
+# busy_timeout заставляет писателя подождать, а не падать с "database is locked"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+}
+
+# Драйверы по умолчанию для каждого бэкенда
+_SYNC_DRIVERS = {"sqlite": "sqlite", "postgresql": "postgresql+psycopg2"}
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _with_driver(url: str, drivers: dict) -> URL:
+    """
+    Подставляет нужный драйвер в URL:
+    sqlite:///./shop.db -> sqlite+aiosqlite:///./shop.db,
+    postgres://... / postgresql://... -> postgresql+asyncpg://... и т.п.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgres":
+        backend = "postgresql"
+    if backend not in drivers:
+        raise ValueError(f"Неподдерживаемая база данных: {parsed.drivername}")
+    return parsed.set(drivername=drivers[backend])
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _engine_kwargs(url: URL) -> dict:
+    kwargs = {"echo": DB_ECHO}
+    if url.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"check_same_thread": False}
+        if _is_sqlite_memory(url):
+            # in-memory база живёт в одном соединении, пул не настраиваем
+            return kwargs
+    else:
+        # pre_ping отбрасывает соединения, которые PostgreSQL/pgbouncer закрыл по таймауту
+        kwargs["pool_pre_ping"] = True
+    kwargs.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return kwargs
+
+
+def _install_sqlite_pragmas(sync_engine, pragmas: dict):
+    """
+    PRAGMA выставляются на каждое новое соединение из пула.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, sqlite_pragmas: dict = None):
+    sync_url = _with_driver(url, _SYNC_DRIVERS)
+    sync_engine = create_engine(sync_url, **_engine_kwargs(sync_url))
+    if sync_url.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(sync_engine, SQLITE_PRAGMAS if sqlite_pragmas is None else sqlite_pragmas)
+    return sync_engine
+
+
+def make_async_engine(url: str = SQLALCHEMY_DATABASE_URL, sqlite_pragmas: dict = None):
+    async_url = _with_driver(url, _ASYNC_DRIVERS)
+    async_engine = create_async_engine(async_url, **_engine_kwargs(async_url))
+    if async_url.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(async_engine.sync_engine,
+                                SQLITE_PRAGMAS if sqlite_pragmas is None else sqlite_pragmas)
+    return async_engine
+
+
+# Синхронный движок остаётся для скриптов (operator.py, create_admin.py) и create_all
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Асинхронный движок — для всех роутов FastAPI, чтобы запросы к БД не блокировали event loop
+async_engine = make_async_engine()
+# expire_on_commit=False: после commit объекты остаются читаемыми без lazy-load (в async он запрещён)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    """
+    Общая зависимость для всех роутеров: одна AsyncSession на запрос.
+    """
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,68 @@
+# app/export.py
+import csv
+import io
+import json
+from datetime import datetime
+
+from fastapi.responses import StreamingResponse
+
+from .database import AsyncSessionLocal
+
+# Выгрузки (заказы, статистика) отдаются потоком: строки читаются из базы
+# порциями по EXPORT_CHUNK_SIZE (серверный курсор / yield_per) и сразу уходят
+# клиенту, так что память не зависит от размера выгрузки.
+EXPORT_CHUNK_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_chunk(columns, rows) -> str:
+    return "".join(
+        json.dumps({name: _plain(value) for name, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _csv_chunk(rows, header=None) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(header)
+    writer.writerows([_plain(value) for value in row] for row in rows)
+    return buf.getvalue()
+
+
+async def _stream(statement, columns, fmt, transform):
+    # Своя сессия: сессия из get_db может закрыться раньше, чем ответ дочитан
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(statement.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        if fmt == "csv":
+            yield _csv_chunk([], header=columns)
+        async for rows in result.partitions():
+            if transform is not None:
+                rows = [transform(row) for row in rows]
+            yield _ndjson_chunk(columns, rows) if fmt == "ndjson" else _csv_chunk(rows)
+
+
+def export_response(statement, fmt: str, filename: str, columns=None, transform=None) -> StreamingResponse:
+    """
+    Потоковый ответ NDJSON/CSV по SELECT из колонок (не ORM-объектов):
+    имена колонок становятся полями/заголовком. transform(row) -> tuple
+    переводит строку выборки в значения columns, если они не совпадают с SELECT.
+    """
+    if columns is None:
+        columns = [column.name for column in statement.selected_columns]
+    return StreamingResponse(
+        _stream(statement, columns, fmt, transform),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,202 @@
+# app/http_client.py
+import asyncio
+import logging
+import os
+import random
+import time
+
+import httpx
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Один на процесс httpx.AsyncClient для исходящих запросов к платёжным провайдерам:
+# keep-alive пул соединений, жёсткие таймауты, ограниченные повторы с джиттером и
+# circuit breaker на провайдера — если провайдер лежит, запросы к нему сразу
+# получают 503, а не занимают воркер на весь таймаут.
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.environ.get("HTTP_RETRY_BACKOFF", "0.2"))
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.environ.get("BREAKER_RESET", "30"))
+
+# Запрос заведомо не ушёл провайдеру — повтор безопасен и для POST
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """
+    closed -> (failures подряд ошибок) -> open: запросы отклоняются сразу ->
+    (через reset_timeout) -> half-open: пропускается один пробный запрос;
+    успех закрывает breaker, ошибка снова открывает. Пробный запрос, отменённый
+    до ответа, освобождает место для следующего (release).
+    """
+
+    def __init__(self, failures: int, reset_timeout: float):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.consecutive = 0
+        self.opened_at = None
+        self.probing = False
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def success(self):
+        self.consecutive = 0
+        self.opened_at = None
+        self.probing = False
+
+    def release(self):
+        # Запрос оборвался не по вине провайдера (отмена): о его состоянии ничего не узнали
+        self.probing = False
+
+    def failure(self):
+        self.consecutive += 1
+        if self.probing or self.consecutive >= self.failures:
+            if self.opened_at is None or self.probing:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.consecutive,
+                "trips": self.trips, "rejected": self.rejected}
+
+
+class HttpClient:
+    """
+    Общий клиент: request(provider, method, url, ...) -> httpx.Response.
+
+    Повторяются сетевые ошибки и ответы 429/502/503/504, не больше retries раз,
+    с экспоненциальной паузой и полным джиттером. Неидемпотентные запросы
+    (idempotent=False, например создание платежа) повторяются только если
+    соединение не установилось — иначе провайдер мог уже создать транзакцию.
+    Ошибка после всех попыток — HTTPException 502, открытый breaker — 503.
+    retry_statuses=() — любой HTTP-ответ возвращается как есть (повторы и
+    разбор 429/5xx на вызывающей стороне, см. app/notifications.py).
+
+    httpx.AsyncClient создаётся при первом запросе (внутри цикла событий);
+    transport можно подменить (httpx.MockTransport, ASGITransport мок-провайдера).
+    """
+
+    def __init__(self, connect_timeout: float = HTTP_CONNECT_TIMEOUT, read_timeout: float = HTTP_READ_TIMEOUT,
+                 max_connections: int = HTTP_MAX_CONNECTIONS, max_keepalive: int = HTTP_MAX_KEEPALIVE,
+                 retries: int = HTTP_RETRIES, backoff: float = HTTP_RETRY_BACKOFF,
+                 breaker_failures: int = BREAKER_FAILURES, breaker_reset: float = BREAKER_RESET,
+                 retry_statuses=_RETRY_STATUSES, transport: httpx.AsyncBaseTransport = None):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.retry_statuses = frozenset(retry_statuses)
+        self.transport = transport
+        self.breakers = {}
+        self._client = None
+        self.requests = 0
+        self.retried = 0
+        self.errors = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, transport=self.transport)
+        return self._client
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+        return self.breakers[provider]
+
+    async def request(self, provider: str, method: str, url: str, idempotent: bool = None,
+                      **kwargs) -> httpx.Response:
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            raise HTTPException(status_code=503, detail=f"Провайдер {provider} временно недоступен")
+        self.requests += 1
+        attempt = 0
+        # Любой выход из цикла должен закрыть попытку в breaker: иначе пробный запрос
+        # half-open, оборванный отменой или неожиданным исключением, навсегда оставил
+        # бы probing = True, и провайдер отвечал бы 503 до перезапуска процесса
+        try:
+            while True:
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                    if response.status_code not in self.retry_statuses:
+                        breaker.success()
+                        return response
+                    error = f"HTTP {response.status_code}"
+                    retryable = idempotent or response.status_code == 429
+                except httpx.HTTPError as e:
+                    error = f"{e.__class__.__name__}: {e}"
+                    retryable = idempotent or isinstance(e, _NOT_SENT)
+                if not retryable or attempt >= self.retries:
+                    break
+                attempt += 1
+                self.retried += 1
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except BaseException:
+            breaker.failure()
+            self.errors += 1
+            raise
+        breaker.failure()
+        self.errors += 1
+        logger.warning("Запрос к %s не удался после %d попыток: %s", provider, attempt + 1, error)
+        raise HTTPException(status_code=502, detail=f"Ошибка запроса к {provider}: {error}")
+
+    async def post(self, provider: str, url: str, **kwargs) -> httpx.Response:
+        return await self.request(provider, "POST", url, **kwargs)
+
+    async def get(self, provider: str, url: str, **kwargs) -> httpx.Response:
+        return await self.request(provider, "GET", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retried": self.retried,
+            "errors": self.errors,
+            "breakers": {provider: breaker.stats() for provider, breaker in self.breakers.items()},
+        }
+
+
+http_client = HttpClient()
+
+
+def get_http_client() -> HttpClient:
+    """
+    Зависимость FastAPI: в тестах подменяется через app.dependency_overrides.
+    """
+    return http_client
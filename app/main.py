@@ -1,12 +1,34 @@
 # app/main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
-from .routes import public_routes, auth_routes, categories, products, payment, stats, client_routes, orders
+from .routes import public_routes, auth_routes, categories, products, payment, stats, client_routes, orders, metrics
+
+from .http_client import http_client
+from .notifications import notification_sender, telegram_http
+from .order_sweeper import order_sweeper
+from .stats_buffer import stats_buffer
+
+# Схема БД создаётся/обновляется миграциями отдельным шагом: alembic upgrade head
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фоновые задачи процесса: запись буфера статистики, отправка уведомлений из outbox и
+    # уборка заказов; при остановке — дописываем хвост и закрываем пулы исходящих соединений
+    stats_buffer.start()
+    notification_sender.start()
+    order_sweeper.start()
+    yield
+    await order_sweeper.stop()
+    await notification_sender.stop()
+    await stats_buffer.stop()
+    await http_client.aclose()
+    await telegram_http.aclose()
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Магазин API")
+app = FastAPI(title="Магазин API", lifespan=lifespan)
 
 origins = [
     "http://localhost:3001",
@@ -30,4 +52,5 @@ app.include_router(categories.router, prefix="/api/categories", tags=["categorie
 app.include_router(products.router, prefix="/api/products", tags=["products"])
 app.include_router(payment.router, prefix="/api/payment", tags=["payment"])
 app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 
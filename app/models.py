@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Text
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Float, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -18,6 +18,8 @@ class Client(Base):
     # Новое поле для статуса
     bot_status = Column(String, default="stopped") 
     bot_secret = Column(String, nullable=True)
+    # Версия каталога: растёт на каждой записи в товары/категории (см. app/catalog.py)
+    catalog_version = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     # Отношения
     admin_users = relationship("AdminUser", back_populates="client")
@@ -45,11 +47,29 @@ class Category(Base):
     name = Column(String, nullable=False)
     parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")  # catalog_version последней правки
 
     client = relationship("Client", back_populates="categories")
     children = relationship("Category", backref="parent", remote_side=[id])
     products = relationship("Product", back_populates="category")
 
+    __table_args__ = (
+        Index("ix_categories_client_id_parent_id", "client_id", "parent_id"),
+        Index("ix_categories_client_id_id", "client_id", "id"),
+        Index("ix_categories_client_id_version", "client_id", "version"),
+    )
+
+# Closure-таблица дерева категорий: все пары (предок, потомок), см. app/category_tree.py
+class CategoryClosure(Base):
+    __tablename__ = "category_closure"
+    ancestor_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)  # 0 — сама категория, 1 — дочерняя, ...
+
+    __table_args__ = (
+        Index("ix_category_closure_descendant_id", "descendant_id", "depth"),
+    )
+
 # Товары
 class Product(Base):
     __tablename__ = "products"
@@ -61,41 +81,176 @@ class Product(Base):
     price = Column(Float, nullable=False, default=0)
     category_id = Column(Integer, ForeignKey("categories.id"))
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")  # catalog_version последней правки
+    external_key = Column(String, nullable=True)  # ключ товара во внешней системе клиента (импорт)
 
     orders = relationship("Order", back_populates="product")
     category = relationship("Category", back_populates="products")
     client = relationship("Client", back_populates="products")
 
+    __table_args__ = (
+        Index("ix_products_client_id_category_id", "client_id", "category_id"),
+        Index("ix_products_client_id_id", "client_id", "id"),
+        Index("ix_products_client_id_version", "client_id", "version"),
+        Index("ix_products_client_id_external_key", "client_id", "external_key", unique=True),
+    )
+
 # Настройки платежного провайдера (расширяется позже)
 class PaymentConfig(Base):
     __tablename__ = "payment_config"
     id = Column(Integer, primary_key=True, index=True)
-    provider_name = Column(String, unique=True, nullable=False)
+    provider_name = Column(String, nullable=False)
     api_key = Column(String, nullable=False)
     extra_config = Column(Text, nullable=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
 
     client = relationship("Client", back_populates="payment_configs")
 
+    __table_args__ = (
+        # Один конфиг каждого провайдера на клиента
+        Index("uq_payment_config_client_id_provider_name", "client_id", "provider_name", unique=True),
+        # Конфиги клиента в порядке id (payments.get_configs) — без сортировки
+        Index("ix_payment_config_client_id_id", "client_id", "id"),
+    )
+
 # Статистика (просмотры, покупки)
 class Stat(Base):
     __tablename__ = "stats"
     id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=True)  # NULL — события до разделения по клиентам
     event_type = Column(String, nullable=False)  # Например, "view", "purchase"
     description = Column(Text, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_stats_client_id_timestamp", "client_id", "timestamp"),
+    )
+
+# Предагрегированная статистика: число событий по (клиент, тип, час/сутки).
+# Обновляется при записи пачки событий (app/stats_buffer.py)
+class StatHourly(Base):
+    __tablename__ = "stats_hourly"
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    event_type = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # начало часа (UTC)
+    events = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_stats_hourly_client_id_bucket", "client_id", "bucket"),
+    )
+
+class StatDaily(Base):
+    __tablename__ = "stats_daily"
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    event_type = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # начало суток (UTC)
+    events = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_stats_daily_client_id_bucket", "client_id", "bucket"),
+    )
+
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True, index=True)
-    telegram_chat_id = Column(Integer, primary_key=True, index=True)
+    telegram_chat_id = Column(BigInteger, nullable=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    status = Column(String, default="pending")  # 🟡 pending, ✅ paid, ❌ failed
+    status = Column(String, default="pending")  # 🟡 pending, ✅ paid, ❌ failed, ⌛ expired
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Чем и на какую сумму выставлен счёт — для повторного использования ссылки
+    provider = Column(String, nullable=True)
+    amount = Column(Float, nullable=True)
+    payment_url = Column(String, nullable=True)
     
     client = relationship("Client", back_populates="orders")
     product = relationship("Product", back_populates="orders")
 
+    __table_args__ = (
+        # Ключ keyset-пагинации заказов: (created_at, id) внутри клиента
+        Index("ix_orders_client_id_created_at_id", "client_id", "created_at", "id"),
+        Index("ix_orders_client_id_status", "client_id", "status"),
+        # Покрывающий индекс для аналитики: агрегат по периоду (с выставленной суммой) без чтения самой таблицы
+        Index("ix_orders_client_id_created_at_product_id_status_amount",
+              "client_id", "created_at", "product_id", "status", "amount"),
+        # Уборка (app/order_sweeper.py): просроченные pending и старые завершённые заказы
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        # Повторная покупка того же товара из того же чата (create_payment)
+        Index("ix_orders_client_id_telegram_chat_id_product_id_status",
+              "client_id", "telegram_chat_id", "product_id", "status"),
+    )
 
+# Заказы, вынесенные из orders уборкой: завершённые (по умолчанию expired и failed)
+# старше ORDER_ARCHIVE_AFTER. id тот же, что был в orders: поздний колбэк об оплате
+# возвращает заказ обратно (app/order_sweeper.restore_archived).
+class OrderArchive(Base):
+    __tablename__ = "orders_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    telegram_chat_id = Column(BigInteger, nullable=True)
+    client_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=True)
+    provider = Column(String, nullable=True)
+    amount = Column(Float, nullable=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_orders_archive_client_id_created_at", "client_id", "created_at"),
+    )
+
+# Счётчики строк на клиента (total для списков без COUNT(*)), см. app/counters.py
+class ClientCounter(Base):
+    __tablename__ = "client_counters"
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    name = Column(String, primary_key=True)  # "products", "categories", "orders"
+    value = Column(Integer, nullable=False, default=0)
+
+# Удалённые товары/категории — для выдачи удалений в /api/public/catalog/changes/
+class CatalogTombstone(Base):
+    __tablename__ = "catalog_tombstones"
+    id = Column(Integer, primary_key=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    kind = Column(String, nullable=False)  # "product" / "category"
+    object_id = Column(Integer, nullable=False)
+    version = Column(BigInteger, nullable=False)  # catalog_version, на которой объект удалён
+
+    __table_args__ = (
+        Index("ix_catalog_tombstones_client_id_version", "client_id", "version"),
+    )
+
+# Уже обработанные колбэки платёжных провайдеров: повтор того же (провайдер,
+# транзакция, статус) отвечает сразу, без проверки подписи и записи в заказ
+class ProcessedCallback(Base):
+    __tablename__ = "processed_callbacks"
+    id = Column(Integer, primary_key=True)
+    provider = Column(String, nullable=False)
+    txn_id = Column(String, nullable=False)  # id транзакции у провайдера (у Robokassa — InvId)
+    status = Column(String, nullable=False)  # статус заказа, который принёс колбэк
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("uq_processed_callbacks_provider_txn_id_status", "provider", "txn_id", "status", unique=True),
+    )
+
+# Исходящие уведомления в Telegram (outbox): строка пишется в той же транзакции,
+# что и смена статуса заказа, отправляет фоновая задача (app/notifications.py)
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    id = Column(Integer, primary_key=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)  # чьим ботом отправлять
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    status = Column(String, nullable=False, default="pending")  # pending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0)  # неудачные попытки (429 не считается)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        # Выборка отправителя: pending, у которых подошло время, по порядку времени
+        Index("ix_notification_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,315 @@
+# app/notifications.py
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .database import AsyncSessionLocal
+from .http_client import HttpClient
+
+logger = logging.getLogger(__name__)
+
+# Уведомления покупателям в Telegram через outbox: enqueue() пишет строку в
+# notification_outbox в транзакции смены статуса заказа, фоновая задача отправляет
+# их ботом клиента (Client.telegram_token). Колбэк провайдера не ждёт Telegram,
+# а уведомление не теряется: строка живёт в БД до успешной отправки.
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+NOTIFY_BATCH_SIZE = int(os.environ.get("NOTIFY_BATCH_SIZE", "100"))
+NOTIFY_POLL_INTERVAL = float(os.environ.get("NOTIFY_POLL_INTERVAL", "1.0"))
+# Лимиты Telegram: около 30 сообщений в секунду на бота и 1 в секунду в один чат (с запасом)
+NOTIFY_BOT_RATE = float(os.environ.get("NOTIFY_BOT_RATE", "25"))
+NOTIFY_CHAT_INTERVAL = float(os.environ.get("NOTIFY_CHAT_INTERVAL", "1.1"))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", "8"))
+NOTIFY_RETRY_BACKOFF = float(os.environ.get("NOTIFY_RETRY_BACKOFF", "5"))
+NOTIFY_MAX_BACKOFF = 3600.0
+# Взятая в отправку строка недоступна другим воркерам lease секунд; если воркер
+# упал, не отправив, её подберёт следующий (доставка "хотя бы один раз")
+NOTIFY_LEASE = float(os.environ.get("NOTIFY_LEASE", "60"))
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+# Пул соединений к api.telegram.org отдельно от платёжных провайдеров. Повторов
+# внутри клиента нет: 429 (retry_after) и 5xx разбирает отправитель и
+# переносит строку outbox, не занимая воркер паузой. Breaker — свой у каждого
+# клиента ("telegram:<client_id>"): сетевые ошибки одного бота не должны
+# останавливать уведомления остальных.
+telegram_http = HttpClient(retries=0, retry_statuses=())
+
+
+def enqueue(db: AsyncSession, client_id: int, chat_id: int, text: str, order_id: int = None):
+    """
+    Уведомление в outbox в текущей транзакции; коммит — на вызывающей стороне,
+    после него notification_sender.wake(), чтобы не ждать опроса.
+    """
+    db.add(models.NotificationOutbox(
+        client_id=client_id, chat_id=chat_id, text=text, order_id=order_id,
+        status=PENDING, next_attempt_at=datetime.utcnow(),
+    ))
+
+
+class RateLimiter:
+    """
+    Слоты отправки по time.monotonic(): у бота (клиента) не чаще bot_rate
+    сообщений в секунду, в один чат — не чаще раза в chat_interval, после 429 —
+    пауза бота на retry_after. Лимиты считаются в процессе: при нескольких
+    воркерах uvicorn бот может получить 429, тогда сработает пауза.
+    """
+
+    def __init__(self, bot_rate: float, chat_interval: float):
+        self.bot_interval = 1 / bot_rate
+        self.chat_interval = chat_interval
+        self._bot_next = {}   # client_id -> ближайший свободный слот
+        self._chat_next = {}  # (client_id, chat_id) -> ближайший свободный слот
+        self._paused = {}     # client_id -> конец паузы после 429
+
+    def slot(self, client_id: int, chat_id: int, now: float) -> float:
+        return max(now, self._bot_next.get(client_id, 0.0), self._chat_next.get((client_id, chat_id), 0.0))
+
+    def take(self, client_id: int, chat_id: int, slot: float):
+        self._bot_next[client_id] = slot + self.bot_interval
+        self._chat_next[(client_id, chat_id)] = slot + self.chat_interval
+
+    def pause(self, client_id: int, seconds: float, now: float):
+        until = now + seconds
+        self._paused[client_id] = max(self._paused.get(client_id, 0.0), until)
+        self._bot_next[client_id] = max(self._bot_next.get(client_id, 0.0), until)
+
+    def paused_for(self, client_id: int, now: float) -> float:
+        return max(0.0, self._paused.get(client_id, 0.0) - now)
+
+    def prune(self, now: float):
+        for slots in (self._bot_next, self._chat_next, self._paused):
+            for key in [key for key, until in slots.items() if until <= now]:
+                del slots[key]
+
+
+class NotificationSender:
+    """
+    Фоновая отправка outbox: раз в poll_interval секунд (или сразу после wake())
+    берёт до batch_size готовых строк, раскладывает их по слотам RateLimiter и
+    отправляет параллельно; строки, чей слот дальше poll_interval, переносятся
+    на время слота. Итог пачки пишется одним bulk UPDATE:
+    - 200 — sent;
+    - 429 — бот на паузе retry_after, строка переносится (попыткой не считается);
+    - 5xx, сеть, открытый breaker — повтор с экспоненциальной паузой, после
+      max_attempts — failed;
+    - прочие 4xx (чат не найден, бот заблокирован, неверный токен) — сразу failed.
+    """
+
+    def __init__(self, http: HttpClient, batch_size: int = NOTIFY_BATCH_SIZE,
+                 poll_interval: float = NOTIFY_POLL_INTERVAL, bot_rate: float = NOTIFY_BOT_RATE,
+                 chat_interval: float = NOTIFY_CHAT_INTERVAL, max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+                 retry_backoff: float = NOTIFY_RETRY_BACKOFF, lease: float = NOTIFY_LEASE,
+                 api_url: str = TELEGRAM_API_URL):
+        self.http = http
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease = lease
+        self.api_url = api_url
+        self.limiter = RateLimiter(bot_rate, chat_interval)
+        self._wake = None  # asyncio.Event создаётся в start(), уже внутри цикла событий
+        self._task = None
+        self._stopping = False
+        self._next_slot = None  # ближайший слот отложенной строки (monotonic): проснуться к нему
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.throttled = 0
+        self.deferred = 0
+        self.rounds = 0
+        self.errors = 0
+        self.last_round_ms = None
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Дожидается текущей пачки; неотправленное остаётся в outbox.
+        """
+        self._stopping = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            timeout = self.poll_interval
+            if self._next_slot is not None:
+                timeout = min(timeout, max(0.0, self._next_slot - time.monotonic()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            self._next_slot = None
+            try:
+                # Пока что-то берётся — следующая пачка сразу, не дожидаясь опроса
+                while not self._stopping and await self.send_due():
+                    pass
+            except Exception:
+                self.errors += 1
+                logger.exception("Ошибка отправки уведомлений из outbox")
+
+    async def _claim(self, db: AsyncSession, now: datetime) -> list:
+        """
+        Берёт готовые строки: сдвигает их next_attempt_at на lease вперёд.
+        Условие повторяется в UPDATE, поэтому параллельный воркер ту же строку не получит.
+        """
+        table = models.NotificationOutbox
+        due = (
+            select(table.id)
+            .where(table.status == PENDING, table.next_attempt_at <= now)
+            .order_by(table.next_attempt_at)
+            .limit(self.batch_size)
+        )
+        result = await db.execute(
+            update(table)
+            .where(table.id.in_(due), table.status == PENDING, table.next_attempt_at <= now)
+            .values(next_attempt_at=now + timedelta(seconds=self.lease))
+            .returning(table.id)
+            .execution_options(synchronize_session=False)
+        )
+        ids = result.scalars().all()
+        await db.commit()
+        if not ids:
+            return []
+        result = await db.execute(
+            select(table.id, table.client_id, table.chat_id, table.text, table.attempts,
+                   models.Client.telegram_token)
+            .join(models.Client, models.Client.id == table.client_id)
+            .where(table.id.in_(ids))
+            .order_by(table.id)
+        )
+        return result.all()
+
+    async def send_due(self) -> int:
+        """
+        Одна пачка: взять, отправить, записать итог. Возвращает число взятых строк.
+        """
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            rows = await self._claim(db, datetime.utcnow())
+            if not rows:
+                return 0
+            now = time.monotonic()
+            self.limiter.prune(now)
+            outcomes = {}
+            sends = []
+            # Сначала по первому сообщению в каждый чат, потом вторые и т.д.: очередь в
+            # один чат (1 в секунду) не должна отодвигать слоты бота для остальных
+            position = Counter()
+            ranked = []
+            for row in rows:
+                position[row.client_id, row.chat_id] += 1
+                ranked.append((position[row.client_id, row.chat_id], row.id, row))
+            for _, _, row in sorted(ranked):
+                if not row.telegram_token:
+                    outcomes[row.id] = ("rejected", "У клиента не задан telegram_token")
+                    continue
+                slot = self.limiter.slot(row.client_id, row.chat_id, now)
+                if slot - now > self.poll_interval:
+                    outcomes[row.id] = ("later", slot - now)
+                    self._next_slot = slot if self._next_slot is None else min(self._next_slot, slot)
+                    continue
+                self.limiter.take(row.client_id, row.chat_id, slot)
+                sends.append((row, slot - now))
+            results = await asyncio.gather(*[self._deliver(row, delay) for row, delay in sends])
+            for (row, _), outcome in zip(sends, results):
+                outcomes[row.id] = outcome
+            await self._save(db, rows, outcomes)
+        self.rounds += 1
+        self.last_round_ms = round((time.perf_counter() - started) * 1000, 2)
+        return len(rows)
+
+    async def _deliver(self, row, delay: float) -> tuple:
+        if delay:
+            await asyncio.sleep(delay)
+        paused = self.limiter.paused_for(row.client_id, time.monotonic())
+        if paused:
+            return "later", paused  # бот получил 429, пока ждали слот
+        url = f"{self.api_url}/bot{row.telegram_token}/sendMessage"
+        try:
+            resp = await self.http.post(f"telegram:{row.client_id}", url, json={"chat_id": row.chat_id, "text": row.text})
+        except HTTPException as e:
+            return "error", str(e.detail)
+        if resp.status_code == 200:
+            return "sent", None
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {}
+        if not isinstance(body, dict):
+            body = {}
+        if resp.status_code == 429:
+            retry_after = float((body.get("parameters") or {}).get("retry_after") or 1)
+            self.limiter.pause(row.client_id, retry_after, time.monotonic())
+            self.throttled += 1
+            return "later", retry_after
+        error = body.get("description") or f"HTTP {resp.status_code}"
+        if resp.status_code >= 500:
+            return "error", error
+        return "rejected", error
+
+    async def _save(self, db: AsyncSession, rows: list, outcomes: dict):
+        now = datetime.utcnow()
+        values = []
+        for row in rows:
+            kind, detail = outcomes[row.id]
+            item = {"id": row.id, "status": PENDING, "attempts": row.attempts, "next_attempt_at": now,
+                    "last_error": None, "sent_at": None}
+            if kind == "sent":
+                item.update(status=SENT, sent_at=now)
+                self.sent += 1
+            elif kind == "later":
+                item["next_attempt_at"] = now + timedelta(seconds=detail)
+                self.deferred += 1
+            else:
+                item.update(attempts=row.attempts + 1, last_error=detail[:500])
+                if kind == "rejected" or item["attempts"] >= self.max_attempts:
+                    item["status"] = FAILED
+                    self.failed += 1
+                    logger.warning("Уведомление %s не отправлено: %s", row.id, detail)
+                else:
+                    pause = min(NOTIFY_MAX_BACKOFF, self.retry_backoff * 2 ** row.attempts)
+                    item["next_attempt_at"] = now + timedelta(seconds=random.uniform(pause / 2, pause))
+                    self.retried += 1
+            values.append(item)
+        await db.execute(update(models.NotificationOutbox), values)
+        await db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "poll_interval": self.poll_interval,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "throttled": self.throttled,
+            "deferred": self.deferred,
+            "rounds": self.rounds,
+            "errors": self.errors,
+            "last_round_ms": self.last_round_ms,
+        }
+
+
+notification_sender = NotificationSender(telegram_http)
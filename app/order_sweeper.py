@@ -0,0 +1,237 @@
+# app/order_sweeper.py
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, counters
+from .cache import analytics_cache
+from .database import AsyncSessionLocal
+from .payments import PENDING, FAILED, EXPIRED
+
+logger = logging.getLogger(__name__)
+
+# Уборка заказов: create_payment создаёт pending-заказ на каждое нажатие "Купить",
+# большая часть так и не оплачивается. Раз в ORDER_SWEEP_INTERVAL секунд фоновая
+# задача помечает pending старше ORDER_PENDING_TTL как expired и переносит
+# завершённые заказы (ORDER_ARCHIVE_STATUSES) старше ORDER_ARCHIVE_AFTER в
+# orders_archive (поздний колбэк провайдера возвращает заказ обратно —
+# restore_archived). Всё — пачками по ORDER_SWEEP_BATCH строк, коммит на пачку, чтобы
+# блокировки записи были короткими и не мешали колбэкам и покупкам.
+ORDER_SWEEP_INTERVAL = float(os.environ.get("ORDER_SWEEP_INTERVAL", "300"))  # 0 — уборка выключена
+ORDER_PENDING_TTL = float(os.environ.get("ORDER_PENDING_TTL", str(24 * 3600)))
+ORDER_ARCHIVE_AFTER = float(os.environ.get("ORDER_ARCHIVE_AFTER", str(30 * 24 * 3600)))
+# Оплаченные заказы остаются в orders: по ним строятся аналитика и выгрузки
+ORDER_ARCHIVE_STATUSES = tuple(
+    status for status in os.environ.get("ORDER_ARCHIVE_STATUSES", f"{EXPIRED},{FAILED}").split(",") if status
+)
+ORDER_SWEEP_BATCH = int(os.environ.get("ORDER_SWEEP_BATCH", "500"))
+ORDER_SWEEP_MAX_BATCHES = int(os.environ.get("ORDER_SWEEP_MAX_BATCHES", "100"))  # за один проход
+ORDER_SWEEP_PAUSE = float(os.environ.get("ORDER_SWEEP_PAUSE", "0.05"))  # сек. между пачками
+
+_ARCHIVE_COLUMNS = ("id", "telegram_chat_id", "client_id", "product_id", "status", "created_at", "provider", "amount")
+
+
+async def expire_batch(db: AsyncSession, cutoff: datetime, limit: int) -> Counter:
+    """
+    До limit pending-заказов, созданных раньше cutoff, -> expired.
+    Условие status = pending повторяется в UPDATE: заказ, оплаченный между выборкой
+    и обновлением, не трогаем. Возвращает {client_id: сколько}.
+    """
+    order = models.Order
+    due = select(order.id).where(order.status == PENDING, order.created_at < cutoff).limit(limit)
+    result = await db.execute(
+        update(order)
+        .where(order.id.in_(due), order.status == PENDING)
+        .values(status=EXPIRED)
+        .returning(order.client_id)
+        .execution_options(synchronize_session=False)
+    )
+    expired = Counter(result.scalars().all())
+    await db.commit()
+    return expired
+
+
+async def archive_batch(db: AsyncSession, cutoff: datetime, statuses: tuple, limit: int) -> Counter:
+    """
+    До limit завершённых заказов старше cutoff -> orders_archive: строки пачки
+    блокируются (в PostgreSQL; занятые колбэком пропускаются), журнал колбэков по
+    ним удаляется, ссылки из outbox обнуляются, сами заказы удаляются с RETURNING
+    и теми же значениями вставляются в архив. Счётчик orders клиента уменьшается.
+    Возвращает {client_id: сколько}.
+    """
+    order = models.Order
+    result = await db.execute(
+        select(order.id)
+        .where(order.status.in_(statuses), order.created_at < cutoff)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = result.scalars().all()
+    if not ids:
+        await db.rollback()
+        return Counter()
+    await db.execute(delete(models.ProcessedCallback).where(models.ProcessedCallback.order_id.in_(ids)))
+    await db.execute(
+        update(models.NotificationOutbox)
+        .where(models.NotificationOutbox.order_id.in_(ids))
+        .values(order_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(
+        delete(order)
+        .where(order.id.in_(ids))
+        .returning(*[getattr(order, column) for column in _ARCHIVE_COLUMNS])
+        .execution_options(synchronize_session=False)
+    )
+    rows = [dict(row._mapping) for row in result.all()]
+    now = datetime.utcnow()
+    await db.execute(insert(models.OrderArchive), [{**row, "archived_at": now} for row in rows])
+    archived = Counter(row["client_id"] for row in rows)
+    for client_id, count in archived.items():
+        await counters.bump(db, client_id, counters.ORDERS, -count)
+    await db.commit()
+    return archived
+
+
+async def restore_archived(db: AsyncSession, order_id: int) -> bool:
+    """
+    Возвращает заказ из orders_archive в orders (тот же id и поля, счётчик orders
+    клиента +1) — для колбэка провайдера, пришедшего после архивации: expired
+    заказ ещё можно оплатить. Коммит — на вызывающей стороне, так что колбэк с
+    неверной подписью оставляет заказ в архиве. False — в архиве такого нет.
+    """
+    archive = models.OrderArchive
+    result = await db.execute(
+        delete(archive)
+        .where(archive.id == order_id)
+        .returning(*[getattr(archive, column) for column in _ARCHIVE_COLUMNS])
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    if row is None:
+        return False
+    await db.execute(insert(models.Order).values(**row._mapping))
+    await counters.bump(db, row.client_id, counters.ORDERS)
+    return True
+
+
+class OrderSweeper:
+    """
+    Фоновая уборка заказов (запускается в lifespan приложения). Один проход —
+    sweep(): пачки expire_batch, затем archive_batch, пока пачки полные, но не
+    больше max_batches каждого вида; между пачками пауза, чтобы дать дорогу
+    остальным писателям. Операции условные, так что несколько воркеров uvicorn
+    с уборкой друг другу не мешают.
+    """
+
+    def __init__(self, interval: float = ORDER_SWEEP_INTERVAL, pending_ttl: float = ORDER_PENDING_TTL,
+                 archive_after: float = ORDER_ARCHIVE_AFTER, archive_statuses: tuple = ORDER_ARCHIVE_STATUSES,
+                 batch_size: int = ORDER_SWEEP_BATCH, max_batches: int = ORDER_SWEEP_MAX_BATCHES,
+                 pause: float = ORDER_SWEEP_PAUSE):
+        self.interval = interval
+        self.pending_ttl = pending_ttl
+        self.archive_after = archive_after
+        self.archive_statuses = archive_statuses
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.pause = pause
+        self._wake = None  # asyncio.Event создаётся в start(), уже внутри цикла событий
+        self._task = None
+        self._stopping = False
+        self.runs = 0
+        self.expired = 0
+        self.archived = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_run_at = None
+        self.last_run_ms = None
+        self.max_batch_ms = 0.0
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopping:
+                break
+            try:
+                await self.sweep()
+            except Exception:
+                self.errors += 1
+                logger.exception("Ошибка уборки заказов")
+
+    async def sweep(self) -> dict:
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        expired = await self._batches(
+            lambda db: expire_batch(db, now - timedelta(seconds=self.pending_ttl), self.batch_size)
+        )
+        archived = Counter()
+        if self.archive_statuses:
+            archived = await self._batches(
+                lambda db: archive_batch(db, now - timedelta(seconds=self.archive_after),
+                                         self.archive_statuses, self.batch_size)
+            )
+        # Статусы в аналитике поменялись — не ждём ANALYTICS_CACHE_TTL
+        for client_id in set(expired) | set(archived):
+            analytics_cache.invalidate_client(client_id)
+        self.runs += 1
+        self.expired += sum(expired.values())
+        self.archived += sum(archived.values())
+        self.last_run_at = now
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 2)
+        return {"expired": sum(expired.values()), "archived": sum(archived.values())}
+
+    async def _batches(self, step) -> Counter:
+        total = Counter()
+        for _ in range(self.max_batches):
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                done = await step(db)
+            self.batches += 1
+            self.max_batch_ms = max(self.max_batch_ms, (time.perf_counter() - started) * 1000)
+            total.update(done)
+            if sum(done.values()) < self.batch_size or self._stopping:
+                break
+            await asyncio.sleep(self.pause)
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "pending_ttl": self.pending_ttl,
+            "archive_after": self.archive_after,
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "expired": self.expired,
+            "archived": self.archived,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_run_ms": self.last_run_ms,
+            "max_batch_ms": round(self.max_batch_ms, 2),
+        }
+
+
+order_sweeper = OrderSweeper()
@@ -0,0 +1,66 @@
+# app/pagination.py
+import base64
+import json
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+
+# Курсор — непрозрачная для клиента строка (base64 от JSON со значениями ключа
+# сортировки последней отданной строки). Следующая страница: WHERE ключ > курсор,
+# поэтому глубина листания не влияет на скорость запроса (в отличие от OFFSET).
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*values) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """
+    Разбирает курсор и возвращает его значения, приведённые к types (int или
+    datetime — по одному на значение ключа сортировки). Битый/чужой курсор,
+    в том числе со значениями не того типа, — 400, а не ошибка базы (500).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise HTTPException(status_code=400, detail="Некорректный cursor")
+    return [parse_datetime(value) if kind is datetime else parse_int(value) for kind, value in zip(types, values)]
+
+
+def parse_int(value) -> int:
+    # bool в JSON — тоже int для isinstance, но id им не бывает
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise HTTPException(status_code=400, detail="Некорректный cursor")
+    return value
+
+
+def parse_datetime(value) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный cursor")
+
+
+def utc_naive(value):
+    """
+    Время из query-параметра -> naive UTC, как оно хранится в базе.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def split_page(rows: list, limit: int):
+    """
+    Запрос делается с limit + 1: если пришла лишняя строка — есть следующая страница.
+    Возвращает (строки страницы, есть_ли_ещё).
+    """
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,14 @@
+# app/payments/__init__.py
+import os
+
+from .base import PaymentProvider, PAID, PENDING, FAILED, EXPIRED
+from .registry import register, get_provider, provider_names
+from .configs import payment_config_cache, get_config
+from . import ledger
+
+# Встроенные провайдеры регистрируются при импорте своих модулей
+from . import robokassa, coinpayments
+
+# Тестовый провайдер для нагрузочных прогонов (scripts/bench_checkout.py)
+if os.environ.get("PAYMENTS_MOCK_ENABLED") == "1":
+    from . import mock
@@ -0,0 +1,88 @@
+# app/payments/base.py
+import json
+import os
+from typing import Optional, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+
+PAID = "paid"
+PENDING = "pending"
+FAILED = "failed"
+EXPIRED = "expired"  # не оплачен за ORDER_PENDING_TTL, см. app/order_sweeper.py
+
+# Сколько секунд ссылка на оплату считается действующей: повторное нажатие "Купить"
+# в том же чате в пределах этого времени получает тот же заказ и ссылку
+PAYMENT_LINK_TTL = float(os.environ.get("PAYMENT_LINK_TTL", "3600"))
+
+
+class PaymentProvider:
+    """
+    Интерфейс платёжного провайдера. Реализация живёт в своём модуле пакета
+    app/payments и регистрируется через registry.register — роуты работают
+    только с этим интерфейсом.
+
+    config_model — pydantic-модель настроек: api_key из PaymentConfig плюс поля
+    JSON из extra_config. Разобранный конфиг кэшируется (configs.py), так что
+    на горячем пути JSON не разбирается.
+    """
+    name: str = ""
+    title: str = ""
+    config_model: Type[BaseModel] = None
+    link_ttl: float = PAYMENT_LINK_TTL
+
+    def parse_config(self, api_key: str, extra_config: Optional[str]) -> BaseModel:
+        try:
+            extra = json.loads(extra_config or "{}")
+            if not isinstance(extra, dict):
+                raise ValueError
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Некорректный extra_config для {self.title}")
+        try:
+            return self.config_model(**{**extra, "api_key": api_key})
+        except ValidationError as e:
+            fields = ", ".join(".".join(str(part) for part in err["loc"]) for err in e.errors())
+            raise HTTPException(status_code=400, detail=f"Некорректный extra_config для {self.title}: {fields}")
+
+    async def create_link(self, http, config, amount: float, order_id: int) -> str:
+        """
+        Ссылка на оплату заказа. http — общий app.http_client.HttpClient.
+        """
+        raise NotImplementedError
+
+    def callback_order_id(self, form) -> int:
+        """
+        id заказа из колбэка; 400, если колбэк неполный. Вызывается до похода в БД.
+        """
+        raise NotImplementedError
+
+    def callback_txn_id(self, form) -> str:
+        """
+        id транзакции у провайдера — ключ журнала обработанных колбэков (ledger.py).
+        """
+        raise NotImplementedError
+
+    def verify_callback(self, config, form, headers):
+        """
+        Проверка подписи колбэка настройками клиента; 400, если не сходится.
+        """
+        raise NotImplementedError
+
+    def map_status(self, form) -> str:
+        """
+        Статус заказа (PAID / PENDING / FAILED) по данным колбэка.
+        """
+        raise NotImplementedError
+
+    def callback_response(self, order_id: int, status: str) -> dict:
+        """
+        Ответ провайдеру; одинаковый для первого колбэка и его повторов.
+        """
+        return {"detail": "OK"}
+
+
+def require_order_id(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Некорректный номер заказа")
@@ -0,0 +1,110 @@
+# app/payments/coinpayments.py
+import hashlib
+import hmac
+import os
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from .base import PaymentProvider, PAID, PENDING, FAILED, require_order_id
+from .registry import register
+
+# API CoinPayments; в тестах можно направить на локальный мок провайдера
+COINPAYMENTS_API_URL = os.getenv("COINPAYMENTS_API_URL", "https://www.coinpayments.net/api.php")
+
+
+class CoinPaymentsConfig(BaseModel):
+    api_key: str          # public key
+    private_key: str
+    ipn_secret: str       # сверяется на колбэке
+    merchant_id: str = ""
+
+
+def _sign(private_key: str, items) -> str:
+    """
+    HMAC SHA512 от form-data ("key=val&key=val..."), как требует CoinPayments.
+    """
+    encoded_str = "&".join(f"{k}={v}" for k, v in items)
+    return hmac.new(private_key.encode("utf-8"), encoded_str.encode("utf-8"), hashlib.sha512).hexdigest()
+
+
+@register
+class CoinPayments(PaymentProvider):
+    name = "coinpayments"
+    title = "CoinPayments"
+    config_model = CoinPaymentsConfig
+
+    async def create_link(self, http, config, amount, order_id):
+        """
+        POST create_transaction на API CoinPayments, в ответе — checkout_url.
+        """
+        payload = {
+            "version": 1,
+            "cmd": "create_transaction",
+            "key": config.api_key,
+            "amount": str(amount),      # или decimal
+            "currency1": "USD",         # валюта, в которой считаем сумму
+            "currency2": "BTC",         # или другой coin по умолчанию (при желании)
+            "item_name": f"Order #{order_id}",
+            "custom": str(order_id),
+            # IPN URL - куда CoinPayments пошлёт уведомление
+            # (замените на ваш реальный публичный адрес)
+            "ipn_url": "https://YOUR_DOMAIN/payment/coinpayments_callback/",
+        }
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "HMAC": _sign(config.private_key, payload.items()),
+        }
+        # Общий клиент (таймауты, повторы, circuit breaker); недоступность провайдера — 502/503
+        resp = await http.post(self.name, COINPAYMENTS_API_URL, data=payload, headers=headers)
+
+        if resp.status_code != 200:
+            raise HTTPException(status_code=400, detail=f"CoinPayments возвратил ошибку HTTP {resp.status_code}")
+        try:
+            resp_json = resp.json()
+        except ValueError:
+            raise HTTPException(status_code=502, detail="CoinPayments вернул не JSON")
+        if resp_json.get("error") != "ok":
+            # В случае ошибки CoinPayments вернёт {"error": "Some error text"}
+            msg = resp_json.get("error", "Unknown CoinPayments error")
+            raise HTTPException(status_code=400, detail=f"CoinPayments API error: {msg}")
+
+        # {"error":"ok","result":{"txn_id":"CPXXX","checkout_url":"https://www.coinpayments.net/index.php?cmd=checkout&id=CPXXX&key=XXXX",...}}
+        return resp_json["result"]["checkout_url"]
+
+    def callback_order_id(self, form):
+        # Обычно приходят 'ipn_mode', 'merchant', 'amount1', 'custom' (наш order_id), 'status', 'txn_id' и т.п.
+        if form.get("ipn_mode") != "hmac":
+            raise HTTPException(status_code=400, detail="IPN Mode != hmac")
+        if not form.get("custom") or not form.get("status") or not form.get("txn_id"):
+            raise HTTPException(status_code=400, detail="Отсутствуют обязательные поля")
+        return require_order_id(form.get("custom"))
+
+    def callback_txn_id(self, form):
+        return form.get("txn_id")
+
+    def verify_callback(self, config, form, headers):
+        hmac_header = headers.get("hmac")
+        if not hmac_header:
+            raise HTTPException(status_code=400, detail="Отсутствуют обязательные поля")
+        # CoinPayments присылает ipn_secret в POST — сверяем с настройками клиента
+        if (form.get("ipn_secret") or "") != config.ipn_secret:
+            raise HTTPException(status_code=400, detail="ipn_secret не совпадает")
+        # Подписываем весь form (ключи по порядку, чтобы стабильно) private_key и сверяем с заголовком HMAC
+        if not hmac.compare_digest(_sign(config.private_key, sorted(form.items())).lower(), hmac_header.lower()):
+            raise HTTPException(status_code=400, detail="HMAC подпись неверна")
+
+    def map_status(self, form):
+        # По докам CoinPayments: status >= 100 или 2 — платёж завершён, < 0 — отменён
+        try:
+            status_int = int(form.get("status"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный status")
+        if status_int >= 100 or status_int == 2:
+            return PAID
+        if status_int < 0:
+            return FAILED
+        return PENDING
+
+    def callback_response(self, order_id, status):
+        return {"detail": f"Order {order_id} IPN processed. Status -> {status}"}
@@ -0,0 +1,60 @@
+# app/payments/configs.py
+import os
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..cache import TTLCache
+from .registry import get_provider
+
+# Разобранные настройки провайдеров по клиенту: ключ (client_id,), значение —
+# список LoadedConfig в порядке id. Сбрасывается CRUD-роутами PaymentConfig;
+# TTL — страховка для других воркеров. Размер считается в клиентах.
+PAYMENT_CONFIG_CACHE_TTL = float(os.environ.get("PAYMENT_CONFIG_CACHE_TTL", "300"))
+PAYMENT_CONFIG_CACHE_SIZE = int(os.environ.get("PAYMENT_CONFIG_CACHE_SIZE", "10000"))
+payment_config_cache = TTLCache(max_bytes=PAYMENT_CONFIG_CACHE_SIZE, ttl=PAYMENT_CONFIG_CACHE_TTL)
+
+
+@dataclass(frozen=True)
+class LoadedConfig:
+    provider_name: str
+    config: Any = None           # экземпляр provider.config_model
+    error: Optional[str] = None  # конфиг в БД не разбирается — отдаём 400 при использовании
+
+
+def _load(row: models.PaymentConfig) -> LoadedConfig:
+    try:
+        provider = get_provider(row.provider_name)
+        return LoadedConfig(row.provider_name, config=provider.parse_config(row.api_key, row.extra_config))
+    except HTTPException as e:
+        return LoadedConfig(row.provider_name, error=e.detail)
+
+
+async def get_configs(db: AsyncSession, client_id: int) -> list:
+    configs = payment_config_cache.get((client_id,))
+    if configs is None:
+        result = await db.execute(
+            select(models.PaymentConfig)
+            .where(models.PaymentConfig.client_id == client_id)
+            .order_by(models.PaymentConfig.id)
+        )
+        configs = [_load(row) for row in result.scalars().all()]
+        payment_config_cache.set((client_id,), configs, size=1)
+    return configs
+
+
+async def get_config(db: AsyncSession, client_id: int, provider_name: str = None):
+    """
+    (провайдер, разобранный конфиг) клиента: указанного провайдера или, если
+    он не указан, первого настроенного. None — настроек нет.
+    """
+    for loaded in await get_configs(db, client_id):
+        if provider_name is None or loaded.provider_name == provider_name:
+            if loaded.error:
+                raise HTTPException(status_code=400, detail=loaded.error)
+            return get_provider(loaded.provider_name), loaded.config
+    return None
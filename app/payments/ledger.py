@@ -0,0 +1,108 @@
+# app/payments/ledger.py
+import asyncio
+import os
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..cache import TTLCache
+from ..counters import upsert
+from .base import PAID, PENDING, FAILED, EXPIRED
+
+# Ключи (провайдер, транзакция, статус) недавно обработанных колбэков: повторы
+# в этом воркере отвечают без похода в БД. Журнал в БД — источник истины для
+# остальных воркеров и после TTL.
+PROCESSED_CACHE_TTL = float(os.environ.get("PROCESSED_CALLBACKS_CACHE_TTL", "600"))
+PROCESSED_CACHE_SIZE = int(os.environ.get("PROCESSED_CALLBACKS_CACHE_SIZE", "100000"))
+processed_cache = TTLCache(max_bytes=PROCESSED_CACHE_SIZE, ttl=PROCESSED_CACHE_TTL)
+
+_inflight = {}  # ключ -> Future обработки, которая идёт прямо сейчас
+_RETRY = object()
+
+# Допустимые переходы статуса заказа по колбэку: новый статус -> из каких.
+# Оплаченный заказ больше не меняется; отказ после оплаты (запоздавший IPN) игнорируется.
+# Просроченный (expired) заказ ещё можно оплатить — покупатель мог заплатить по старой ссылке.
+TRANSITIONS = {
+    PAID: (PENDING, FAILED, EXPIRED),
+    FAILED: (PENDING,),
+    PENDING: (),
+}
+
+
+def mark_seen(provider: str, txn_id: str, status: str):
+    processed_cache.set((provider, txn_id, status), True, size=1)
+
+
+async def seen(db: AsyncSession, provider: str, txn_id: str, status: str) -> bool:
+    """
+    Колбэк уже обработан — быстрый ответ на повтор: из памяти или одним поиском
+    по уникальному индексу.
+    """
+    key = (provider, txn_id, status)
+    if processed_cache.get(key) is not None:
+        return True
+    table = models.ProcessedCallback
+    result = await db.execute(
+        select(table.id).where(table.provider == provider, table.txn_id == txn_id, table.status == status)
+    )
+    if result.first() is None:
+        return False
+    mark_seen(provider, txn_id, status)
+    return True
+
+
+async def single_flight(key: tuple, process):
+    """
+    Одновременные одинаковые операции в этом воркере (дубли колбэка, повторные
+    нажатия "Купить") выполняются один раз: остальные ждут первую и получают её
+    результат. Если первая упала (неверная подпись, ошибка базы), следующий
+    ожидающий пробует сам.
+    """
+    while key in _inflight:
+        result = await asyncio.shield(_inflight[key])
+        if result is not _RETRY:
+            return result
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await process()
+    except BaseException:
+        future.set_result(_RETRY)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        del _inflight[key]
+
+
+async def record(db: AsyncSession, provider: str, txn_id: str, status: str, order_id: int) -> bool:
+    """
+    Заносит колбэк в журнал (INSERT ... ON CONFLICT DO NOTHING). False — его уже
+    занёс параллельный дубль, записывать в заказ не нужно. Коммит — на вызывающей стороне.
+    """
+    table = models.ProcessedCallback.__table__
+    result = await db.execute(
+        upsert(db, table)
+        .values(provider=provider, txn_id=txn_id, status=status, order_id=order_id)
+        .on_conflict_do_nothing(index_elements=[table.c.provider, table.c.txn_id, table.c.status])
+    )
+    return result.rowcount == 1
+
+
+async def transition(db: AsyncSession, order_id: int, status: str) -> bool:
+    """
+    Условный UPDATE статуса заказа: пишет только допустимый переход (TRANSITIONS).
+    True — статус изменён этим вызовом.
+    """
+    allowed = TRANSITIONS.get(status, ())
+    if not allowed:
+        return False
+    result = await db.execute(
+        update(models.Order)
+        .where(models.Order.id == order_id, models.Order.status.in_(allowed))
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
@@ -0,0 +1,64 @@
+# app/payments/mock.py
+import hashlib
+import hmac
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from .base import PaymentProvider, PAID, PENDING, FAILED, require_order_id
+from .registry import register
+
+# Тестовый провайдер для нагрузочных прогонов без реальных мерчантов: API и IPN
+# эмулирует scripts/mock_provider.py. Регистрируется только при PAYMENTS_MOCK_ENABLED=1
+# (см. app/payments/__init__.py) — в бою его нельзя выбрать в PaymentConfig.
+MOCK_PROVIDER_URL = os.getenv("MOCK_PROVIDER_URL", "http://127.0.0.1:8900")
+
+_STATUSES = {"paid": PAID, "failed": FAILED}
+
+
+class MockConfig(BaseModel):
+    api_key: str                    # merchant id
+    secret: str                     # ключ HMAC-SHA256 подписи IPN
+    api_url: Optional[str] = None   # по умолчанию MOCK_PROVIDER_URL
+
+
+def sign(secret: str, items) -> str:
+    """
+    HMAC-SHA256 от "key=val&key=val..." (ключи по порядку); так же подписывает мок-сервер.
+    """
+    encoded_str = "&".join(f"{k}={v}" for k, v in sorted(items))
+    return hmac.new(secret.encode("utf-8"), encoded_str.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+@register
+class MockProvider(PaymentProvider):
+    name = "mock"
+    title = "Mock"
+    config_model = MockConfig
+
+    async def create_link(self, http, config, amount, order_id):
+        url = f"{config.api_url or MOCK_PROVIDER_URL}/mock/create"
+        resp = await http.post(self.name, url, data={
+            "merchant": config.api_key, "order_id": str(order_id), "amount": f"{amount:.2f}",
+        })
+        if resp.status_code != 200:
+            raise HTTPException(status_code=400, detail=f"Mock возвратил ошибку HTTP {resp.status_code}")
+        return resp.json()["checkout_url"]
+
+    def callback_order_id(self, form):
+        if not form.get("order_id") or not form.get("status") or not form.get("txn_id"):
+            raise HTTPException(status_code=400, detail="Отсутствуют обязательные поля")
+        return require_order_id(form.get("order_id"))
+
+    def callback_txn_id(self, form):
+        return form.get("txn_id")
+
+    def verify_callback(self, config, form, headers):
+        signature = headers.get("x-signature") or ""
+        if not hmac.compare_digest(sign(config.secret, form.items()), signature.lower()):
+            raise HTTPException(status_code=400, detail="Подпись не совпадает")
+
+    def map_status(self, form):
+        return _STATUSES.get(form.get("status"), PENDING)
@@ -0,0 +1,26 @@
+# app/payments/registry.py
+from fastapi import HTTPException
+
+from .base import PaymentProvider
+
+_providers = {}
+
+
+def register(provider_cls):
+    """
+    Декоратор класса провайдера: @register class MyProvider(PaymentProvider).
+    """
+    provider = provider_cls()
+    _providers[provider.name] = provider
+    return provider_cls
+
+
+def get_provider(name: str) -> PaymentProvider:
+    provider = _providers.get(name)
+    if provider is None:
+        raise HTTPException(status_code=400, detail=f"Неизвестный провайдер: {name}")
+    return provider
+
+
+def provider_names() -> list:
+    return sorted(_providers)
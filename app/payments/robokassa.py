@@ -0,0 +1,80 @@
+# app/payments/robokassa.py
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from .base import PaymentProvider, PAID, require_order_id
+from .registry import register
+
+# Пароли можно задать глобально через .env (как раньше) — используются, если
+# их нет в extra_config клиента (у старых клиентов там бывает только логин)
+ROBOCASSA_PASSWORD_1 = os.getenv("ROBOCASSA_PASSWORD_1")
+ROBOCASSA_PASSWORD_2 = os.getenv("ROBOCASSA_PASSWORD_2")
+
+# Страница оплаты; для нагрузочных прогонов — мок (scripts/mock_provider.py)
+ROBOKASSA_PAYMENT_URL = os.getenv("ROBOKASSA_PAYMENT_URL", "https://auth.robokassa.ru/Merchant/Index.aspx")
+
+
+class RobokassaConfig(BaseModel):
+    api_key: str                     # MerchantLogin
+    password1: Optional[str] = None  # для подписи ссылки
+    password2: Optional[str] = None  # для проверки колбэка (ResultURL)
+
+
+def generate_robokassa_link(config: RobokassaConfig, amount: float, order_id: int) -> str:
+    """
+    Ссылка на оплату: CRC = md5("{login}:{OutSum}:{password1}:{InvId}").
+    """
+    password1 = config.password1 or ROBOCASSA_PASSWORD_1
+    if not password1:
+        raise HTTPException(status_code=400, detail="Не настроен password1 для Robokassa")
+    login = config.api_key
+    out_summ = f"{amount:.2f}"
+    signature_str = f"{login}:{out_summ}:{password1}:{order_id}"
+    crc = hashlib.md5(signature_str.encode()).hexdigest()
+
+    # Пример ссылки (IsTest=1 при тесте)
+    return (
+        f"{ROBOKASSA_PAYMENT_URL}"
+        f"?MerchantLogin={login}"
+        f"&OutSum={out_summ}"
+        f"&InvId={order_id}"
+        f"&SignatureValue={crc}"
+        f"&IsTest=1"
+    )
+
+
+@register
+class Robokassa(PaymentProvider):
+    name = "robokassa"
+    title = "Robokassa"
+    config_model = RobokassaConfig
+
+    async def create_link(self, http, config, amount, order_id):
+        return generate_robokassa_link(config, amount, order_id)
+
+    def callback_order_id(self, form):
+        # Примерные поля: InvId, OutSum, SignatureValue
+        if not form.get("InvId") or not form.get("OutSum") or not form.get("SignatureValue"):
+            raise HTTPException(status_code=400, detail="Некорректные параметры Robokassa callback")
+        return require_order_id(form.get("InvId"))
+
+    def callback_txn_id(self, form):
+        # Отдельного id транзакции Robokassa не присылает: счёт = заказ
+        return str(form.get("InvId"))
+
+    def verify_callback(self, config, form, headers):
+        password2 = config.password2 or ROBOCASSA_PASSWORD_2
+        if not password2:
+            raise HTTPException(status_code=400, detail="Не настроен password2 для Robokassa")
+        signature_str = f"{form.get('OutSum')}:{form.get('InvId')}:{password2}"
+        correct_signature = hashlib.md5(signature_str.encode()).hexdigest()
+        if form.get("SignatureValue").lower() != correct_signature.lower():
+            raise HTTPException(status_code=400, detail="Подпись не совпадает")
+
+    def map_status(self, form):
+        # ResultURL Робокасса вызывает только для успешной оплаты
+        return PAID
@@ -0,0 +1,186 @@
+# app/product_import.py
+import codecs
+import csv
+import json
+import logging
+import os
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, counters, catalog, category_tree
+
+logger = logging.getLogger(__name__)
+
+# Массовый импорт товаров (CSV / NDJSON). Файл читается построчно, строки
+# проверяются и пишутся пачками по IMPORT_BATCH_SIZE: на пачку — один поиск
+# существующих товаров по external_key, один multi-row INSERT, один bulk UPDATE
+# по первичному ключу, одна версия каталога и один коммит. Ошибка базы откатывает
+# только свою пачку, её строки попадают в отчёт.
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_ERRORS = 1000  # дальше в отчёте только счётчик failed
+
+# Колонки файла (и выгрузки GET /api/products/export). category — путь по именам
+# через "/", недостающие категории создаются.
+FIELDS = ("external_key", "title", "description", "file_url", "file_size", "price", "category")
+
+
+class ProductImportRow(BaseModel):
+    external_key: Optional[str] = None  # без ключа строка всегда создаёт новый товар
+    title: str
+    description: Optional[str] = None
+    file_url: str
+    file_size: Optional[float] = 0
+    price: float = 0
+    category: str
+
+
+def read_rows(file, fmt: str):
+    """
+    (номер строки данных, dict | Exception) из бинарного файла. Пустые значения
+    CSV считаются отсутствующими. Если файл дальше не читается (не UTF-8, сломанная
+    разметка CSV), последней идёт ошибка с номером строки файла: уже прочитанные
+    строки импортируются, отчёт возвращается как обычно.
+    """
+    read = {"lines": 0}
+
+    def lines():
+        for line in codecs.iterdecode(file, "utf-8-sig"):
+            read["lines"] += 1
+            yield line
+
+    number = 0
+    try:
+        if fmt == "csv":
+            for row in csv.DictReader(lines()):
+                number += 1
+                yield number, {key: value for key, value in row.items() if key and value not in ("", None)}
+            return
+        for line in lines():
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, e
+                continue
+            yield number, row if isinstance(row, dict) else ValueError("Ожидается JSON-объект")
+    except UnicodeDecodeError:
+        yield number + 1, ValueError(f"строка файла {read['lines'] + 1}: файл не в кодировке UTF-8, "
+                                     f"дальше не прочитан")
+    except csv.Error as e:
+        yield number + 1, ValueError(f"строка файла {read['lines']}: ошибка CSV ({e}), дальше не прочитан")
+
+
+def _parse(raw) -> dict:
+    if isinstance(raw, Exception):
+        raise ValueError(str(raw))
+    if isinstance(raw.get("external_key"), (int, float)):
+        raw = {**raw, "external_key": str(raw["external_key"])}  # числовые артикулы из NDJSON
+    try:
+        row = ProductImportRow(**raw).dict()
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+        ))
+    row["category"] = category_tree.PATH_SEPARATOR.join(
+        part.strip() for part in row["category"].split(category_tree.PATH_SEPARATOR) if part.strip()
+    )
+    if not row["category"]:
+        raise ValueError("category: пустой путь категории")
+    if row["price"] < 0:
+        raise ValueError("price: цена не может быть отрицательной")
+    return row
+
+
+class ProductImport:
+    """
+    Один прогон импорта для клиента: кэш путей категорий и накопленный отчёт.
+    """
+
+    def __init__(self, db: AsyncSession, client_id: int, batch_size: int = IMPORT_BATCH_SIZE):
+        self.db = db
+        self.client_id = client_id
+        self.batch_size = batch_size
+        self.category_ids = {}  # путь -> id
+        self.report = {"created": 0, "updated": 0, "failed": 0, "categories_created": 0, "errors": []}
+
+    def _error(self, number: int, message: str):
+        self.report["failed"] += 1
+        if len(self.report["errors"]) < IMPORT_MAX_ERRORS:
+            self.report["errors"].append({"row": number, "error": message})
+
+    async def run(self, rows) -> dict:
+        paths = await category_tree.category_paths(self.db, self.client_id)
+        for cat_id, path in sorted(paths.items(), reverse=True):
+            self.category_ids[path] = cat_id  # у одинаковых путей побеждает старшая категория
+        batch = []
+        for number, raw in rows:
+            try:
+                batch.append((number, _parse(raw)))
+            except ValueError as e:
+                self._error(number, str(e))
+                continue
+            if len(batch) >= self.batch_size:
+                await self._write(batch)
+                batch = []
+        if batch:
+            await self._write(batch)
+        return self.report
+
+    async def _category_id(self, path: str, version: int, created: list) -> int:
+        if path in self.category_ids:
+            return self.category_ids[path]
+        parent_path, _, name = path.rpartition(category_tree.PATH_SEPARATOR)
+        parent_id = await self._category_id(parent_path, version, created) if parent_path else None
+        category = models.Category(name=name, parent_id=parent_id, client_id=self.client_id, version=version)
+        self.db.add(category)
+        await self.db.flush()
+        await category_tree.add_node(self.db, category)
+        self.category_ids[path] = category.id
+        created.append(path)
+        return category.id
+
+    async def _write(self, batch: list):
+        created_paths = []
+        try:
+            version = await catalog.bump_version(self.db, self.client_id)
+            rows = {}
+            for number, row in batch:
+                category_id = await self._category_id(row.pop("category"), version, created_paths)
+                values = {**row, "category_id": category_id, "version": version}
+                # Повтор ключа внутри пачки: побеждает последняя строка
+                rows[row["external_key"] if row["external_key"] is not None else ("row", number)] = values
+            keys = [key for key in rows if isinstance(key, str)]
+            existing = {}
+            if keys:
+                result = await self.db.execute(
+                    select(models.Product.external_key, models.Product.id)
+                    .where(models.Product.client_id == self.client_id, models.Product.external_key.in_(keys))
+                )
+                existing = dict(result.all())
+            inserts = [{**values, "client_id": self.client_id}
+                       for key, values in rows.items() if key not in existing]
+            updates = [{**values, "id": existing[key]} for key, values in rows.items() if key in existing]
+            if inserts:
+                await self.db.execute(insert(models.Product), inserts)
+                await counters.bump(self.db, self.client_id, counters.PRODUCTS, len(inserts))
+            if updates:
+                await self.db.execute(update(models.Product), updates)
+            if created_paths:
+                await counters.bump(self.db, self.client_id, counters.CATEGORIES, len(created_paths))
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            for path in created_paths:
+                del self.category_ids[path]
+            logger.exception("Импорт товаров: пачка из %d строк не записана", len(batch))
+            for number, _ in batch:
+                self._error(number, f"Ошибка записи пачки: {e.__class__.__name__}")
+            return
+        self.report["created"] += len(inserts)
+        self.report["updated"] += len(updates)
+        self.report["categories_created"] += len(created_paths)
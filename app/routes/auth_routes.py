@@ -1,7 +1,8 @@
 # app/routes/auth_routes.py
 
 from fastapi import APIRouter, Depends, HTTPException, status, Form, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime
 import os, hashlib, hmac
 from .. import auth, models, database
@@ -10,7 +11,7 @@ from ..database import get_db
 router = APIRouter()
 
 @router.post("/login")
-async def login(request: Request, db: Session = Depends(get_db)):
+async def login(request: Request, db: AsyncSession = Depends(get_db)):
     """
     Единый эндпоинт для:
     1) Логин/пароль
@@ -33,7 +34,7 @@ async def login(request: Request, db: Session = Depends(get_db)):
         password = data["password"]
 
         # Проверяем пользователя
-        user = authenticate_admin_user(db, username, password)
+        user = await auth.authenticate_admin_user(db, username, password)
         if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверные учетные данные")
 
@@ -58,7 +59,8 @@ async def login(request: Request, db: Session = Depends(get_db)):
 
         # Ищем AdminUser по telegram_id
         telegram_id = str(data["id"])  # приводим к строке
-        user = db.query(models.AdminUser).filter(models.AdminUser.telegram_id == telegram_id).first()
+        result = await db.execute(select(models.AdminUser).where(models.AdminUser.telegram_id == telegram_id))
+        user = result.scalars().first()
         if not user:
             raise HTTPException(status_code=401, detail="Пользователь с таким telegram_id не найден")
 
@@ -72,18 +74,6 @@ async def login(request: Request, db: Session = Depends(get_db)):
     raise HTTPException(status_code=400, detail="Неполные данные для входа")
 
 
-def authenticate_admin_user(db: Session, username: str, password: str):
-    """
-    Проверяем логин/пароль через passlib
-    """
-    user = db.query(models.AdminUser).filter(models.AdminUser.username == username).first()
-    if not user:
-        return None
-    if not auth.verify_password(password, user.hashed_password):
-        return None
-    return user
-
-
 def verify_telegram_auth(tg_data: dict) -> bool:
     """
     Проверка подписи Телеграма:
@@ -1,9 +1,13 @@
 # app/routes/categories.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
-from .. import models, database, auth
+from .. import models, database, auth, counters, catalog, category_tree
+from ..cache import catalog_cache
+from ..database import get_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, split_page
 
 router = APIRouter()
 
@@ -23,58 +27,240 @@ class CategoryResponse(BaseModel):
     class Config:
         orm_mode = True
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class CategoryPage(BaseModel):
+    items: List[CategoryResponse]
+    next_cursor: Optional[str] = None  # None — это последняя страница
+    total: Optional[int] = None        # только при with_total=true
+
+class CategoryTreeNode(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int]
+    product_count: int  # товары во всём поддереве
+    children: List["CategoryTreeNode"] = []
+
+CategoryTreeNode.update_forward_refs()
+
+# Массовые операции: все изменения — набором SQL-операторов в одной транзакции
+# с одной версией каталога, так что бот видит дерево либо до, либо после.
+BULK_MAX_IDS = 1000
+
+class CategoryBulkMove(BaseModel):
+    category_ids: List[int]
+    parent_id: Optional[int] = None  # None — перенести в корень
+
+class ProductReassign(BaseModel):
+    category_id: int                        # куда переносить
+    product_ids: Optional[List[int]] = None  # либо конкретные товары,
+    from_category_id: Optional[int] = None   # либо все товары категории
+    include_subcategories: bool = False      # ...вместе с её подкатегориями
+
+async def _get_client_category(db: AsyncSession, category_id: int, client_id: int):
+    result = await db.execute(
+        select(models.Category).where(models.Category.id == category_id, models.Category.client_id == client_id)
+    )
+    return result.scalars().first()
+
+async def _check_parent(db: AsyncSession, parent_id: int, client_id: int):
+    if not await _get_client_category(db, parent_id, client_id):
+        raise HTTPException(status_code=400, detail="Родительская категория не найдена")
+
+def _check_bulk_ids(ids: list):
+    if not ids:
+        raise HTTPException(status_code=400, detail="Пустой список")
+    if len(ids) > BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Не больше {BULK_MAX_IDS} id за запрос")
 
 @router.post("/", response_model=CategoryResponse)
-def create_category(category: CategoryCreate, db: Session = Depends(get_db),
-                      current_admin: models.AdminUser = Depends(auth.get_current_admin)):
+async def create_category(category: CategoryCreate, db: AsyncSession = Depends(get_db),
+                          current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    if category.parent_id is not None:
+        await _check_parent(db, category.parent_id, current_admin.client_id)
     # Привязываем категорию к клиенту, которому принадлежит админ
     db_category = models.Category(
         name=category.name,
         parent_id=category.parent_id,
         client_id=current_admin.client_id
     )
+    await catalog.touch(db, current_admin.client_id, db_category)
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.flush()
+    await category_tree.add_node(db, db_category)
+    await counters.bump(db, current_admin.client_id, counters.CATEGORIES, 1)
+    await db.commit()
+    catalog_cache.invalidate_client(current_admin.client_id)
+    await db.refresh(db_category)
     return db_category
 
-@router.get("/", response_model=List[CategoryResponse])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                    current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    categories = db.query(models.Category).filter(models.Category.client_id == current_admin.client_id)\
-                    .offset(skip).limit(limit).all()
-    return categories
+@router.get("/", response_model=CategoryPage)
+async def read_categories(cursor: Optional[str] = None,
+                          limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          with_total: bool = False, db: AsyncSession = Depends(get_db),
+                          current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Курсорная пагинация по id: next_cursor из ответа передаётся в следующий запрос.
+    """
+    query = select(models.Category).where(models.Category.client_id == current_admin.client_id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(models.Category.id > last_id)
+    result = await db.execute(query.order_by(models.Category.id).limit(limit + 1))
+    categories, has_more = split_page(result.scalars().all(), limit)
+
+    page = {"items": categories, "next_cursor": encode_cursor(categories[-1].id) if has_more else None}
+    if with_total:
+        page["total"] = await counters.get(db, current_admin.client_id, counters.CATEGORIES)
+    return page
+
+@router.get("/tree", response_model=List[CategoryTreeNode])
+async def read_category_tree(db: AsyncSession = Depends(get_db),
+                             current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Всё дерево категорий с числом товаров в каждом поддереве.
+    """
+    return await category_tree.tree_with_counts(db, current_admin.client_id)
+
+@router.post("/bulk/move")
+async def move_categories(move: CategoryBulkMove, db: AsyncSession = Depends(get_db),
+                          current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Переносит несколько категорий (вместе с поддеревьями) под parent_id.
+    Категории не должны лежать одна в другой, parent_id — внутри переносимых.
+    """
+    client_id = current_admin.client_id
+    category_ids = sorted(set(move.category_ids))
+    _check_bulk_ids(category_ids)
+    found = await db.execute(
+        select(func.count()).select_from(models.Category)
+        .where(models.Category.client_id == client_id, models.Category.id.in_(category_ids))
+    )
+    if found.scalar() != len(category_ids):
+        raise HTTPException(status_code=404, detail="Категория не найдена")
+    nested = await category_tree.nested_ids(db, category_ids)
+    if nested:
+        raise HTTPException(status_code=400,
+                            detail=f"Категории {nested} уже лежат внутри других переносимых категорий")
+    if move.parent_id is not None:
+        await _check_parent(db, move.parent_id, client_id)
+        if await category_tree.in_any_subtree(db, move.parent_id, category_ids):
+            raise HTTPException(status_code=400, detail="Нельзя перенести категорию внутрь самой себя")
+    version = await catalog.bump_version(db, client_id)
+    await category_tree.move_nodes(db, client_id, category_ids, move.parent_id, version)
+    await db.commit()
+    catalog_cache.invalidate_client(client_id)
+    return {"moved": len(category_ids), "version": version}
+
+@router.post("/bulk/reassign-products")
+async def reassign_products(reassign: ProductReassign, db: AsyncSession = Depends(get_db),
+                            current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Переносит товары в категорию category_id одним UPDATE: либо перечисленные
+    product_ids, либо все товары from_category_id (с include_subcategories —
+    и её подкатегорий).
+    """
+    client_id = current_admin.client_id
+    if (reassign.product_ids is None) == (reassign.from_category_id is None):
+        raise HTTPException(status_code=400, detail="Укажите либо product_ids, либо from_category_id")
+    if not await _get_client_category(db, reassign.category_id, client_id):
+        raise HTTPException(status_code=404, detail="Категория не найдена")
+    if reassign.product_ids is not None:
+        _check_bulk_ids(reassign.product_ids)
+        condition = models.Product.id.in_(reassign.product_ids)
+    else:
+        if not await _get_client_category(db, reassign.from_category_id, client_id):
+            raise HTTPException(status_code=404, detail="Категория не найдена")
+        if reassign.include_subcategories:
+            condition = models.Product.category_id.in_(category_tree.subtree_ids(reassign.from_category_id))
+        else:
+            condition = models.Product.category_id == reassign.from_category_id
+    version = await catalog.bump_version(db, client_id)
+    result = await db.execute(
+        update(models.Product)
+        .where(models.Product.client_id == client_id, condition,
+               models.Product.category_id != reassign.category_id)
+        .values(category_id=reassign.category_id, version=version)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    catalog_cache.invalidate_client(client_id)
+    return {"updated": result.rowcount, "version": version}
 
 @router.put("/{category_id}", response_model=CategoryResponse)
-def update_category(category_id: int, category: CategoryUpdate, db: Session = Depends(get_db),
-                    current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    db_category = db.query(models.Category)\
-                    .filter(models.Category.id == category_id, models.Category.client_id == current_admin.client_id)\
-                    .first()
+async def update_category(category_id: int, category: CategoryUpdate, db: AsyncSession = Depends(get_db),
+                          current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    db_category = await _get_client_category(db, category_id, current_admin.client_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Категория не найдена")
     if category.name is not None:
         db_category.name = category.name
-    if category.parent_id is not None:
+    if category.parent_id is not None and category.parent_id != db_category.parent_id:
+        await _check_parent(db, category.parent_id, current_admin.client_id)
+        if await category_tree.is_in_subtree(db, category.parent_id, category_id):
+            raise HTTPException(status_code=400, detail="Нельзя перенести категорию внутрь самой себя")
+        await category_tree.move_node(db, category_id, category.parent_id)
         db_category.parent_id = category.parent_id
-    db.commit()
-    db.refresh(db_category)
+    await catalog.touch(db, current_admin.client_id, db_category)
+    await db.commit()
+    catalog_cache.invalidate_client(current_admin.client_id)
+    await db.refresh(db_category)
     return db_category
 
 @router.delete("/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db),
-                    current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    db_category = db.query(models.Category)\
-                    .filter(models.Category.id == category_id, models.Category.client_id == current_admin.client_id)\
-                    .first()
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_db),
+                          current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    db_category = await _get_client_category(db, category_id, current_admin.client_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Категория не найдена")
-    db.delete(db_category)
-    db.commit()
+    products = select(models.Product.id).where(models.Product.client_id == current_admin.client_id,
+                                               models.Product.category_id == category_id)
+    if db_category.parent_id is None and (await db.execute(products.limit(1))).first():
+        raise HTTPException(status_code=409, detail="В категории есть товары: перенесите их или удалите поддерево")
+    version = await catalog.tombstone(db, current_admin.client_id, catalog.CATEGORY, category_id)
+    # Товары и дочерние категории поднимаются к родителю удалённой
+    await db.execute(
+        update(models.Product)
+        .where(models.Product.client_id == current_admin.client_id, models.Product.category_id == category_id)
+        .values(category_id=db_category.parent_id, version=version)
+        .execution_options(synchronize_session=False)
+    )
+    await category_tree.remove_node(db, db_category, version)
+    await db.delete(db_category)
+    await counters.bump(db, current_admin.client_id, counters.CATEGORIES, -1)
+    await db.commit()
+    catalog_cache.invalidate_client(current_admin.client_id)
     return {"detail": "Категория удалена"}
+
+@router.delete("/{category_id}/subtree")
+async def delete_category_subtree(category_id: int, db: AsyncSession = Depends(get_db),
+                                  current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Удаляет категорию со всеми подкатегориями и их товарами. Если на товары
+    поддерева есть заказы — 409, ничего не удаляется.
+    """
+    client_id = current_admin.client_id
+    if not await _get_client_category(db, category_id, client_id):
+        raise HTTPException(status_code=404, detail="Категория не найдена")
+    category_ids = (await db.execute(category_tree.subtree_ids(category_id))).scalars().all()
+    products = select(models.Product.id).where(models.Product.client_id == client_id,
+                                               models.Product.category_id.in_(category_ids))
+    ordered = await db.execute(
+        select(models.Order.id)
+        .where(models.Order.client_id == client_id, models.Order.product_id.in_(products))
+        .limit(1)
+    )
+    if ordered.first():
+        raise HTTPException(status_code=409, detail="На товары из этих категорий есть заказы")
+    version = await catalog.bump_version(db, client_id)
+    await catalog.tombstone_many(db, client_id, catalog.PRODUCT, products, version)
+    deleted = await db.execute(
+        delete(models.Product)
+        .where(models.Product.client_id == client_id, models.Product.category_id.in_(category_ids))
+        .execution_options(synchronize_session=False)
+    )
+    await catalog.tombstone_many(db, client_id, catalog.CATEGORY, category_ids, version)
+    await category_tree.remove_subtree(db, category_ids)
+    await counters.bump(db, client_id, counters.PRODUCTS, -deleted.rowcount)
+    await counters.bump(db, client_id, counters.CATEGORIES, -len(category_ids))
+    await db.commit()
+    catalog_cache.invalidate_client(client_id)
+    return {"detail": "Категории удалены", "categories": len(category_ids), "products": deleted.rowcount}
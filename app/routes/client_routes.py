@@ -3,18 +3,13 @@ import subprocess
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from .. import models, database, auth
+from ..database import get_db
 
 router = APIRouter()
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Схема для обновления токенов
 class ClientUpdateTokens(BaseModel):
     telegram_token: Optional[str] = None
@@ -30,12 +25,16 @@ class ClientResponse(BaseModel):
     class Config:
         orm_mode = True
 
+async def _get_client(db: AsyncSession, client_id: int):
+    result = await db.execute(select(models.Client).where(models.Client.id == client_id))
+    return result.scalars().first()
+
 @router.post("/me/bot/run")
-def run_bot(
-    db: Session = Depends(get_db),
-    current_admin: models.AdminUser = Depends(auth.get_current_admin)
+async def run_bot(
+    db: AsyncSession = Depends(get_db),
+    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)
 ):
-    client = db.query(models.Client).filter(models.Client.id == current_admin.client_id).first()
+    client = await _get_client(db, current_admin.client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
 
@@ -44,7 +43,7 @@ def run_bot(
 
     # Устанавливаем статус, говорим «оператору» запустить
     client.bot_status = "requested"
-    db.commit()
+    await db.commit()
 
     return {
         "detail": "Запрос на запуск бота успешно отправлен (bot_status='requested').",
@@ -52,22 +51,22 @@ def run_bot(
     }
 
 @router.get("/me", response_model=ClientResponse)
-def get_current_client(
-    db: Session = Depends(get_db),
-    current_admin: models.AdminUser = Depends(auth.get_current_admin)
+async def get_current_client(
+    db: AsyncSession = Depends(get_db),
+    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)
 ):
-    client = db.query(models.Client).filter(models.Client.id == current_admin.client_id).first()
+    client = await _get_client(db, current_admin.client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     return client
 
 @router.put("/me", response_model=ClientResponse)
-def update_current_client(
+async def update_current_client(
     data: ClientUpdateTokens,
-    db: Session = Depends(get_db),
-    current_admin: models.AdminUser = Depends(auth.get_current_admin)
+    db: AsyncSession = Depends(get_db),
+    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)
 ):
-    client = db.query(models.Client).filter(models.Client.id == current_admin.client_id).first()
+    client = await _get_client(db, current_admin.client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
 
@@ -77,6 +76,6 @@ def update_current_client(
     if data.payment_provider_token is not None:
         client.payment_provider_token = data.payment_provider_token
 
-    db.commit()
-    db.refresh(client)
+    await db.commit()
+    await db.refresh(client)
     return client
@@ -0,0 +1,30 @@
+# app/routes/metrics.py
+from fastapi import APIRouter, Depends
+from .. import models, auth, payments
+from ..cache import catalog_cache, analytics_cache
+from ..http_client import http_client
+from ..notifications import notification_sender, telegram_http
+from ..order_sweeper import order_sweeper
+from .payment import checkout_stats
+from ..stats_buffer import stats_buffer
+
+router = APIRouter()
+
+@router.get("/")
+async def get_metrics(current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Внутренние метрики процесса (кэши и т.п.). Значения — по текущему воркеру uvicorn.
+    """
+    return {
+        "catalog_cache": catalog_cache.stats(),
+        "admin_cache": auth.admin_cache.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "password_pool": auth.password_pool.stats(),
+        "stats_buffer": stats_buffer.stats(),
+        "http_client": http_client.stats(),
+        "payment_config_cache": payments.payment_config_cache.stats(),
+        "processed_callbacks_cache": payments.ledger.processed_cache.stats(),
+        "notifications": {**notification_sender.stats(), "http": telegram_http.stats()},
+        "order_sweeper": order_sweeper.stats(),
+        "checkout": {"created": checkout_stats["created"], "reused": checkout_stats["reused"]},
+    }
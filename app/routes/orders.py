@@ -1,19 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 from datetime import datetime
-from .. import models, database, auth
+from .. import models, database, auth, counters
+from ..cache import analytics_cache
+from ..database import get_db
+from ..export import export_response
+from ..pagination import MAX_PAGE_SIZE, encode_cursor, decode_cursor, split_page, utc_naive
 from pydantic import BaseModel
 
 router = APIRouter()
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 #
 # Pydantic схемы
 #
@@ -26,6 +24,11 @@ class OrderResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class OrderPage(BaseModel):
+    items: List[OrderResponse]
+    next_cursor: Optional[str] = None  # None — это последняя страница
+    total: Optional[int] = None        # только при with_total=true
+
 class OrderDetailResponse(OrderResponse):
     """
     Расширенная инфа о заказе, если нужно.
@@ -35,41 +38,159 @@ class OrderDetailResponse(OrderResponse):
     product_price: float = 0
     # Или данные о клиенте и т.д.
 
-@router.get("/", response_model=List[OrderResponse])
-def get_orders(
-    skip: int = 0,
-    limit: int = 50,
-    db: Session = Depends(get_db),
-    current_admin: models.AdminUser = Depends(auth.get_current_admin)
+async def _get_client_order(db: AsyncSession, order_id: int, client_id: int):
+    result = await db.execute(
+        select(models.Order).where(models.Order.id == order_id, models.Order.client_id == client_id)
+    )
+    return result.scalars().first()
+
+@router.get("/", response_model=OrderPage)
+async def get_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    with_total: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)
+):
+    """
+    Получить список заказов для текущего клиента (сначала новые).
+    Курсорная пагинация по (created_at, id): next_cursor передаётся в следующий запрос.
+    """
+    query = select(models.Order).where(models.Order.client_id == current_admin.client_id)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, datetime, int)
+        query = query.where(
+            tuple_(models.Order.created_at, models.Order.id) < tuple_(last_created_at, last_id)
+        )
+    query = query.order_by(models.Order.created_at.desc(), models.Order.id.desc()).limit(limit + 1)
+    result = await db.execute(query)
+    orders, has_more = split_page(result.scalars().all(), limit)
+
+    next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id) if has_more else None
+    page = {"items": orders, "next_cursor": next_cursor}
+    if with_total:
+        page["total"] = await counters.get(db, current_admin.client_id, counters.ORDERS)
+    return page
+
+
+@router.get("/analytics")
+async def get_orders_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)
 ):
     """
-    Получить список заказов для текущего клиента.
+    Выручка и конверсия по заказам клиента за [start, end): итоги, разбивка по
+    товарам и по дням. Один агрегирующий запрос (заказы + товары), результат
+    кэшируется на ANALYTICS_CACHE_TTL секунд.
+    Выручка — по сумме, выставленной в заказе (orders.amount); у старых заказов без
+    неё — по текущей цене товара.
     """
-    query = db.query(models.Order).filter(models.Order.client_id == current_admin.client_id)
-    orders = query.offset(skip).limit(limit).all()
-    return orders
+    start, end = utc_naive(start), utc_naive(end)
+    key = (current_admin.client_id, start, end)
+    cached = analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    paid = models.Order.status == "paid"
+    day = func.date(models.Order.created_at)
+    query = (
+        select(day.label("day"), models.Order.product_id, models.Product.title, models.Order.status,
+               func.count().label("orders"),
+               func.sum(case((paid, func.coalesce(models.Order.amount, models.Product.price)),
+                             else_=0)).label("revenue"))
+        .select_from(models.Order)
+        .outerjoin(models.Product, models.Product.id == models.Order.product_id)
+        .where(models.Order.client_id == current_admin.client_id)
+        .group_by(day, models.Order.product_id, models.Product.title, models.Order.status)
+    )
+    if start is not None:
+        query = query.where(models.Order.created_at >= start)
+    if end is not None:
+        query = query.where(models.Order.created_at < end)
+    rows = (await db.execute(query)).all()
+
+    # Сворачиваем группы (день, товар, статус) в итоги и две разбивки
+    statuses, by_product, by_day = {}, {}, {}
+    for row in rows:
+        statuses[row.status] = statuses.get(row.status, 0) + row.orders
+        by_product.setdefault(row.product_id, {"product_id": row.product_id, "title": row.title,
+                                               "orders": 0, "paid": 0, "revenue": 0.0})
+        by_day.setdefault(str(row.day), {"day": str(row.day), "orders": 0, "paid": 0, "revenue": 0.0})
+        for item in (by_product[row.product_id], by_day[str(row.day)]):
+            item["orders"] += row.orders
+            item["paid"] += row.orders if row.status == "paid" else 0
+            item["revenue"] += row.revenue or 0
+
+    orders_count = sum(statuses.values())
+    revenue = sum(item["revenue"] for item in by_day.values())
+    for item in (*by_product.values(), *by_day.values()):
+        item["revenue"] = round(item["revenue"], 2)
+    analytics = {
+        "start": start,
+        "end": end,
+        "orders": orders_count,
+        "paid": statuses.get("paid", 0),
+        "pending": statuses.get("pending", 0),
+        "failed": statuses.get("failed", 0),
+        "expired": statuses.get("expired", 0),
+        "statuses": statuses,
+        "revenue": round(revenue, 2),
+        "conversion": round(statuses.get("paid", 0) / orders_count, 4) if orders_count else None,
+        "by_product": sorted(by_product.values(), key=lambda item: item["revenue"], reverse=True),
+        "by_day": [by_day[day_key] for day_key in sorted(by_day)],
+    }
+    analytics_cache.set(key, analytics, size=256 + 128 * (len(by_product) + len(by_day)))
+    return analytics
+
+
+@router.get("/export")
+async def export_orders(
+    format: Literal["ndjson", "csv"] = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)
+):
+    """
+    Выгрузка заказов клиента потоком (CSV или NDJSON), старые сначала.
+    Фильтры: created_at в [start, end), статус.
+    """
+    query = (
+        select(models.Order.id, models.Order.created_at, models.Order.status, models.Order.product_id,
+               models.Product.title.label("product_title"), models.Product.price.label("product_price"),
+               models.Order.telegram_chat_id)
+        .outerjoin(models.Product, models.Product.id == models.Order.product_id)
+        .where(models.Order.client_id == current_admin.client_id)
+    )
+    if start is not None:
+        query = query.where(models.Order.created_at >= utc_naive(start))
+    if end is not None:
+        query = query.where(models.Order.created_at < utc_naive(end))
+    if status is not None:
+        query = query.where(models.Order.status == status)
+    query = query.order_by(models.Order.created_at, models.Order.id)
+    return export_response(query, format, "orders")
 
 
 @router.get("/{order_id}", response_model=OrderDetailResponse)
-def get_order_detail(
+async def get_order_detail(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_admin: models.AdminUser = Depends(auth.get_current_admin)
+    db: AsyncSession = Depends(get_db),
+    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)
 ):
     """
     Получить детальную информацию о конкретном заказе.
     """
-    order = db.query(models.Order).filter(
-        models.Order.id == order_id,
-        models.Order.client_id == current_admin.client_id
-    ).first()
+    order = await _get_client_order(db, order_id, current_admin.client_id)
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
 
     # Если хотим вернуть расширенную информацию, 
     # например, название товара, цену. 
     # Можно джойнить Product или просто прочитать relationship:
-    product = db.query(models.Product).filter(models.Product.id == order.product_id).first()
+    product = await db.get(models.Product, order.product_id)
 
     return OrderDetailResponse(
         id=order.id,
@@ -82,25 +203,23 @@ def get_order_detail(
 
 
 @router.put("/{order_id}/status")
-def update_order_status(
+async def update_order_status(
     order_id: int,
     new_status: str,
-    db: Session = Depends(get_db),
-    current_admin: models.AdminUser = Depends(auth.get_current_admin)
+    db: AsyncSession = Depends(get_db),
+    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)
 ):
     """
     Опциональный метод: вручную поменять статус заказа.
     (Например, админ хочет отменить заказ)
     """
-    order = db.query(models.Order).filter(
-        models.Order.id == order_id,
-        models.Order.client_id == current_admin.client_id
-    ).first()
+    order = await _get_client_order(db, order_id, current_admin.client_id)
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
 
     order.status = new_status
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    analytics_cache.invalidate_client(current_admin.client_id)
+    await db.refresh(order)
 
     return {"detail": f"Статус заказа #{order_id} изменён на {new_status}"}
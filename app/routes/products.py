@@ -1,9 +1,14 @@
 # app/routes/products.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 from pydantic import BaseModel
-from .. import models, database, auth
+from .. import models, database, auth, counters, catalog, category_tree, product_import
+from ..cache import catalog_cache
+from ..database import get_db
+from ..export import export_response
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, split_page
 
 router = APIRouter()
 
@@ -32,67 +37,134 @@ class ProductResponse(BaseModel):
     class Config:
         orm_mode = True
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class ProductPage(BaseModel):
+    items: List[ProductResponse]
+    next_cursor: Optional[str] = None  # None — это последняя страница
+    total: Optional[int] = None        # только при with_total=true
+
+class ImportRowError(BaseModel):
+    row: int  # номер строки данных в файле (без заголовка CSV), с 1
+    error: str
+
+class ImportReport(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    categories_created: int
+    errors: List[ImportRowError]  # не больше IMPORT_MAX_ERRORS, полное число — failed
+
+async def _get_client_product(db: AsyncSession, product_id: int, client_id: int):
+    result = await db.execute(
+        select(models.Product).where(models.Product.id == product_id, models.Product.client_id == client_id)
+    )
+    return result.scalars().first()
 
 @router.post("/", response_model=ProductResponse)
-def create_product(product: ProductCreate, db: Session = Depends(get_db),
-                   current_admin: models.AdminUser = Depends(auth.get_current_admin)):
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_db),
+                         current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
     db_product = models.Product(
         **product.dict(),
         client_id=current_admin.client_id
     )
+    await catalog.touch(db, current_admin.client_id, db_product)
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await counters.bump(db, current_admin.client_id, counters.PRODUCTS, 1)
+    await db.commit()
+    catalog_cache.invalidate_client(current_admin.client_id)
+    await db.refresh(db_product)
     return db_product
 
-@router.get("/", response_model=List[ProductResponse])
-def read_products(category_id: int = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                  current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    query = db.query(models.Product).filter(models.Product.client_id == current_admin.client_id)
+@router.get("/", response_model=ProductPage)
+async def read_products(category_id: int = None, cursor: Optional[str] = None,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        with_total: bool = False, db: AsyncSession = Depends(get_db),
+                        current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Курсорная пагинация по id: next_cursor из ответа передаётся в следующий запрос.
+    """
+    query = select(models.Product).where(models.Product.client_id == current_admin.client_id)
     if category_id is not None:
-        query = query.filter(models.Product.category_id == category_id)
-    products = query.offset(skip).limit(limit).all()
-    return products
+        query = query.where(models.Product.category_id == category_id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(models.Product.id > last_id)
+    result = await db.execute(query.order_by(models.Product.id).limit(limit + 1))
+    products, has_more = split_page(result.scalars().all(), limit)
+
+    page = {"items": products, "next_cursor": encode_cursor(products[-1].id) if has_more else None}
+    if with_total:
+        # Счётчик ведётся по всем товарам клиента, без учёта фильтра category_id
+        page["total"] = await counters.get(db, current_admin.client_id, counters.PRODUCTS)
+    return page
+
+@router.post("/import", response_model=ImportReport)
+async def import_products(file: UploadFile = File(...), format: Literal["csv", "ndjson"] = "csv",
+                          db: AsyncSession = Depends(get_db),
+                          current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Массовая загрузка товаров из CSV/NDJSON (колонки — product_import.FIELDS).
+    Товар с уже известным external_key обновляется, остальные создаются;
+    недостающие категории (путь "Родитель/Дочерняя") создаются. Строки с ошибками
+    пропускаются и перечисляются в отчёте, остальные записываются. Файл, который
+    нельзя дочитать (не UTF-8, сломанный CSV), импортируется до места ошибки.
+    """
+    importer = product_import.ProductImport(db, current_admin.client_id)
+    try:
+        return await importer.run(product_import.read_rows(file.file, format))
+    finally:
+        catalog_cache.invalidate_client(current_admin.client_id)
+
+@router.get("/export")
+async def export_products(format: Literal["ndjson", "csv"] = "csv", db: AsyncSession = Depends(get_db),
+                          current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Все товары клиента потоком, в формате импорта: выгрузку можно отредактировать
+    и загрузить обратно через POST /import (товары без external_key при этом
+    создадутся заново).
+    """
+    paths = await category_tree.category_paths(db, current_admin.client_id)
+    query = (
+        select(models.Product.external_key, models.Product.title, models.Product.description,
+               models.Product.file_url, models.Product.file_size, models.Product.price,
+               models.Product.category_id)
+        .where(models.Product.client_id == current_admin.client_id)
+        .order_by(models.Product.id)
+    )
+    return export_response(query, format, "products", columns=list(product_import.FIELDS),
+                           transform=lambda row: (*row[:-1], paths.get(row[-1])))
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def read_product(product_id: int, db: Session = Depends(get_db),
-                 current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    product = db.query(models.Product)\
-                .filter(models.Product.id == product_id, models.Product.client_id == current_admin.client_id)\
-                .first()
+async def read_product(product_id: int, db: AsyncSession = Depends(get_db),
+                       current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    product = await _get_client_product(db, product_id, current_admin.client_id)
     if not product:
         raise HTTPException(status_code=404, detail="Продукт не найден")
     return product
 
 @router.put("/{product_id}", response_model=ProductResponse)
-def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db),
-                   current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    db_product = db.query(models.Product)\
-                   .filter(models.Product.id == product_id, models.Product.client_id == current_admin.client_id)\
-                   .first()
+async def update_product(product_id: int, product: ProductUpdate, db: AsyncSession = Depends(get_db),
+                         current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    db_product = await _get_client_product(db, product_id, current_admin.client_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Продукт не найден")
     update_data = product.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_product, key, value)
-    db.commit()
-    db.refresh(db_product)
+    await catalog.touch(db, current_admin.client_id, db_product)
+    await db.commit()
+    catalog_cache.invalidate_client(current_admin.client_id)
+    await db.refresh(db_product)
     return db_product
 
 @router.delete("/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db),
-                   current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    db_product = db.query(models.Product)\
-                   .filter(models.Product.id == product_id, models.Product.client_id == current_admin.client_id)\
-                   .first()
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db),
+                         current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    db_product = await _get_client_product(db, product_id, current_admin.client_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Продукт не найден")
-    db.delete(db_product)
-    db.commit()
+    await db.delete(db_product)
+    await counters.bump(db, current_admin.client_id, counters.PRODUCTS, -1)
+    await catalog.tombstone(db, current_admin.client_id, catalog.PRODUCT, product_id)
+    await db.commit()
+    catalog_cache.invalidate_client(current_admin.client_id)
     return {"detail": "Продукт удалён"}
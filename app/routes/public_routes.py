@@ -1,39 +1,178 @@
 # app/routes/public_routes.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from ..database import SessionLocal
+from .. import catalog, category_tree
+from ..cache import catalog_cache
+from ..database import get_db
 from ..models import Category, Product, Client
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Запись о клиенте в кэше маленькая — считаем её размер условно
+_CLIENT_ENTRY_SIZE = 256
 
-@router.get("/categories/")
-def public_categories(client_id: int, secret: str, db: Session = Depends(get_db)):
-    # Проверим, существует ли клиент
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if not client.bot_secret or client.bot_secret != secret:
+# Тела ответов кэшируются с версией каталога в ключе и отдаются только с ETag этой
+# версии. Версия в записи клиента прочитана из базы раньше, чем строится тело, поэтому
+# тело не старее своего ETag. Без версии в ключе воркер, у которого запись клиента и
+# тело истекают по TTL независимо, мог отдать старое тело с новым ETag, и бот получал
+# бы 304 на данные, которых у него нет.
+
+
+def _rows_to_json(rows) -> bytes:
+    """
+    Сериализуем строки целиком (все колонки таблицы), как раньше это делал FastAPI.
+    """
+    items = [{c.name: getattr(row, c.name) for c in row.__table__.columns} for row in rows]
+    return _to_json(items)
+
+
+def _to_json(data) -> bytes:
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+async def get_bot_client(db: AsyncSession, client_id: int, secret: str):
+    # Проверим, существует ли клиент и совпадает ли секрет бота (сначала — по кэшу)
+    client = catalog_cache.get((client_id, "client"))
+    if client is None:
+        db_client = await db.get(Client, client_id)
+        if not db_client:
+            raise HTTPException(status_code=404, detail="Client not found")
+        client = {"bot_secret": db_client.bot_secret, "catalog_version": db_client.catalog_version}
+        catalog_cache.set((client_id, "client"), client, size=_CLIENT_ENTRY_SIZE)
+    if not client["bot_secret"] or client["bot_secret"] != secret:
         raise HTTPException(status_code=403, detail="Forbidden: secret mismatch")
-    return db.query(Category).filter(Category.client_id == client_id).all()
+    return client
+
+
+def _etag(client_id: int, version: int) -> str:
+    # Все публичные ответы клиента меняются только вместе с версией каталога,
+    # так что её достаточно для ETag (URL различает сами ресурсы)
+    return f'"c{client_id}.v{version}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags or "*" in tags
+
+
+def _conditional(request: Request, client_id: int, version: int):
+    """
+    ETag ответа и готовый 304, если у бота актуальная версия (проверяется до
+    чтения строк каталога).
+    """
+    etag = _etag(client_id, version)
+    if _not_modified(request, etag):
+        return etag, Response(status_code=304, headers={"ETag": etag})
+    return etag, None
+
+
+def _json_response(body: bytes, etag: str) -> Response:
+    # no-cache: хранить можно, но перед использованием — перепроверить по ETag
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@router.get("/categories/")
+async def public_categories(request: Request, client_id: int, secret: str, db: AsyncSession = Depends(get_db)):
+    client = await get_bot_client(db, client_id, secret)
+    etag, not_modified = _conditional(request, client_id, client["catalog_version"])
+    if not_modified:
+        return not_modified
+
+    key = (client_id, "categories", client["catalog_version"])
+    body = catalog_cache.get(key)
+    if body is None:
+        result = await db.execute(select(Category).where(Category.client_id == client_id))
+        body = _rows_to_json(result.scalars().all())
+        catalog_cache.set(key, body)
+    return _json_response(body, etag)
+
+@router.get("/categories/tree/")
+async def public_category_tree(request: Request, client_id: int, secret: str, db: AsyncSession = Depends(get_db)):
+    """
+    Вложенное дерево категорий, у каждого узла product_count — товары во всём поддереве.
+    """
+    client = await get_bot_client(db, client_id, secret)
+    etag, not_modified = _conditional(request, client_id, client["catalog_version"])
+    if not_modified:
+        return not_modified
+
+    key = (client_id, "tree", client["catalog_version"])
+    body = catalog_cache.get(key)
+    if body is None:
+        body = _to_json(await category_tree.tree_with_counts(db, client_id))
+        catalog_cache.set(key, body)
+    return _json_response(body, etag)
 
 @router.get("/products/")
-def public_products(client_id: int, secret: str, category_id: Optional[int] = None, db: Session = Depends(get_db)):
-    # Проверка клиента
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    if not client.bot_secret or client.bot_secret != secret:
-        raise HTTPException(status_code=403, detail="Forbidden: secret mismatch")
+async def public_products(request: Request, client_id: int, secret: str, category_id: Optional[int] = None,
+                          db: AsyncSession = Depends(get_db)):
+    client = await get_bot_client(db, client_id, secret)
+    etag, not_modified = _conditional(request, client_id, client["catalog_version"])
+    if not_modified:
+        return not_modified
+
+    key = (client_id, "products", category_id or None, client["catalog_version"])
+    body = catalog_cache.get(key)
+    if body is None:
+        query = select(Product).where(Product.client_id == client_id)
+        if category_id:
+            query = query.where(Product.category_id == category_id)
+        result = await db.execute(query)
+        body = _rows_to_json(result.scalars().all())
+        catalog_cache.set(key, body)
+    return _json_response(body, etag)
+
+@router.get("/catalog/")
+async def public_catalog(request: Request, client_id: int, secret: str, db: AsyncSession = Depends(get_db)):
+    """
+    Снапшот всего каталога клиента (категории + товары) с его версией.
+    Дальше бот подтягивает только изменения через /catalog/changes/?since=version.
+    """
+    client = await get_bot_client(db, client_id, secret)
+    etag, not_modified = _conditional(request, client_id, client["catalog_version"])
+    if not_modified:
+        return not_modified
+
+    key = (client_id, "snapshot", client["catalog_version"])
+    body = catalog_cache.get(key)
+    if body is None:
+        body = _to_json(await catalog.snapshot(db, client_id, client["catalog_version"]))
+        catalog_cache.set(key, body)
+    return _json_response(body, etag)
+
+@router.get("/catalog/changes/")
+async def public_catalog_changes(request: Request, client_id: int, secret: str, since: int = Query(..., ge=0),
+                                 db: AsyncSession = Depends(get_db)):
+    """
+    Изменения каталога после версии since. reset=true — версия бота впереди
+    серверной (например, база пересоздана): нужно заново взять снапшот.
+    """
+    client = await get_bot_client(db, client_id, secret)
+    version = client["catalog_version"]
+    if since > version:
+        # Версия в кэше этого воркера могла отстать от записи в другом — сверяемся с базой
+        version = await catalog.get_version(db, client_id)
+    etag, not_modified = _conditional(request, client_id, version)
+    if not_modified:
+        return not_modified
+
+    if since >= version:
+        # Частый случай опроса — ничего не менялось; в базу не ходим
+        body = _to_json({"version": version, "since": since, "reset": since > version,
+                         "categories": [], "products": [], "deleted": {"categories": [], "products": []}})
+        return _json_response(body, etag)
 
-    query = db.query(Product).filter(Product.client_id == client_id)
-    if category_id:
-        query = query.filter(Product.category_id == category_id)
-    return query.all()
+    key = (client_id, "changes", since, version)
+    body = catalog_cache.get(key)
+    if body is None:
+        body = _to_json({**await catalog.changes(db, client_id, since, version), "reset": False})
+        catalog_cache.set(key, body)
+    return _json_response(body, etag)
@@ -1,9 +1,16 @@
 # app/routes/stats.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 from pydantic import BaseModel
 from .. import models, database, auth
+from ..database import get_db
+from ..export import export_response
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, split_page, utc_naive
+from ..stats_buffer import stats_buffer, hour_bucket, day_bucket
+from .public_routes import get_bot_client
 from sqlalchemy import func
 
 router = APIRouter()
@@ -16,35 +23,127 @@ class StatResponse(BaseModel):
     id: int
     event_type: str
     description: Optional[str] = None
-    timestamp: str
+    timestamp: datetime
 
     class Config:
         orm_mode = True
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.post("/", response_model=StatResponse)
-def create_stat(stat: StatCreate, db: Session = Depends(get_db)):
-    db_stat = models.Stat(**stat.dict())
-    db.add(db_stat)
-    db.commit()
-    db.refresh(db_stat)
-    return db_stat
-
-@router.get("/", response_model=List[StatResponse])
-def get_stats(db: Session = Depends(get_db),
-              current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    stats = db.query(models.Stat).all()
-    return stats
+class StatPage(BaseModel):
+    items: List[StatResponse]
+    next_cursor: Optional[str] = None  # None — это последняя страница
+
+class StatPoint(BaseModel):
+    bucket: datetime
+    event_type: str
+    events: int
+
+# Сколько событий можно прислать одним /batch
+STATS_BATCH_MAX = 1000
+# Не больше точек на один запрос временного ряда
+TIMESERIES_MAX_BUCKETS = 5000
+
+# granularity -> (таблица счётчиков, округление до bucket, шаг, диапазон по умолчанию)
+_ROLLUPS = {
+    "hour": (models.StatHourly, hour_bucket, timedelta(hours=1), timedelta(days=2)),
+    "day": (models.StatDaily, day_bucket, timedelta(days=1), timedelta(days=30)),
+}
+
+@router.post("/", status_code=202)
+async def create_stat(stat: StatCreate, client_id: int, secret: str, db: AsyncSession = Depends(get_db)):
+    """
+    Событие от бота клиента (client_id + secret, как в /api/public). Принимается
+    в буфер (app/stats_buffer.py) и пишется в базу пачкой в течение
+    STATS_FLUSH_INTERVAL секунд.
+    """
+    await get_bot_client(db, client_id, secret)
+    return {"accepted": stats_buffer.add([{**stat.dict(), "client_id": client_id}])}
+
+@router.post("/batch", status_code=202)
+async def create_stats_batch(stats: List[StatCreate], client_id: int, secret: str,
+                             db: AsyncSession = Depends(get_db)):
+    if len(stats) > STATS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Не больше {STATS_BATCH_MAX} событий за запрос")
+    await get_bot_client(db, client_id, secret)
+    return {"accepted": stats_buffer.add([{**stat.dict(), "client_id": client_id} for stat in stats])}
+
+@router.get("/", response_model=StatPage)
+async def get_stats(cursor: Optional[str] = None,
+                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                    db: AsyncSession = Depends(get_db),
+                    current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Сырые события клиента постранично (курсор по id). Всё сразу — через /export.
+    """
+    query = select(models.Stat).where(models.Stat.client_id == current_admin.client_id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(models.Stat.id > last_id)
+    result = await db.execute(query.order_by(models.Stat.id).limit(limit + 1))
+    stats, has_more = split_page(result.scalars().all(), limit)
+    return {"items": stats, "next_cursor": encode_cursor(stats[-1].id) if has_more else None}
+
+@router.get("/export")
+async def export_stats(format: Literal["ndjson", "csv"] = "ndjson",
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       event_type: Optional[str] = None,
+                       current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Выгрузка сырых событий клиента потоком (NDJSON или CSV) за [start, end) (UTC).
+    """
+    query = (
+        select(models.Stat.id, models.Stat.timestamp, models.Stat.event_type, models.Stat.description)
+        .where(models.Stat.client_id == current_admin.client_id)
+    )
+    if start is not None:
+        query = query.where(models.Stat.timestamp >= utc_naive(start))
+    if end is not None:
+        query = query.where(models.Stat.timestamp < utc_naive(end))
+    if event_type is not None:
+        query = query.where(models.Stat.event_type == event_type)
+    return export_response(query.order_by(models.Stat.timestamp, models.Stat.id), format, "stats")
 
 @router.get("/summary")
-def get_stats_summary(db: Session = Depends(get_db),
-                      current_admin: models.AdminUser = Depends(auth.get_current_admin)):
-    summary = db.query(models.Stat.event_type, func.count(models.Stat.id))\
-                .group_by(models.Stat.event_type).all()
-    return {event: count for event, count in summary}
+async def get_stats_summary(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            db: AsyncSession = Depends(get_db),
+                            current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Число событий каждого типа по суточным счётчикам клиента. start/end (UTC)
+    ограничивают период с точностью до суток: [сутки start, end).
+    """
+    start, end = utc_naive(start), utc_naive(end)
+    query = (
+        select(models.StatDaily.event_type, func.sum(models.StatDaily.events))
+        .where(models.StatDaily.client_id == current_admin.client_id)
+        .group_by(models.StatDaily.event_type)
+    )
+    if start is not None:
+        query = query.where(models.StatDaily.bucket >= day_bucket(start))
+    if end is not None:
+        query = query.where(models.StatDaily.bucket < end)
+    result = await db.execute(query)
+    return {event: count for event, count in result.all()}
+
+@router.get("/timeseries", response_model=List[StatPoint])
+async def get_stats_timeseries(granularity: Literal["hour", "day"] = "hour",
+                               start: Optional[datetime] = None, end: Optional[datetime] = None,
+                               event_type: Optional[str] = None, db: AsyncSession = Depends(get_db),
+                               current_admin: auth.AdminPrincipal = Depends(auth.get_current_admin)):
+    """
+    Число событий по часам или суткам за [start, end) (UTC). По умолчанию —
+    последние 2 дня по часам / 30 дней по суткам. Пустые интервалы не возвращаются.
+    """
+    model, bucket, step, default_span = _ROLLUPS[granularity]
+    end = utc_naive(end) or datetime.utcnow()
+    start = bucket(utc_naive(start) or end - default_span)
+    if (end - start) / step > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail="Слишком большой период для такой детализации")
+
+    query = (
+        select(model.bucket, model.event_type, model.events)
+        .where(model.client_id == current_admin.client_id, model.bucket >= start, model.bucket < end)
+        .order_by(model.bucket, model.event_type)
+    )
+    if event_type is not None:
+        query = query.where(model.event_type == event_type)
+    result = await db.execute(query)
+    return [{"bucket": ts, "event_type": kind, "events": n} for ts, kind, n in result.all()]
@@ -0,0 +1,167 @@
+# app/stats_buffer.py
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from . import models
+from .counters import upsert
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+STATS_BATCH_SIZE = int(os.environ.get("STATS_BATCH_SIZE", "500"))
+STATS_FLUSH_INTERVAL = float(os.environ.get("STATS_FLUSH_INTERVAL", "1.0"))
+STATS_MAX_QUEUE = int(os.environ.get("STATS_MAX_QUEUE", "50000"))
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def bump_rollups(db, events: list):
+    """
+    Прибавляет пачку событий к часовым и суточным счётчикам (stats_hourly /
+    stats_daily): одна строка upsert на (клиент, тип, bucket), а не на событие.
+    """
+    for model, bucket in ((models.StatHourly, hour_bucket), (models.StatDaily, day_bucket)):
+        totals = Counter((e["client_id"], e["event_type"], bucket(e["timestamp"])) for e in events)
+        table = model.__table__
+        stmt = upsert(db, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.client_id, table.c.event_type, table.c.bucket],
+            set_={"events": table.c.events + stmt.excluded.events},
+        )
+        await db.execute(stmt, [
+            {"client_id": client_id, "event_type": event_type, "bucket": ts, "events": n}
+            for (client_id, event_type, ts), n in totals.items()
+        ])
+
+
+class StatsBuffer:
+    """
+    Write-behind буфер событий статистики.
+
+    add() только кладёт события в память и сразу возвращает управление; фоновая
+    задача пишет их пачками (один multi-row INSERT и один коммит на пачку), как
+    только набралось batch_size событий или прошло flush_interval секунд. В той же
+    транзакции обновляются часовые/суточные счётчики (bump_rollups).
+    При остановке приложения stop() дописывает всё, что осталось.
+
+    Буфер живёт в процессе: события, принятые, но ещё не записанные, теряются
+    при аварийном падении воркера (не больше flush_interval секунд данных).
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._pending = []
+        self._wake = None  # asyncio.Event создаётся в start(), уже внутри цикла событий
+        self._task = None
+        self._stopping = False
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self._flush_seconds = 0.0
+
+    def add(self, events: list) -> int:
+        """
+        Принимает события (dict с полями Stat). Если очередь переполнена (база не
+        успевает), отвечаем 503 — лучше отказать клиенту, чем съесть всю память.
+        """
+        if len(self._pending) + len(events) > self.max_queue:
+            self.rejected += len(events)
+            raise HTTPException(status_code=503, detail="Очередь статистики переполнена, повторите позже")
+        now = datetime.utcnow()
+        for event in events:
+            self._pending.append({**event, "timestamp": now})
+        self.accepted += len(events)
+        self.max_depth = max(self.max_depth, len(self._pending))
+        if len(self._pending) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return len(events)
+
+    def start(self):
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+        else:
+            await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+        await self.flush()
+
+    async def flush(self):
+        """
+        Пишет накопленное пачками по batch_size. При ошибке базы пачка
+        возвращается в начало очереди и будет повторена на следующем тике.
+        """
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            started = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(models.Stat), batch)
+                    await bump_rollups(db, batch)
+                    await db.commit()
+            except Exception:
+                self.errors += 1
+                self._pending[:0] = batch
+                logger.exception("Не удалось записать пачку статистики (%d событий)", len(batch))
+                return
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.written += len(batch)
+            self.last_flush_ms = round(elapsed_ms, 2)
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._flush_seconds += elapsed_ms / 1000
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self.max_depth,
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self._flush_seconds / self.flushes * 1000, 2) if self.flushes else None,
+        }
+
+
+stats_buffer = StatsBuffer(STATS_BATCH_SIZE, STATS_FLUSH_INTERVAL, STATS_MAX_QUEUE)
@@ -1,10 +1,10 @@
 
 # create_admin.py (это отдельно для создания пользователей)
 from app import models, auth, database
-from app.database import SessionLocal, engine, Base, get_db
+from app.database import SessionLocal
 import secrets
 
-Base.metadata.create_all(bind=engine)
+# Таблицы должны быть созданы заранее: alembic upgrade head
 
 def create_admin(username, password, client_name):
     db = SessionLocal()
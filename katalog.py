@@ -1,13 +1,17 @@
 # katalog.py служит в 1ю очередь для создания image который создается с помощью файла, затем оператор.py этими image создает ботов как я понимаю)
+import asyncio
 import logging
 import os
-import requests
+import time
 
+import httpx
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, ContextTypes
 
 logging.basicConfig(level=logging.INFO)
+# httpx пишет в INFO каждый запрос — и к API, и к Telegram
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # Загружаем .env
 load_dotenv()
@@ -17,34 +21,274 @@ API_BASE_URL = os.environ.get("API_BASE_URL", "http://localhost:8000/api")
 CLIENT_ID = os.environ.get("CLIENT_ID")
 BOT_SECRET = os.environ.get("BOT_SECRET")
 
+# Запросы к API идут через один httpx.AsyncClient на процесс (keep-alive пул, таймауты),
+# не больше API_CONCURRENCY одновременно — медленный бэкенд не останавливает цикл событий,
+# а всплеск пользователей не открывает сотни соединений. Клиент создаётся в post_init
+# приложения и закрывается в post_shutdown.
+API_CONNECT_TIMEOUT = float(os.environ.get("API_CONNECT_TIMEOUT", "3"))
+API_READ_TIMEOUT = float(os.environ.get("API_READ_TIMEOUT", "10"))
+API_MAX_CONNECTIONS = int(os.environ.get("API_MAX_CONNECTIONS", "50"))
+API_MAX_KEEPALIVE = int(os.environ.get("API_MAX_KEEPALIVE", "20"))
+API_CONCURRENCY = int(os.environ.get("API_CONCURRENCY", "50"))
+# Сколько апдейтов Telegram обрабатывается параллельно (по умолчанию PTB — по одному)
+BOT_CONCURRENT_UPDATES = int(os.environ.get("BOT_CONCURRENT_UPDATES", "256"))
+
+# Каталог и способы оплаты обновляются фоновой задачей раз в BOT_CACHE_REFRESH секунд (0 — без
+# фоновой задачи); обработчики идут в API, только если данные старше BOT_CACHE_TTL (например,
+# API был недоступен). Обычное нажатие кнопки обходится без запросов к API.
+BOT_CACHE_REFRESH = float(os.environ.get("BOT_CACHE_REFRESH", "30"))
+BOT_CACHE_TTL = float(os.environ.get("BOT_CACHE_TTL", "120"))
+
+api = {"client": None, "limit": None}
+
+# Локальная копия каталога клиента: один раз берём снапшот, дальше — только изменения по версии.
+# etag — ETag последнего ответа: с If-None-Match API отвечает 304 без тела, если каталог не менялся
+catalog = {"version": None, "etag": None, "categories": {}, "products": {}, "synced_at": None}
+# Построенное по каталогу версии version: счётчики поддеревьев, дочерние категории и товары
+# по категориям, готовые клавиатуры. Строится лениво, сбрасывается при смене версии.
+# InlineKeyboardMarkup неизменяемы, один объект можно отдавать во все чаты.
+views = {"version": None, "counts": {}, "children": {}, "products": {}, "markups": {}}
+# Способы оплаты клиента (GET /payment/) и клавиатуры выбора способа по товарам
+payments = {"configs": None, "fetched_at": None, "markups": {}}
+_inflight = {}
+_refresh = {"task": None, "stop": None}
+
+def make_api_client(transport=None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        timeout=httpx.Timeout(API_READ_TIMEOUT, connect=API_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=API_MAX_CONNECTIONS, max_keepalive_connections=API_MAX_KEEPALIVE),
+        transport=transport,
+    )
+
+async def post_init(application):
+    api["client"] = make_api_client()
+    api["limit"] = asyncio.Semaphore(API_CONCURRENCY)
+    # Прогрев: первые пользователи не ждут снапшот. API недоступен — не страшно,
+    # обработчики загрузят сами.
+    await refresh_cache()
+    if BOT_CACHE_REFRESH > 0:
+        _refresh["stop"] = asyncio.Event()
+        _refresh["task"] = asyncio.create_task(_refresh_loop())
+
+async def post_shutdown(application):
+    if _refresh["task"] is not None:
+        _refresh["stop"].set()
+        await _refresh["task"]
+        _refresh["task"] = None
+    if api["client"] is not None:
+        await api["client"].aclose()
+        api["client"] = None
+
+async def api_request(method, path, **kwargs) -> httpx.Response:
+    """
+    Запрос к API (path относительно API_BASE_URL) через общий клиент.
+    """
+    async with api["limit"]:
+        return await api["client"].request(method, path, **kwargs)
+
+async def single_flight(key, factory):
+    """
+    Запрос key, который уже идёт, не запускается второй раз: одновременные вызовы
+    ждут его результат (а ответы не применяются к кэшу не по порядку).
+    """
+    task = _inflight.get(key)
+    if task is None or task.done():
+        task = _inflight[key] = asyncio.ensure_future(factory())
+    return await asyncio.shield(task)
+
+def is_stale(updated_at):
+    return updated_at is None or time.monotonic() - updated_at > BOT_CACHE_TTL
+
+async def refresh_cache():
+    for name, refresh in (("каталога", sync_catalog), ("способов оплаты", fetch_payment_configs)):
+        try:
+            await refresh()
+        except Exception as e:
+            logging.warning("Не удалось обновить кэш %s: %s", name, e)
+
+async def _refresh_loop():
+    while not _refresh["stop"].is_set():
+        try:
+            await asyncio.wait_for(_refresh["stop"].wait(), timeout=BOT_CACHE_REFRESH)
+        except asyncio.TimeoutError:
+            pass
+        if _refresh["stop"].is_set():
+            break
+        await refresh_cache()
+
+async def fresh_catalog():
+    if is_stale(catalog["synced_at"]):
+        try:
+            await sync_catalog()
+        except Exception as e:
+            if catalog["version"] is None:
+                raise
+            logging.warning("API недоступен, каталог из кэша: %s", e)
+
+async def sync_catalog():
+    await single_flight("catalog", _sync_catalog)
+    catalog["synced_at"] = time.monotonic()
+
+async def _sync_catalog():
+    """
+    Синхронизирует локальный каталог с API:
+    - первый раз (или при reset) — снапшот /public/catalog/;
+    - дальше — /public/catalog/changes/?since=<версия>, обычно 304 Not Modified.
+    """
+    auth_params = {"client_id": CLIENT_ID, "secret": BOT_SECRET}
+    headers = {"If-None-Match": catalog["etag"]} if catalog["etag"] else {}
+    if catalog["version"] is not None:
+        response = await api_request("GET", "/public/catalog/changes/",
+                                     params={**auth_params, "since": catalog["version"]}, headers=headers)
+        if response.status_code == 304:
+            return
+        response.raise_for_status()
+        changes = response.json()
+        if not changes["reset"]:
+            for cat in changes["categories"]:
+                catalog["categories"][cat["id"]] = cat
+            for prod in changes["products"]:
+                catalog["products"][prod["id"]] = prod
+            for cat_id in changes["deleted"]["categories"]:
+                catalog["categories"].pop(cat_id, None)
+            for prod_id in changes["deleted"]["products"]:
+                catalog["products"].pop(prod_id, None)
+            catalog["version"] = changes["version"]
+            catalog["etag"] = response.headers.get("ETag")
+            return
+
+    response = await api_request("GET", "/public/catalog/", params=auth_params, headers=headers)
+    if response.status_code == 304:
+        return
+    response.raise_for_status()
+    snapshot = response.json()
+    catalog["categories"] = {cat["id"]: cat for cat in snapshot["categories"]}
+    catalog["products"] = {prod["id"]: prod for prod in snapshot["products"]}
+    catalog["version"] = snapshot["version"]
+    catalog["etag"] = response.headers.get("ETag")
+    views["version"] = None  # снапшот мог прийти с той же версией, что была
+
+def subtree_counts():
+    """
+    Число товаров в поддереве каждой категории — по локальному каталогу, без запросов к API.
+    """
+    categories = catalog["categories"]
+    counts = {cat_id: 0 for cat_id in categories}
+    for prod in catalog["products"].values():
+        cat_id, seen = prod["category_id"], set()
+        while cat_id in counts and cat_id not in seen:
+            counts[cat_id] += 1
+            seen.add(cat_id)
+            cat_id = categories[cat_id]["parent_id"]
+    return counts
+
+def catalog_view():
+    """
+    Индексы каталога текущей версии (перестраиваются один раз на версию).
+    """
+    if views["version"] != catalog["version"]:
+        children, products = {}, {}
+        for cat in sorted(catalog["categories"].values(), key=lambda cat: cat["id"]):
+            children.setdefault(cat["parent_id"], []).append(cat)
+        for prod in sorted(catalog["products"].values(), key=lambda prod: prod["id"]):
+            products.setdefault(prod["category_id"], []).append(prod)
+        views.update(version=catalog["version"], counts=subtree_counts(), children=children,
+                     products=products, markups={})
+    return views
+
+def category_buttons(parent_id):
+    """
+    Кнопки подкатегорий parent_id (None — корень) в виде "Книги (124)".
+    """
+    view = catalog_view()
+    counts = view["counts"]
+    children = view["children"].get(parent_id, [])
+    return [
+        [InlineKeyboardButton(f"{cat['name']} ({counts[cat['id']]})", callback_data=f"category_{cat['id']}")]
+        for cat in children
+    ]
+
+def category_markup(cat_id):
+    """
+    Клавиатура категории cat_id (None — корень): подкатегории, товары самой категории
+    и "Назад". None, если показать нечего. Запоминается до смены версии каталога.
+    """
+    view = catalog_view()
+    if cat_id not in view["markups"]:
+        keyboard = category_buttons(cat_id)
+        if cat_id is not None:
+            products = view["products"].get(cat_id, [])
+            for prod in products:
+                keyboard.append([InlineKeyboardButton(prod["title"], callback_data=f"product_{prod['id']}")])
+            if keyboard:
+                category = catalog["categories"].get(cat_id)
+                parent_id = category["parent_id"] if category else None
+                back = f"category_{parent_id}" if parent_id in catalog["categories"] else "root"
+                keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data=back)])
+        view["markups"][cat_id] = InlineKeyboardMarkup(keyboard) if keyboard else None
+    return view["markups"][cat_id]
+
+async def payment_configs():
+    """
+    Способы оплаты клиента из кэша; из API — только если кэш пуст или устарел.
+    """
+    if is_stale(payments["fetched_at"]):
+        try:
+            await fetch_payment_configs()
+        except Exception as e:
+            if payments["configs"] is None:
+                raise
+            logging.warning("API недоступен, способы оплаты из кэша: %s", e)
+    return payments["configs"]
+
+async def fetch_payment_configs():
+    await single_flight("payments", _fetch_payment_configs)
+
+async def _fetch_payment_configs():
+    headers = {"Authorization": f"Bearer {BOT_SECRET}"}
+    resp = await api_request("GET", "/payment/", headers=headers)
+    resp.raise_for_status()
+    configs = resp.json()  # список провайдеров
+    if configs != payments["configs"]:
+        payments["markups"] = {}
+    payments["configs"] = configs
+    payments["fetched_at"] = time.monotonic()
+
+def payment_markup(prod_id):
+    """
+    Кнопки выбора способа оплаты товара. Запоминаются только для товаров из каталога:
+    callback_data приходит от пользователя, произвольные id не должны копиться в памяти.
+    """
+    markup = payments["markups"].get(prod_id)
+    if markup is None:
+        markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton(f"Оплата через {cfg['provider_name'].title()}",
+                                  callback_data=f"pay_{prod_id}_{cfg['provider_name']}")]
+            for cfg in payments["configs"]
+        ])
+        if prod_id.isdigit() and int(prod_id) in catalog["products"]:
+            payments["markups"][prod_id] = markup
+    return markup
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /start:
-    1. Загружаем список категорий (public/categories/?client_id=...)
-    2. Показываем кнопки с категориями.
+    1. Берём локальный каталог (синхронизируем, если он устарел — fresh_catalog)
+    2. Показываем кнопки с категориями верхнего уровня.
     """
     try:
-        url = f"{API_BASE_URL}/public/categories/?client_id={CLIENT_ID}&secret={BOT_SECRET}"
-        response = requests.get(url)
-        response.raise_for_status()
-        categories = response.json()
+        await fresh_catalog()
+        reply_markup = category_markup(None)
     except Exception as e:
         logging.error("Ошибка при получении категорий: %s", e)
         await update.message.reply_text("Ошибка загрузки данных (категорий).")
         return
 
-    if not categories:
+    if reply_markup is None:
         await update.message.reply_text("Категории не найдены.")
         return
 
-    # Формируем inline-кнопки для категорий
-    keyboard = []
-    for cat in categories:
-        keyboard.append([
-            InlineKeyboardButton(cat["name"], callback_data=f"category_{cat['id']}")
-        ])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text("Выберите категорию:", reply_markup=reply_markup)
 
 async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -55,71 +299,56 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     data = query.data
 
-    # Нажали на "category_{cat_id}"
-    if data.startswith("category_"):
-        cat_id = data.split("_")[1]
+    # Нажали "Назад" на верхнем уровне
+    if data == "root":
+        reply_markup = category_markup(None)
+        if reply_markup is None:
+            await query.edit_message_text("Категории не найдены.")
+            return
+        await query.edit_message_text("Выберите категорию:", reply_markup=reply_markup)
+
+    # Нажали на "category_{cat_id}": подкатегории (со счётчиками) + товары самой категории
+    elif data.startswith("category_"):
+        cat_id = int(data.split("_")[1])
         try:
-            url = f"{API_BASE_URL}/public/products/?client_id={CLIENT_ID}&secret={BOT_SECRET}&category_id={cat_id}"
-            response = requests.get(url)
-            response.raise_for_status()
-            products = response.json()
+            await fresh_catalog()
+            reply_markup = category_markup(cat_id)
         except Exception as e:
             logging.error("Ошибка при получении продуктов: %s", e)
             await query.edit_message_text("Ошибка загрузки продуктов.")
             return
 
-        if not products:
+        if reply_markup is None:
             await query.edit_message_text("В этой категории нет товаров.")
             return
 
-        keyboard = []
-        for prod in products:
-            keyboard.append([
-                InlineKeyboardButton(prod["title"], callback_data=f"product_{prod['id']}")
-            ])
-        reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text("Выберите продукт:", reply_markup=reply_markup)
 
     # Нажали на "product_{prod_id}"
     elif data.startswith("product_"):
         prod_id = data.split("_")[1]
 
-        # 1) Получаем список методов оплаты /payment/
-        #    (Можно брать без авторизации? Или мы сказали, что BOT_SECRET = Bearer?)
-        #    Сейчас используем авторизацию через BOT_SECRET:
-        payment_list_url = f"{API_BASE_URL}/payment/"
-        headers = {"Authorization": f"Bearer {BOT_SECRET}"}
-
+        # 1) Список методов оплаты /payment/ (авторизация через BOT_SECRET) — из кэша
         try:
-            resp = requests.get(payment_list_url, headers=headers)
-            resp.raise_for_status()
-            payment_configs = resp.json()  # список провайдеров
+            configs = await payment_configs()
         except Exception as e:
             logging.error("Ошибка при получении списка провайдеров: %s", e)
             await query.edit_message_text("Ошибка при загрузке методов оплаты.")
             return
 
         # Если нет ни одного метода оплаты у клиента:
-        if not payment_configs:
+        if not configs:
             await query.edit_message_text("Нет доступных способов оплаты.")
             return
 
         # Если только один способ оплаты — сразу создаём оплату
-        if len(payment_configs) == 1:
-            provider_name = payment_configs[0]["provider_name"]
+        if len(configs) == 1:
+            provider_name = configs[0]["provider_name"]
             await create_payment_and_show_link(query, prod_id, provider_name)
             return
         else:
             # Иначе предлагаем кнопки для выбора провайдера
-            keyboard = []
-            for cfg in payment_configs:
-                provider_name = cfg["provider_name"]
-                btn_text = f"Оплата через {provider_name.title()}"
-                callback = f"pay_{prod_id}_{provider_name}"
-                keyboard.append([InlineKeyboardButton(btn_text, callback_data=callback)])
-
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text("Выберите способ оплаты:", reply_markup=reply_markup)
+            await query.edit_message_text("Выберите способ оплаты:", reply_markup=payment_markup(prod_id))
 
     # Нажали на "pay_{prod_id}_{provider_name}"
     elif data.startswith("pay_"):
@@ -141,12 +370,13 @@ async def create_payment_and_show_link(query, product_id, provider_name):
     Общая функция для создания оплаты через API и отправки ссылки пользователю.
     """
     try:
-        url = f"{API_BASE_URL}/payment/create_payment/"
         headers = {"Authorization": f"Bearer {BOT_SECRET}"}
         # Параметры для POST
-        params = {"product_id": int(product_id), "provider_name": provider_name}
+        # telegram_chat_id — сюда API пришлёт уведомление об оплате
+        params = {"product_id": int(product_id), "provider_name": provider_name,
+                  "telegram_chat_id": query.message.chat_id}
 
-        response = requests.post(url, headers=headers, json=params)
+        response = await api_request("POST", "/payment/create_payment/", headers=headers, json=params)
         response.raise_for_status()
         resp_data = response.json()
         payment_url = resp_data["payment_url"]
@@ -169,7 +399,14 @@ def main():
         logging.error("Не найден TELEGRAM_BOT_TOKEN в окружении!")
         exit(1)
 
-    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(BOT_CONCURRENT_UPDATES)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CallbackQueryHandler(button))
 
@@ -0,0 +1,52 @@
+# migrations/env.py (окружение alembic: берём URL и метаданные из приложения)
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import models  # noqa: F401  регистрирует все таблицы в Base.metadata
+from app.database import Base, SQLALCHEMY_DATABASE_URL, make_engine
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# URL можно переопределить (например, из скриптов): Config.set_main_option("sqlalchemy.url", ...)
+DATABASE_URL = config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL
+
+
+def run_migrations_offline():
+    """
+    Генерация SQL без подключения к базе: alembic upgrade head --sql
+    """
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = make_engine(DATABASE_URL)
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite не умеет ALTER большинства вещей — alembic пересоздаёт таблицы (batch mode)
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
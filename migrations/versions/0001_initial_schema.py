@@ -0,0 +1,109 @@
+"""initial schema (то, что раньше создавал Base.metadata.create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+На уже существующей базе (shop.db, созданной через create_all) таблицы не трогаем,
+создаём только отсутствующие — после этого база считается на ревизии 0001.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "clients" not in existing:
+        op.create_table(
+            "clients",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False, unique=True),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("telegram_token", sa.String()),
+            sa.Column("payment_provider", sa.String()),
+            sa.Column("payment_provider_token", sa.String()),
+            sa.Column("bot_status", sa.String()),
+            sa.Column("bot_secret", sa.String()),
+        )
+        op.create_index("ix_clients_id", "clients", ["id"])
+
+    if "admin_users" not in existing:
+        op.create_table(
+            "admin_users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("telegram_id", sa.String()),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_admin_users_id", "admin_users", ["id"])
+        op.create_index("ix_admin_users_username", "admin_users", ["username"], unique=True)
+
+    if "categories" not in existing:
+        op.create_table(
+            "categories",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("parent_id", sa.Integer(), sa.ForeignKey("categories.id")),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        )
+        op.create_index("ix_categories_id", "categories", ["id"])
+
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("file_url", sa.String(), nullable=False),
+            sa.Column("file_size", sa.Float()),
+            sa.Column("price", sa.Float(), nullable=False),
+            sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id")),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        )
+        op.create_index("ix_products_id", "products", ["id"])
+
+    if "payment_config" not in existing:
+        op.create_table(
+            "payment_config",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("provider_name", sa.String(), nullable=False, unique=True),
+            sa.Column("api_key", sa.String(), nullable=False),
+            sa.Column("extra_config", sa.Text()),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        )
+        op.create_index("ix_payment_config_id", "payment_config", ["id"])
+
+    if "stats" not in existing:
+        op.create_table(
+            "stats",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("event_type", sa.String(), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("timestamp", sa.DateTime()),
+        )
+        op.create_index("ix_stats_id", "stats", ["id"])
+
+    if "orders" not in existing:
+        op.create_table(
+            "orders",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=False),
+            sa.Column("status", sa.String()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_orders_id", "orders", ["id"])
+
+
+def downgrade():
+    for table in ("orders", "stats", "payment_config", "products", "categories", "admin_users", "clients"):
+        op.drop_table(table)
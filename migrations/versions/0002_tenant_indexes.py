@@ -0,0 +1,109 @@
+"""tenant-aware indexes, orders primary key fix, payment_config unique per client
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+- orders: первичный ключ только по id (раньше модель объявляла составной
+  (id, telegram_chat_id) — id переставал быть автоинкрементным), telegram_chat_id
+  становится обычной nullable-колонкой BIGINT (id чатов Telegram не влезают в INT).
+- payment_config: provider_name уникален в рамках клиента, а не глобально.
+- составные индексы под фильтры роутов (client_id идёт первым).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _orders_table(metadata):
+    return sa.Table(
+        "orders", metadata,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("telegram_chat_id", sa.BigInteger(), nullable=True),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=False),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Index("ix_orders_id", "id"),
+    )
+
+
+def _payment_config_table(metadata):
+    return sa.Table(
+        "payment_config", metadata,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("provider_name", sa.String(), nullable=False),
+        sa.Column("api_key", sa.String(), nullable=False),
+        sa.Column("extra_config", sa.Text()),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        sa.Index("ix_payment_config_id", "id"),
+    )
+
+
+def _fix_orders(bind, inspector):
+    columns = {c["name"] for c in inspector.get_columns("orders")}
+    if "telegram_chat_id" not in columns:
+        op.add_column("orders", sa.Column("telegram_chat_id", sa.BigInteger(), nullable=True))
+
+    pk = inspector.get_pk_constraint("orders")
+    if pk["constrained_columns"] == ["id"]:
+        return
+
+    if bind.dialect.name == "sqlite":
+        # Пересоздаём таблицу с PRIMARY KEY (id) — id снова становится rowid/автоинкрементом
+        with op.batch_alter_table("orders", recreate="always", copy_from=_orders_table(sa.MetaData())):
+            pass
+    else:
+        op.drop_constraint(pk["name"], "orders", type_="primary")
+        op.create_primary_key("orders_pkey", "orders", ["id"])
+        op.alter_column("orders", "telegram_chat_id", type_=sa.BigInteger(), nullable=True)
+        # У составного ключа не было SERIAL — заводим последовательность для id
+        op.execute("CREATE SEQUENCE IF NOT EXISTS orders_id_seq OWNED BY orders.id")
+        op.execute("ALTER TABLE orders ALTER COLUMN id SET DEFAULT nextval('orders_id_seq')")
+        op.execute("SELECT setval('orders_id_seq', COALESCE((SELECT MAX(id) FROM orders), 0) + 1, false)")
+
+
+def _fix_payment_config_unique(bind, inspector):
+    global_unique = [
+        uc for uc in inspector.get_unique_constraints("payment_config")
+        if uc["column_names"] == ["provider_name"]
+    ]
+    if not global_unique:
+        return
+    if bind.dialect.name == "sqlite":
+        # В SQLite ограничение безымянное — пересоздаём таблицу без него
+        with op.batch_alter_table("payment_config", recreate="always",
+                                  copy_from=_payment_config_table(sa.MetaData())):
+            pass
+    else:
+        op.drop_constraint(global_unique[0]["name"], "payment_config", type_="unique")
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    _fix_orders(bind, inspector)
+    _fix_payment_config_unique(bind, inspector)
+
+    op.create_index("ix_products_client_id_category_id", "products", ["client_id", "category_id"])
+    op.create_index("ix_categories_client_id_parent_id", "categories", ["client_id", "parent_id"])
+    op.create_index("ix_orders_client_id_created_at", "orders", ["client_id", "created_at"])
+    op.create_index("ix_orders_client_id_status", "orders", ["client_id", "status"])
+    op.create_index("uq_payment_config_client_id_provider_name", "payment_config",
+                    ["client_id", "provider_name"], unique=True)
+    op.create_index("ix_stats_event_type_timestamp", "stats", ["event_type", "timestamp"])
+
+
+def downgrade():
+    op.drop_index("ix_stats_event_type_timestamp", table_name="stats")
+    op.drop_index("uq_payment_config_client_id_provider_name", table_name="payment_config")
+    op.drop_index("ix_orders_client_id_status", table_name="orders")
+    op.drop_index("ix_orders_client_id_created_at", table_name="orders")
+    op.drop_index("ix_categories_client_id_parent_id", table_name="categories")
+    op.drop_index("ix_products_client_id_category_id", table_name="products")
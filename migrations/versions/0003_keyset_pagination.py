@@ -0,0 +1,45 @@
+"""keyset pagination indexes and per-client row counters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+- индексы (client_id, id) для товаров/категорий и (client_id, created_at, id)
+  для заказов — ключи сортировки курсорной пагинации;
+- таблица client_counters, заполняется текущими COUNT(*) по клиентам.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_products_client_id_id", "products", ["client_id", "id"])
+    op.create_index("ix_categories_client_id_id", "categories", ["client_id", "id"])
+    op.drop_index("ix_orders_client_id_created_at", table_name="orders")
+    op.create_index("ix_orders_client_id_created_at_id", "orders", ["client_id", "created_at", "id"])
+
+    op.create_table(
+        "client_counters",
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), primary_key=True),
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("value", sa.Integer(), nullable=False, server_default="0"),
+    )
+    for name, table in (("products", "products"), ("categories", "categories"), ("orders", "orders")):
+        op.execute(
+            f"INSERT INTO client_counters (client_id, name, value) "
+            f"SELECT client_id, '{name}', COUNT(*) FROM {table} GROUP BY client_id"
+        )
+
+
+def downgrade():
+    op.drop_table("client_counters")
+    op.drop_index("ix_orders_client_id_created_at_id", table_name="orders")
+    op.create_index("ix_orders_client_id_created_at", "orders", ["client_id", "created_at"])
+    op.drop_index("ix_categories_client_id_id", table_name="categories")
+    op.drop_index("ix_products_client_id_id", table_name="products")
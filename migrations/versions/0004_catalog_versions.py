@@ -0,0 +1,50 @@
+"""catalog versions and tombstones for bot delta sync
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+- clients.catalog_version — монотонная версия каталога клиента;
+- products.version / categories.version — версия последней правки строки;
+- catalog_tombstones — удалённые товары/категории с версией удаления.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ("clients", "products", "categories"):
+        column = "catalog_version" if table == "clients" else "version"
+        op.add_column(table, sa.Column(column, sa.BigInteger(), nullable=False, server_default="0"))
+
+    op.create_index("ix_products_client_id_version", "products", ["client_id", "version"])
+    op.create_index("ix_categories_client_id_version", "categories", ["client_id", "version"])
+
+    op.create_table(
+        "catalog_tombstones",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("object_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("ix_catalog_tombstones_client_id_version", "catalog_tombstones", ["client_id", "version"])
+
+
+def downgrade():
+    op.drop_index("ix_catalog_tombstones_client_id_version", table_name="catalog_tombstones")
+    op.drop_table("catalog_tombstones")
+    op.drop_index("ix_categories_client_id_version", table_name="categories")
+    op.drop_index("ix_products_client_id_version", table_name="products")
+    with op.batch_alter_table("categories") as batch:
+        batch.drop_column("version")
+    with op.batch_alter_table("products") as batch:
+        batch.drop_column("version")
+    with op.batch_alter_table("clients") as batch:
+        batch.drop_column("catalog_version")
@@ -0,0 +1,48 @@
+"""category closure table
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+category_closure — все пары (предок, потомок, глубина) дерева категорий.
+Заполняется рекурсивным CTE по parent_id; при циклах в старых данных берётся
+кратчайший путь, а рекурсия ограничена глубиной.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+MAX_DEPTH = 64
+
+
+def upgrade():
+    op.create_table(
+        "category_closure",
+        sa.Column("ancestor_id", sa.Integer(), sa.ForeignKey("categories.id"), primary_key=True),
+        sa.Column("descendant_id", sa.Integer(), sa.ForeignKey("categories.id"), primary_key=True),
+        sa.Column("depth", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_category_closure_descendant_id", "category_closure", ["descendant_id", "depth"])
+
+    op.execute(f"""
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM categories
+            UNION ALL
+            SELECT tree.ancestor_id, c.id, tree.depth + 1
+            FROM tree JOIN categories c ON c.parent_id = tree.descendant_id
+            WHERE tree.depth < {MAX_DEPTH}
+        )
+        INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, MIN(depth) FROM tree
+        GROUP BY ancestor_id, descendant_id
+    """)
+
+
+def downgrade():
+    op.drop_index("ix_category_closure_descendant_id", table_name="category_closure")
+    op.drop_table("category_closure")
@@ -0,0 +1,89 @@
+"""tenant-scoped stats and hourly/daily rollups
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+- stats.client_id; старые события отдаются клиенту STATS_LEGACY_CLIENT_ID,
+  а если он не задан и клиент в базе один — ему; иначе остаются с NULL
+  (клиента у них не узнать) и в сводки клиентов не попадают;
+- индекс (client_id, timestamp) вместо (event_type, timestamp): сводка больше
+  не читает stats, только выгрузка/листинг по клиенту;
+- stats_hourly / stats_daily — счётчики по (client_id, event_type, bucket)
+  и индекс (client_id, bucket) под выборку диапазона по всем типам;
+  заполняются из уже записанных событий stats с клиентом.
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def _rollup_table(name):
+    op.create_table(
+        name,
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), primary_key=True),
+        sa.Column("event_type", sa.String(), primary_key=True),
+        sa.Column("bucket", sa.DateTime(), primary_key=True),
+        sa.Column("events", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index(f"ix_{name}_client_id_bucket", name, ["client_id", "bucket"])
+
+
+def _bucket(dialect, unit):
+    # Начало часа/суток в том же виде, в каком bucket пишет приложение
+    # (app/stats_buffer.py): в SQLite DateTime — строка с микросекундами
+    if dialect == "sqlite":
+        fmt = "%Y-%m-%d %H:00:00.000000" if unit == "hour" else "%Y-%m-%d 00:00:00.000000"
+        return f"strftime('{fmt}', timestamp)"
+    return f"date_trunc('{unit}', timestamp)"
+
+
+def _assign_legacy_stats(bind):
+    client_id = os.environ.get("STATS_LEGACY_CLIENT_ID")
+    if not client_id:
+        clients = bind.execute(sa.text("SELECT id FROM clients")).scalars().all()
+        if len(clients) != 1:
+            return
+        client_id = clients[0]
+    bind.execute(sa.text("UPDATE stats SET client_id = :client_id WHERE client_id IS NULL"),
+                 {"client_id": int(client_id)})
+
+
+def _backfill_rollups(bind):
+    for name, unit in (("stats_hourly", "hour"), ("stats_daily", "day")):
+        bucket = _bucket(bind.dialect.name, unit)
+        op.execute(f"""
+            INSERT INTO {name} (client_id, event_type, bucket, events)
+            SELECT client_id, event_type, {bucket}, COUNT(*) FROM stats
+            WHERE client_id IS NOT NULL AND timestamp IS NOT NULL
+            GROUP BY client_id, event_type, {bucket}
+        """)
+
+
+def upgrade():
+    with op.batch_alter_table("stats") as batch:
+        batch.add_column(sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id", name="fk_stats_client_id"),
+                                   nullable=True))
+    op.drop_index("ix_stats_event_type_timestamp", table_name="stats")
+    op.create_index("ix_stats_client_id_timestamp", "stats", ["client_id", "timestamp"])
+    _rollup_table("stats_hourly")
+    _rollup_table("stats_daily")
+    bind = op.get_bind()
+    _assign_legacy_stats(bind)
+    _backfill_rollups(bind)
+
+
+def downgrade():
+    op.drop_table("stats_daily")
+    op.drop_table("stats_hourly")
+    op.drop_index("ix_stats_client_id_timestamp", table_name="stats")
+    op.create_index("ix_stats_event_type_timestamp", "stats", ["event_type", "timestamp"])
+    with op.batch_alter_table("stats") as batch:
+        batch.drop_column("client_id")
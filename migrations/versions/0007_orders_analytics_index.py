@@ -0,0 +1,25 @@
+"""covering index for order analytics
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+(client_id, created_at, product_id, status): агрегат /api/orders/analytics за
+период читает только индекс, без строк таблицы orders.
+"""
+from alembic import op
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_orders_client_id_created_at_product_id_status", "orders",
+                    ["client_id", "created_at", "product_id", "status"])
+
+
+def downgrade():
+    op.drop_index("ix_orders_client_id_created_at_product_id_status", table_name="orders")
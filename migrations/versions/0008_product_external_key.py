@@ -0,0 +1,29 @@
+"""product external keys for bulk import
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+products.external_key — ключ товара во внешней системе клиента: повторный импорт
+обновляет товар с тем же ключом, а не создаёт дубль. Уникален в пределах клиента
+(NULL-ы не конфликтуют — товары, созданные вручную, ключа не имеют).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("products", sa.Column("external_key", sa.String(), nullable=True))
+    op.create_index("ix_products_client_id_external_key", "products", ["client_id", "external_key"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_products_client_id_external_key", table_name="products")
+    with op.batch_alter_table("products") as batch:
+        batch.drop_column("external_key")
@@ -0,0 +1,38 @@
+"""ledger of processed payment callbacks
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+processed_callbacks: по строке на (провайдер, транзакция, статус). Уникальный
+индекс делает повторные IPN дешёвыми (ответ по одному индексному поиску) и
+отсекает гонку параллельных дублей: запись в заказ делает только тот, чья
+вставка в журнал прошла.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "processed_callbacks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("provider", sa.String(), nullable=False),
+        sa.Column("txn_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("uq_processed_callbacks_provider_txn_id_status", "processed_callbacks",
+                    ["provider", "txn_id", "status"], unique=True)
+
+
+def downgrade():
+    op.drop_index("uq_processed_callbacks_provider_txn_id_status", table_name="processed_callbacks")
+    op.drop_table("processed_callbacks")
@@ -0,0 +1,42 @@
+"""telegram notification outbox
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+notification_outbox: уведомления покупателям пишутся в той же транзакции, что и
+статус заказа, и отправляются фоновой задачей, а не внутри обработки колбэка.
+Индекс (status, next_attempt_at) — выборка готовых к отправке без скана таблицы.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notification_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        sa.Column("chat_id", sa.BigInteger(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=True),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_notification_outbox_status_next_attempt_at", "notification_outbox",
+                    ["status", "next_attempt_at"])
+
+
+def downgrade():
+    op.drop_index("ix_notification_outbox_status_next_attempt_at", table_name="notification_outbox")
+    op.drop_table("notification_outbox")
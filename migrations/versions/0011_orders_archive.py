@@ -0,0 +1,38 @@
+"""orders expiry and archive
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+
+Индекс orders (status, created_at) — уборка находит просроченные pending и старые
+завершённые заказы пачками по индексу; orders_archive — куда они переносятся.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_orders_status_created_at", "orders", ["status", "created_at"])
+    op.create_table(
+        "orders_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("telegram_chat_id", sa.BigInteger(), nullable=True),
+        sa.Column("client_id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_orders_archive_client_id_created_at", "orders_archive", ["client_id", "created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_orders_archive_client_id_created_at", table_name="orders_archive")
+    op.drop_table("orders_archive")
+    op.drop_index("ix_orders_status_created_at", table_name="orders")
@@ -0,0 +1,40 @@
+"""payment link stored with the order
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+
+orders.provider / amount / payment_url — выставленный счёт. Повторное нажатие
+"Купить" в том же чате находит действующий pending-заказ по индексу
+(client_id, telegram_chat_id, product_id, status) и отдаёт ту же ссылку, не создавая
+новый заказ и транзакцию у провайдера.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("orders", sa.Column("provider", sa.String(), nullable=True))
+    op.add_column("orders", sa.Column("amount", sa.Float(), nullable=True))
+    op.add_column("orders", sa.Column("payment_url", sa.String(), nullable=True))
+    op.create_index("ix_orders_client_id_telegram_chat_id_product_id_status", "orders",
+                    ["client_id", "telegram_chat_id", "product_id", "status"])
+    op.add_column("orders_archive", sa.Column("provider", sa.String(), nullable=True))
+    op.add_column("orders_archive", sa.Column("amount", sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("orders_archive") as batch:
+        batch.drop_column("amount")
+        batch.drop_column("provider")
+    op.drop_index("ix_orders_client_id_telegram_chat_id_product_id_status", table_name="orders")
+    with op.batch_alter_table("orders") as batch:
+        batch.drop_column("payment_url")
+        batch.drop_column("amount")
+        batch.drop_column("provider")
@@ -0,0 +1,24 @@
+"""payment configs listed in id order by index
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17
+
+payments.get_configs читает конфиги клиента ORDER BY id (первый — провайдер по
+умолчанию); индекс (client_id, id) отдаёт их уже в этом порядке.
+"""
+from alembic import op
+
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_payment_config_client_id_id", "payment_config", ["client_id", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_payment_config_client_id_id", table_name="payment_config")
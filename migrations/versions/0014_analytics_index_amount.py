@@ -0,0 +1,29 @@
+"""order analytics index covers the charged amount
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-17
+
+Выручка в /api/orders/analytics считается по orders.amount (цена на момент
+заказа), поэтому amount добавлен в покрывающий индекс аналитики из 0007:
+агрегат по-прежнему читает только индекс.
+"""
+from alembic import op
+
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_orders_client_id_created_at_product_id_status_amount", "orders",
+                    ["client_id", "created_at", "product_id", "status", "amount"])
+    op.drop_index("ix_orders_client_id_created_at_product_id_status", table_name="orders")
+
+
+def downgrade():
+    op.create_index("ix_orders_client_id_created_at_product_id_status", "orders",
+                    ["client_id", "created_at", "product_id", "status"])
+    op.drop_index("ix_orders_client_id_created_at_product_id_status_amount", table_name="orders")
@@ -0,0 +1,104 @@
+# scripts/bench_auth_cache.py (задержка GET /api/products/ с кэшем админов и без него)
+#
+# Запуск:
+#   python scripts/bench_auth_cache.py --requests 2000
+#
+# Поднимает приложение в процессе (httpx + ASGITransport) на временной базе,
+# прогоняет одинаковые запросы листинга товаров с выключенным (TTL=0) и включённым
+# admin_cache и печатает среднее / p50 / p99 на запрос.
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/bench_auth.db"
+
+import httpx
+from alembic import command
+from alembic.config import Config
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed(products: int):
+    from app import models, auth
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    client = models.Client(name="bench", bot_secret="bench")
+    db.add(client)
+    db.commit()
+    db.add(models.AdminUser(username="bench", hashed_password=auth.get_password_hash("bench"), client_id=client.id))
+    category = models.Category(name="bench", client_id=client.id)
+    db.add(category)
+    db.commit()
+    db.add_all([
+        models.Product(title=f"p{i}", file_url="-", price=1, category_id=category.id, client_id=client.id)
+        for i in range(products)
+    ])
+    db.commit()
+    client_id = client.id
+    db.close()
+    return auth.create_access_token({"sub": "bench", "client_id": client_id})
+
+
+async def measure(client: httpx.AsyncClient, headers: dict, requests: int) -> list:
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        resp = await client.get("/api/products/", params={"limit": 20}, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        resp.raise_for_status()
+    return timings
+
+
+def report(name: str, timings: list):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<12} mean {statistics.mean(timings):7.3f} ms  p50 {p50:7.3f} ms  p99 {p99:7.3f} ms")
+    return statistics.mean(timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Эффект admin_cache на GET /api/products/")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=100)
+    args = parser.parse_args()
+
+    migrate()
+    token = seed(args.products)
+
+    from app import auth
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await measure(client, headers, 50)  # прогрев
+
+        auth.admin_cache.ttl = 0            # каждая запись сразу протухает -> всегда запрос в БД
+        auth.admin_cache.clear()
+        uncached = report("no cache", await measure(client, headers, args.requests))
+
+        auth.admin_cache.ttl = auth.ADMIN_CACHE_TTL
+        auth.admin_cache.clear()
+        cached = report("admin_cache", await measure(client, headers, args.requests))
+
+    print(f"saving       {uncached - cached:7.3f} ms/request ({(1 - cached / uncached) * 100:.1f}%)")
+    print(auth.admin_cache.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
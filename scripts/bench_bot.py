@@ -0,0 +1,127 @@
+# scripts/bench_bot.py (обработчики katalog.py под наплывом пользователей при медленном API)
+#
+# Запуск:
+#   python scripts/bench_bot.py --users 300 --latency-ms 200
+#
+# Запускает обработчики бота (start, category_, product_, pay_) для users пользователей
+# одновременно против фейкового API в процессе (httpx.MockTransport с задержкой
+# latency-ms на ответ), кэш бота прогревается в post_init. Telegram не нужен: update
+# и callback_query подменяются объектами с теми же методами. Печатает время до ответа
+# всем, p50/p99 сценария, самую долгую задержку цикла событий (блокирующий вызов
+# сделал бы её равной задержке API), число запросов к API и их пик одновременно.
+import argparse
+import asyncio
+import functools
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("CLIENT_ID", "1")
+os.environ.setdefault("BOT_SECRET", "bench")
+
+import httpx
+
+
+class FakeApi:
+    def __init__(self, latency_ms: float, categories: int, products: int):
+        self.latency = latency_ms / 1000
+        self.snapshot = {
+            "version": 1,
+            "categories": [{"id": i, "name": f"Категория {i}", "parent_id": None} for i in range(1, categories + 1)],
+            "products": [{"id": i, "title": f"Товар {i}", "category_id": 1 + i % categories}
+                         for i in range(1, products + 1)],
+        }
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        self.orders = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        path = request.url.path
+        if path.endswith("/public/catalog/changes/"):
+            return httpx.Response(304, headers={"ETag": '"1"'})
+        if path.endswith("/public/catalog/"):
+            return httpx.Response(200, json=self.snapshot, headers={"ETag": '"1"'})
+        if path.endswith("/payment/create_payment/"):
+            self.orders += 1
+            return httpx.Response(200, json={"order_id": self.orders, "payment_url": f"https://pay/{self.orders}"})
+        if path.endswith("/payment/"):
+            return httpx.Response(200, json=[{"provider_name": "robokassa"}, {"provider_name": "coinpayments"}])
+        return httpx.Response(404)
+
+
+def fake_update(chat_id: int, data: str = None):
+    async def noop(*args, **kwargs):
+        return None
+
+    message = SimpleNamespace(chat_id=chat_id, reply_text=noop)
+    query = SimpleNamespace(data=data, message=message, answer=noop, edit_message_text=noop)
+    return SimpleNamespace(message=message, callback_query=query)
+
+
+async def loop_lag(stop: asyncio.Event, result: list):
+    """Насколько позже запланированного просыпается цикл событий (тик 10 ms)."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        result.append(time.perf_counter() - started - 0.01)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Обработчики бота при медленном API")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=500)
+    args = parser.parse_args()
+
+    import katalog
+
+    api = FakeApi(args.latency_ms, args.categories, args.products)
+    katalog.make_api_client = functools.partial(katalog.make_api_client, transport=httpx.MockTransport(api.handler))
+    await katalog.post_init(None)
+    warmup_calls = api.calls
+
+    async def user(chat_id: int) -> float:
+        started = time.perf_counter()
+        category = 1 + chat_id % args.categories
+        product = category - 1 or args.categories
+        await katalog.start(fake_update(chat_id), None)
+        await katalog.button(fake_update(chat_id, f"category_{category}"), None)
+        await katalog.button(fake_update(chat_id, f"product_{product}"), None)
+        await katalog.button(fake_update(chat_id, f"pay_{product}_robokassa"), None)
+        return time.perf_counter() - started
+
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(loop_lag(stop, lags))
+    started = time.perf_counter()
+    timings = sorted(await asyncio.gather(*(user(i) for i in range(args.users))))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    await katalog.post_shutdown(None)
+
+    print(f"пользователей {args.users}, задержка API {args.latency_ms:.0f} ms, "
+          f"API_CONCURRENCY {katalog.API_CONCURRENCY}")
+    print(f"все ответы за     {elapsed:6.2f} s")
+    print(f"сценарий p50/p99  {statistics.median(timings) * 1000:7.0f} / "
+          f"{timings[int(len(timings) * 0.99) - 1] * 1000:.0f} ms")
+    print(f"задержка цикла    {max(lags) * 1000:7.1f} ms (макс.)")
+    print(f"запросов к API    {api.calls} (прогрев {warmup_calls}), одновременно до {api.peak}, "
+          f"заказов {api.orders}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
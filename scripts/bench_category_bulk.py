@@ -0,0 +1,97 @@
+# scripts/bench_category_bulk.py (время массовых операций над деревом категорий)
+#
+# Запуск:
+#   python scripts/bench_category_bulk.py --sections 20 --subsections 50 --products 50000
+#
+# Поднимает приложение в процессе (httpx + ASGITransport) на временной базе SQLite,
+# заливает каталог через POST /api/products/import (sections x subsections категорий)
+# и замеряет каждую массовую операцию: перенос половины разделов в другой раздел,
+# перенос всех товаров поддерева, удаление поддерева с товарами.
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/bench_categories.db"
+
+import httpx
+from alembic import command
+from alembic.config import Config
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed():
+    from app import auth, models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    client = models.Client(name="bench")
+    db.add(client)
+    db.commit()
+    db.add(models.AdminUser(username="bench", hashed_password=auth.get_password_hash("bench"), client_id=client.id))
+    db.commit()
+    db.close()
+
+
+def make_csv(sections: int, subsections: int, products: int) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["external_key", "title", "file_url", "category"])
+    for i in range(products):
+        writer.writerow([f"sku-{i}", f"Товар {i}", "-", f"Раздел {i % sections}/Подраздел {i % subsections}"])
+    return buf.getvalue().encode()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Массовые операции над деревом категорий")
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--subsections", type=int, default=50)
+    parser.add_argument("--products", type=int, default=50000)
+    args = parser.parse_args()
+
+    migrate()
+    seed()
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        resp = await client.post("/api/auth/login", json={"username": "bench", "password": "bench"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+        resp = await client.post("/api/products/import", headers=headers, files={
+            "file": ("products.csv", make_csv(args.sections, args.subsections, args.products), "text/csv")})
+        print(f"каталог: {resp.json()['created']} товаров, {resp.json()['categories_created']} категорий")
+
+        tree = (await client.get("/api/categories/tree", headers=headers)).json()
+        sections = [node["id"] for node in tree]
+        target, moved, rest = sections[0], sections[1:len(sections) // 2], sections[len(sections) // 2:]
+
+        async def timed(name, method, url, **kwargs):
+            started = time.perf_counter()
+            resp = await client.request(method, url, headers=headers, **kwargs)
+            elapsed = (time.perf_counter() - started) * 1000
+            resp.raise_for_status()
+            print(f"{name:<36} {elapsed:8.1f} ms  {resp.json()}")
+
+        await timed(f"перенос {len(moved)} разделов с поддеревьями", "POST", "/api/categories/bulk/move",
+                    json={"category_ids": moved, "parent_id": target})
+        await timed("перенос товаров поддерева", "POST", "/api/categories/bulk/reassign-products",
+                    json={"category_id": rest[0], "from_category_id": target, "include_subcategories": True})
+        await timed("удаление поддерева с товарами", "DELETE", f"/api/categories/{rest[0]}/subtree")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
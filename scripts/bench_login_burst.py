@@ -0,0 +1,119 @@
+# scripts/bench_login_burst.py (задержка соседних запросов во время волны логинов)
+#
+# Запуск:
+#   python scripts/bench_login_burst.py --logins 20 --probes 200
+#
+# Поднимает приложение в процессе (httpx + ASGITransport) на временной базе и
+# запускает волну одновременных POST /api/auth/login. Параллельно раз в 5 мс шлёт
+# лёгкий запрос (GET /api/public/categories/ — из кэша каталога) и замеряет его
+# задержку. Два прогона: bcrypt прямо в event loop (как было раньше) и через
+# auth.password_pool. Печатает p50/p99 проб и общее время волны логинов.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/bench_login.db"
+
+import httpx
+from alembic import command
+from alembic.config import Config
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed():
+    from app import models, auth
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    client = models.Client(name="bench", bot_secret="bench")
+    db.add(client)
+    db.commit()
+    db.add(models.AdminUser(username="bench", hashed_password=auth.get_password_hash("bench"), client_id=client.id))
+    db.add(models.Category(name="bench", client_id=client.id))
+    db.commit()
+    client_id = client.id
+    db.close()
+    return client_id
+
+
+async def probe_loop(client: httpx.AsyncClient, client_id: int, stop: asyncio.Event) -> list:
+    timings = []
+    params = {"client_id": client_id, "secret": "bench"}
+    while not stop.is_set():
+        started = time.perf_counter()
+        resp = await client.get("/api/public/categories/", params=params)
+        timings.append((time.perf_counter() - started) * 1000)
+        resp.raise_for_status()
+        await asyncio.sleep(0.005)
+    return timings
+
+
+async def burst(client: httpx.AsyncClient, client_id: int, logins: int):
+    stop = asyncio.Event()
+    probes = asyncio.create_task(probe_loop(client, client_id, stop))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post("/api/auth/login", data={"username": "bench", "password": "bench"})
+        for _ in range(logins)
+    ])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    statuses = [r.status_code for r in responses]
+    return await probes, elapsed, statuses
+
+
+def report(name: str, timings: list, elapsed: float, statuses: list):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+    ok = statuses.count(200)
+    print(f"{name:<8} probes {len(timings):4d}  p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  "
+          f"max {timings[-1]:8.2f} ms  logins {ok}/{len(statuses)} ok in {elapsed:.2f} s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Задержка event loop во время волны логинов")
+    parser.add_argument("--logins", type=int, default=20)
+    args = parser.parse_args()
+
+    migrate()
+    client_id = seed()
+
+    from app import auth
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.get("/api/public/categories/", params={"client_id": client_id, "secret": "bench"})
+
+        # Старое поведение: verify в корутине, event loop стоит на каждом bcrypt
+        pooled_verify = auth.verify_and_update_password
+
+        async def inline_verify(plain, hashed):
+            return auth.pwd_context.verify_and_update(plain, hashed)
+
+        auth.verify_and_update_password = inline_verify
+        report("inline", *await burst(client, client_id, args.logins))
+
+        auth.verify_and_update_password = pooled_verify
+        report("pool", *await burst(client, client_id, args.logins))
+
+    print(auth.password_pool.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
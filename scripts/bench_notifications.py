@@ -0,0 +1,131 @@
+# scripts/bench_notifications.py (отправка уведомлений из outbox под лимитами Telegram)
+#
+# Запуск:
+#   python scripts/bench_notifications.py --bots 5 --chats 200 --messages 3000 --latency-ms 80
+#
+# На временной базе SQLite кладёт messages уведомлений в notification_outbox (bots
+# клиентов со своим telegram_token, chats чатов у каждого) и запускает
+# NotificationSender против фейкового Bot API в процессе (httpx.MockTransport).
+# Фейк проверяет лимиты Telegram так же, как настоящий: больше --bot-limit сообщений
+# за секунду на бота или больше одного в секунду в чат — 429 с retry_after.
+# Печатает время до отправки всего outbox, число 429 и наблюдаемый пик на бота.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/bench_notifications.db"
+
+import httpx
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import func, insert, select
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed(bots: int, chats: int, messages: int):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    clients = [models.Client(name=f"bench{i}", telegram_token=f"{i}:TOKEN") for i in range(bots)]
+    db.add_all(clients)
+    db.commit()
+    db.execute(insert(models.NotificationOutbox), [
+        {"client_id": clients[i % bots].id, "chat_id": 1000 + random.randrange(chats), "text": f"Заказ #{i} оплачен",
+         "status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()}
+        for i in range(messages)
+    ])
+    db.commit()
+    db.close()
+
+
+class FakeTelegram:
+    def __init__(self, bot_limit: int, latency_ms: float):
+        self.bot_limit = bot_limit
+        self.latency = latency_ms / 1000
+        self.bot_window = defaultdict(deque)  # токен -> время отправок за последнюю секунду
+        self.chat_last = {}
+        self.peak = Counter()
+        self.responses = Counter()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        token = request.url.path.split("/")[1]
+        chat_id = json.loads(request.content)["chat_id"]
+        now = time.monotonic()
+        window = self.bot_window[token]
+        while window and now - window[0] >= 1:
+            window.popleft()
+        if len(window) >= self.bot_limit or now - self.chat_last.get((token, chat_id), -1) < 1:
+            self.responses[429] += 1
+            return httpx.Response(429, json={"ok": False, "error_code": 429,
+                                             "parameters": {"retry_after": 1}})
+        window.append(now)
+        self.chat_last[token, chat_id] = now
+        self.peak[token] = max(self.peak[token], len(window))
+        self.responses[200] += 1
+        return httpx.Response(200, json={"ok": True})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Отправка outbox уведомлений под лимитами Telegram")
+    parser.add_argument("--bots", type=int, default=5)
+    parser.add_argument("--chats", type=int, default=200, help="чатов у каждого бота")
+    parser.add_argument("--messages", type=int, default=3000)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--bot-limit", type=int, default=30, help="сообщений в секунду на бота у фейка")
+    args = parser.parse_args()
+
+    migrate()
+    seed(args.bots, args.chats, args.messages)
+
+    from app import models, notifications
+    from app.database import AsyncSessionLocal
+    from app.http_client import HttpClient
+
+    telegram = FakeTelegram(args.bot_limit, args.latency_ms)
+    http = HttpClient(retries=0, retry_statuses=(), transport=httpx.MockTransport(telegram.handler))
+    sender = notifications.NotificationSender(http, api_url="http://telegram")
+
+    started = time.perf_counter()
+    sender.start()
+    table = models.NotificationOutbox
+    while True:
+        await asyncio.sleep(0.5)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(table.status, func.count()).group_by(table.status))
+            statuses = dict(result.all())
+        if not statuses.get("pending"):
+            break
+    elapsed = time.perf_counter() - started
+    await sender.stop()
+    await http.aclose()
+
+    print(f"уведомлений {args.messages}, ботов {args.bots}, чатов на бота {args.chats}, "
+          f"задержка API {args.latency_ms:.0f} ms")
+    print(f"outbox отправлен за {elapsed:6.2f} s  ({args.messages / elapsed:.0f} /s, "
+          f"потолок {args.bots * min(args.bot_limit, notifications.NOTIFY_BOT_RATE):.0f} /s)")
+    print(f"статусы         {statuses}")
+    print(f"ответы Telegram {dict(telegram.responses)}")
+    print(f"пик на бота     {max(telegram.peak.values())} /s (лимит {args.bot_limit})")
+    print(f"отправитель     {sender.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
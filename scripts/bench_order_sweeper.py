@@ -0,0 +1,122 @@
+# scripts/bench_order_sweeper.py (уборка брошенных заказов: размер orders и скорость запросов до/после)
+#
+# Запуск:
+#   python scripts/bench_order_sweeper.py --orders 300000 --paid-share 0.1
+#
+# На временной базе SQLite создаёт orders заказов за последние 90 дней, из них
+# оплачено paid-share, остальные брошены в pending. Замеряет аналитику заказов за
+# всё время и первую страницу списка с total, затем один проход OrderSweeper
+# (expired + перенос в orders_archive) и те же запросы ещё раз. Печатает число
+# строк в orders, время прохода и самую долгую пачку — столько держится блокировка записи.
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/bench_orders.db"
+os.environ["ANALYTICS_CACHE_TTL"] = "0"
+
+import httpx
+from alembic import command
+from alembic.config import Config
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed(orders: int, paid_share: float) -> int:
+    from app import auth, counters, models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    client = models.Client(name="bench")
+    db.add(client)
+    db.commit()
+    db.add(models.AdminUser(username="bench", hashed_password=auth.get_password_hash("bench"), client_id=client.id))
+    category = models.Category(name="bench", client_id=client.id)
+    db.add(category)
+    db.commit()
+    products = [models.Product(title=f"Товар {i}", file_url="-", price=10 + i, category_id=category.id,
+                               client_id=client.id) for i in range(50)]
+    db.add_all(products)
+    db.commit()
+    now = datetime.utcnow()
+    for start in range(0, orders, 50000):
+        db.execute(models.Order.__table__.insert(), [
+            {"client_id": client.id, "product_id": random.choice(products).id,
+             "status": "paid" if random.random() < paid_share else "pending",
+             "created_at": now - timedelta(seconds=random.uniform(0, 90 * 86400))}
+            for _ in range(min(50000, orders - start))
+        ])
+    db.execute(models.ClientCounter.__table__.insert().values(client_id=client.id, name=counters.ORDERS,
+                                                              value=orders))
+    db.commit()
+    client_id = client.id
+    db.close()
+    return client_id
+
+
+def count_orders() -> int:
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    total = db.query(models.Order).count()
+    db.close()
+    return total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Уборка брошенных заказов")
+    parser.add_argument("--orders", type=int, default=300000)
+    parser.add_argument("--paid-share", type=float, default=0.1)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    migrate()
+    seed(args.orders, args.paid_share)
+
+    from app.main import app
+    from app.order_sweeper import OrderSweeper
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        resp = await client.post("/api/auth/login", json={"username": "bench", "password": "bench"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        async def measure(title: str):
+            print(f"{title}: в orders {count_orders()} строк")
+            for name, url in (("аналитика за всё время", "/api/orders/analytics"),
+                              ("список, первая страница + total", "/api/orders/?with_total=true")):
+                timings = []
+                for _ in range(5):
+                    started = time.perf_counter()
+                    resp = await client.get(url, headers=headers)
+                    resp.raise_for_status()
+                    timings.append((time.perf_counter() - started) * 1000)
+                print(f"  {name:<34} {min(timings):8.1f} ms")
+
+        await measure("до уборки")
+        sweeper = OrderSweeper(pending_ttl=86400, archive_after=30 * 86400, batch_size=args.batch,
+                               max_batches=10 ** 6)
+        started = time.perf_counter()
+        result = await sweeper.sweep()
+        elapsed = time.perf_counter() - started
+        print(f"уборка: {result}, {elapsed:.2f} s, пачек {sweeper.batches}, "
+              f"самая долгая пачка {sweeper.max_batch_ms:.1f} ms")
+        await measure("после уборки")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+# scripts/bench_product_import.py (загрузка каталога: POST на товар vs POST /api/products/import)
+#
+# Запуск:
+#   python scripts/bench_product_import.py --products 10000 --single 500
+#
+# Поднимает приложение в процессе (httpx + ASGITransport) на временной базе SQLite:
+#   single   — single товаров по одному POST /api/products/ (как раньше), время
+#              пересчитывается на products;
+#   import   — products товаров одним CSV в POST /api/products/import (все создаются);
+#   reimport — тот же файл ещё раз (все товары обновляются по external_key).
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/bench_import.db"
+
+import httpx
+from alembic import command
+from alembic.config import Config
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed():
+    from app import auth, models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    client = models.Client(name="bench")
+    db.add(client)
+    db.commit()
+    db.add(models.AdminUser(username="bench", hashed_password=auth.get_password_hash("bench"), client_id=client.id))
+    category = models.Category(name="single", client_id=client.id)
+    db.add(category)
+    db.commit()
+    category_id = category.id
+    db.close()
+    return category_id
+
+
+def make_csv(products: int) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["external_key", "title", "description", "file_url", "file_size", "price", "category"])
+    for i in range(products):
+        writer.writerow([f"sku-{i}", f"Товар {i}", f"Описание товара {i}", f"https://cdn.example/{i}.pdf",
+                         i % 1000, i % 500 + 0.99, f"Раздел {i % 10}/Подраздел {i % 50}"])
+    return buf.getvalue().encode()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Скорость загрузки каталога товаров")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--single", type=int, default=500)
+    args = parser.parse_args()
+
+    migrate()
+    category_id = seed()
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        resp = await client.post("/api/auth/login", json={"username": "bench", "password": "bench"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        started = time.perf_counter()
+        for i in range(args.single):
+            resp = await client.post("/api/products/", headers=headers, json={
+                "title": f"single {i}", "file_url": "-", "category_id": category_id})
+            resp.raise_for_status()
+        elapsed = time.perf_counter() - started
+        print(f"{'single':<9} {args.single / elapsed:9.0f} products/s  "
+              f"(≈{elapsed / args.single * args.products:6.1f} s на {args.products})")
+
+        body = make_csv(args.products)
+        for name in ("import", "reimport"):
+            started = time.perf_counter()
+            resp = await client.post("/api/products/import", headers=headers,
+                                     files={"file": ("products.csv", body, "text/csv")})
+            elapsed = time.perf_counter() - started
+            resp.raise_for_status()
+            report = resp.json()
+            print(f"{name:<9} {args.products / elapsed:9.0f} products/s  {elapsed:6.2f} s  "
+                  f"created {report['created']}  updated {report['updated']}  failed {report['failed']}  "
+                  f"categories {report['categories_created']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+# scripts/bench_stats_ingest.py (запись событий статистики: коммит на событие vs stats_buffer)
+#
+# Запуск:
+#   python scripts/bench_stats_ingest.py --events 5000 --concurrency 50
+#
+# Поднимает приложение в процессе (httpx + ASGITransport) на временной базе SQLite и
+# отправляет events событий POST /api/stats/ с заданной параллельностью:
+#   commit   — как было раньше: add / commit / refresh на каждое событие;
+#   buffer   — текущий POST /api/stats/ через app/stats_buffer.py.
+# Время buffer считается до момента, когда все события записаны в базу (stop()).
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/bench_stats.db"
+
+import httpx
+from alembic import command
+from alembic.config import Config
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed() -> int:
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    client = models.Client(name="bench", bot_secret="bench")
+    db.add(client)
+    db.commit()
+    client_id = client.id
+    db.close()
+    return client_id
+
+
+async def send(client: httpx.AsyncClient, url: str, events: int, concurrency: int):
+    timings = []
+    errors = []
+    queue = iter(range(events))
+
+    async def worker():
+        for i in queue:
+            started = time.perf_counter()
+            resp = await client.post(url, json={"event_type": "view", "description": f"e{i}"})
+            timings.append((time.perf_counter() - started) * 1000)
+            if resp.is_error:
+                errors.append(resp.status_code)  # у SQLite под нагрузкой — "database is locked"
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return timings, len(errors)
+
+
+def report(name: str, elapsed: float, events: int, timings: list, errors: int):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<8} {(events - errors) / elapsed:9.0f} events/s  request p50 {p50:7.2f} ms  "
+          f"p99 {p99:7.2f} ms  errors {errors}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность записи статистики")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    migrate()
+    client_id = seed()
+    params = f"client_id={client_id}&secret=bench"
+
+    from fastapi import Depends
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app import models
+    from app.database import get_db
+    from app.main import app
+    from app.routes.stats import StatCreate
+    from app.stats_buffer import stats_buffer
+
+    # Старый обработчик, для сравнения
+    @app.post("/bench/stat_commit")
+    async def create_stat_commit(stat: StatCreate, client_id: int, secret: str,
+                                 db: AsyncSession = Depends(get_db)):
+        db_stat = models.Stat(**stat.dict(), client_id=client_id)
+        db.add(db_stat)
+        await db.commit()
+        await db.refresh(db_stat)
+        return {"id": db_stat.id}
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        timings, errors = await send(client, f"/bench/stat_commit?{params}", args.events, args.concurrency)
+        report("commit", time.perf_counter() - started, args.events, timings, errors)
+
+        stats_buffer.start()
+        started = time.perf_counter()
+        timings, errors = await send(client, f"/api/stats/?{params}", args.events, args.concurrency)
+        await stats_buffer.stop()
+        report("buffer", time.perf_counter() - started, args.events, timings, errors)
+
+    print(stats_buffer.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
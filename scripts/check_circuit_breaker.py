@@ -0,0 +1,112 @@
+# scripts/check_circuit_breaker.py (пробный запрос half-open не оставляет breaker открытым навсегда)
+#
+# Запуск:
+#   python scripts/check_circuit_breaker.py
+#
+# HttpClient против фейкового провайдера (httpx.MockTransport): breaker
+# открывается ошибками 503, после reset_timeout пробный запрос обрывается —
+# отменой (клиент отключился) или неожиданным исключением транспорта. После
+# этого следующий запрос к провайдеру должен уйти провайдеру, а не получить 503.
+# Падает (exit 1), если хотя бы одна проверка не прошла.
+import asyncio
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+from fastapi import HTTPException
+
+RESET = 0.05
+
+
+class FakeProvider:
+    def __init__(self):
+        self.mode = "down"
+        self.calls = 0
+        self.started = asyncio.Event()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.started.set()
+        if self.mode == "hang":
+            await asyncio.sleep(3600)
+        if self.mode == "crash":
+            raise RuntimeError("неожиданная ошибка транспорта")
+        return httpx.Response(503 if self.mode == "down" else 200)
+
+
+async def open_breaker(http, provider: FakeProvider):
+    provider.mode = "down"
+    for _ in range(http.breaker_failures):
+        try:
+            await http.get("fake", "http://provider/")
+        except HTTPException:
+            pass
+    assert http.breaker("fake").state == "open", http.breaker("fake").stats()
+    await asyncio.sleep(RESET)
+
+
+async def next_call_goes_through(http, provider: FakeProvider) -> bool:
+    provider.mode = "up"
+    calls = provider.calls
+    try:
+        response = await http.get("fake", "http://provider/")
+    except HTTPException as e:
+        print(f"  следующий запрос: {e.status_code} {e.detail}")
+        return False
+    return response.status_code == 200 and provider.calls == calls + 1 and http.breaker("fake").state == "closed"
+
+
+async def cancelled_probe(http, provider: FakeProvider) -> bool:
+    await open_breaker(http, provider)
+    provider.mode = "hang"
+    provider.started.clear()
+    probe = asyncio.ensure_future(http.get("fake", "http://provider/"))
+    await provider.started.wait()
+    probe.cancel()
+    try:
+        await probe
+    except asyncio.CancelledError:
+        pass
+    return await next_call_goes_through(http, provider)
+
+
+async def crashed_probe(http, provider: FakeProvider) -> bool:
+    await open_breaker(http, provider)
+    provider.mode = "crash"
+    try:
+        await http.get("fake", "http://provider/")
+    except RuntimeError:
+        pass
+    # Неожиданная ошибка пробы — это ошибка провайдера: breaker снова открыт, но не навсегда
+    if http.breaker("fake").state != "open":
+        print(f"  после ошибки пробы: {http.breaker('fake').stats()}")
+        return False
+    await asyncio.sleep(RESET)
+    return await next_call_goes_through(http, provider)
+
+
+async def main():
+    from app.http_client import HttpClient
+
+    logging.getLogger("app.http_client").setLevel(logging.ERROR)  # 503 открытия breaker ожидаемы
+    failed = False
+    for name, check in (("отменённая проба", cancelled_probe), ("проба с исключением", crashed_probe)):
+        provider = FakeProvider()
+        http = HttpClient(retries=0, breaker_failures=3, breaker_reset=RESET,
+                          transport=httpx.MockTransport(provider.handler))
+        ok = await check(http, provider)
+        await http.aclose()
+        print(f"{name:<22} {'ok' if ok else 'FAIL'}")
+        failed = failed or not ok
+
+    if failed:
+        print("Breaker не пропускает запросы после оборванной пробы")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
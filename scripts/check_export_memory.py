@@ -0,0 +1,97 @@
+# scripts/check_export_memory.py (память потоковой выгрузки заказов не растёт с размером таблицы)
+#
+# Запуск:
+#   python scripts/check_export_memory.py --rows 20000 200000
+#
+# На временной базе SQLite наливает заказы, для каждого размера вычитывает тело
+# ответа GET /api/orders/export (тот же запрос, что в роуте) и печатает пик
+# выделенной Python-памяти (tracemalloc). Падает (exit 1), если пик на самом
+# большом размере больше чем вдвое превышает пик на самом маленьком.
+#
+# Тело читается напрямую из StreamingResponse: тестовые HTTP-клиенты в процессе
+# (TestClient, httpx.ASGITransport) сами накапливают ответ целиком.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/export.db"
+
+from alembic import command
+from alembic.config import Config
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed(rows: int) -> int:
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    client = models.Client(name=f"export{rows}")
+    db.add(client)
+    db.commit()
+    category = models.Category(name="c", client_id=client.id)
+    db.add(category)
+    db.commit()
+    product = models.Product(title="p", file_url="-", price=1, category_id=category.id, client_id=client.id)
+    db.add(product)
+    db.commit()
+    started = datetime(2026, 1, 1)
+    for offset in range(0, rows, 10000):
+        db.execute(models.Order.__table__.insert(), [
+            {"client_id": client.id, "product_id": product.id, "status": "paid",
+             "created_at": started + timedelta(seconds=i)}
+            for i in range(offset, min(offset + 10000, rows))
+        ])
+        db.commit()
+    client_id = client.id
+    db.close()
+    return client_id
+
+
+async def measure(client_id: int) -> tuple:
+    from app.auth import AdminPrincipal
+    from app.routes.orders import export_orders
+
+    admin = AdminPrincipal(id=0, username="export", client_id=client_id, telegram_id=None)
+    tracemalloc.start()
+    response = await export_orders(format="csv", start=None, end=None, status=None, current_admin=admin)
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Пик памяти потоковой выгрузки заказов")
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 200000])
+    args = parser.parse_args()
+
+    migrate()
+    peaks = []
+    for rows in sorted(args.rows):
+        size, peak = await measure(seed(rows))
+        peaks.append(peak)
+        print(f"{rows:>9} orders  {size / 1e6:8.1f} MB csv  peak {peak / 1e6:6.2f} MB")
+
+    if peaks[-1] > 2 * peaks[0]:
+        print("Память выгрузки растёт с размером таблицы")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+# scripts/check_late_ipn.py (колбэк об оплате заказа, который уборка уже унесла в orders_archive)
+#
+# Запуск:
+#   python scripts/check_late_ipn.py
+#
+# На временной базе SQLite создаёт expired-заказ старше ORDER_ARCHIVE_AFTER, один
+# проход OrderSweeper переносит его в orders_archive. Затем провайдер (mock, IPN с
+# HMAC-подписью) сообщает об оплате: сначала с неверной подписью — заказ должен
+# остаться в архиве, потом с верной — заказ должен вернуться в orders со статусом
+# paid, а счётчик заказов клиента — снова учитывать его.
+# Падает (exit 1), если хотя бы одна проверка не прошла.
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/check_late_ipn.db"
+os.environ["PAYMENTS_MOCK_ENABLED"] = "1"
+
+import httpx
+from alembic import command
+from alembic.config import Config
+
+SECRET = "ipn-secret"
+
+
+def migrate():
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    command.upgrade(cfg, "head")
+
+
+def seed() -> tuple:
+    from app import counters, models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    client = models.Client(name="late-ipn")
+    db.add(client)
+    db.commit()
+    category = models.Category(name="late-ipn", client_id=client.id)
+    db.add(category)
+    db.commit()
+    product = models.Product(title="Товар", file_url="-", price=10, category_id=category.id, client_id=client.id)
+    db.add(product)
+    db.add(models.PaymentConfig(provider_name="mock", api_key="merchant", client_id=client.id,
+                                extra_config=json.dumps({"secret": SECRET})))
+    db.commit()
+    order = models.Order(client_id=client.id, product_id=product.id, status="expired", provider="mock",
+                         amount=10, created_at=datetime.utcnow() - timedelta(days=40))
+    db.add(order)
+    db.execute(models.ClientCounter.__table__.insert().values(client_id=client.id, name=counters.ORDERS, value=1))
+    db.commit()
+    ids = client.id, order.id
+    db.close()
+    return ids
+
+
+def where_is(order_id: int) -> tuple:
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    order = db.get(models.Order, order_id)
+    archived = db.get(models.OrderArchive, order_id)
+    db.close()
+    return (order.status if order else None), (archived.status if archived else None)
+
+
+def orders_counter(client_id: int) -> int:
+    from app import counters, models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    value = db.query(models.ClientCounter.value).filter_by(client_id=client_id, name=counters.ORDERS).scalar()
+    db.close()
+    return value
+
+
+async def main():
+    migrate()
+    client_id, order_id = seed()
+
+    from app.main import app
+    from app.order_sweeper import OrderSweeper
+    from app.payments.mock import sign
+
+    failed = False
+
+    def check(title: str, ok: bool, detail=""):
+        nonlocal failed
+        print(f"{title:<48} {'ok' if ok else 'FAIL'} {detail}")
+        failed = failed or not ok
+
+    result = await OrderSweeper(archive_after=30 * 86400).sweep()
+    check("уборка унесла заказ в архив", where_is(order_id) == (None, "expired"), result)
+
+    form = {"order_id": str(order_id), "status": "paid", "txn_id": "late-1"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+        resp = await client.post("/api/payment/callback/mock/", data=form, headers={"X-Signature": "bad"})
+        check("неверная подпись: 400, заказ в архиве",
+              resp.status_code == 400 and where_is(order_id) == (None, "expired"), resp.status_code)
+
+        resp = await client.post("/api/payment/callback/mock/", data=form,
+                                 headers={"X-Signature": sign(SECRET, form.items())})
+        check("поздний IPN: заказ оплачен и вернулся в orders",
+              resp.status_code == 200 and where_is(order_id) == ("paid", None), (resp.status_code, resp.json()))
+
+        resp = await client.post("/api/payment/callback/mock/", data=form,
+                                 headers={"X-Signature": sign(SECRET, form.items())})
+        check("повтор IPN: тот же ответ", resp.status_code == 200, resp.status_code)
+
+    check("счётчик заказов клиента", orders_counter(client_id) == 1, orders_counter(client_id))
+
+    if failed:
+        print("Поздний колбэк провайдера теряет оплату заархивированного заказа")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
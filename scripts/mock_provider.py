@@ -0,0 +1,181 @@
+# scripts/mock_provider.py (локальный заменитель платёжных провайдеров для нагрузочных прогонов)
+#
+# Запуск отдельно (по умолчанию колбэки идут на http://127.0.0.1:8000):
+#   python scripts/mock_provider.py --port 8900 --callback-url http://127.0.0.1:8000 \
+#       --latency-ms 50 --jitter-ms 20 --fail-rate 0.05 --decline-rate 0.1
+# и в окружении API:
+#   PAYMENTS_MOCK_ENABLED=1 MOCK_PROVIDER_URL=http://127.0.0.1:8900
+#   COINPAYMENTS_API_URL=http://127.0.0.1:8900/api.php
+#   ROBOKASSA_PAYMENT_URL=http://127.0.0.1:8900/Merchant/Index.aspx
+#
+# Эмулирует:
+#   POST /mock/create            — API провайдера "mock" (app/payments/mock.py);
+#   POST /api.php                — create_transaction CoinPayments;
+#   GET  /Merchant/Index.aspx    — страница оплаты Robokassa (переход = покупатель оплатил).
+# После создания платежа (через --ipn-delay-ms) шлёт подписанный колбэк в API, как
+# настоящий провайдер: до 3 попыток при ошибке. --fail-rate — доля запросов к API,
+# на которые мок отвечает 503; --decline-rate — доля платежей, которые приходят отказом;
+# --ipn-duplicates — каждый колбэк уходит столько раз одновременно (шторм повторов).
+# GET /stats — счётчики и задержки колбэков.
+import argparse
+import asyncio
+import hashlib
+import hmac
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+
+def sha256_sign(secret: str, items) -> str:
+    encoded_str = "&".join(f"{k}={v}" for k, v in sorted(items))
+    return hmac.new(secret.encode("utf-8"), encoded_str.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def sha512_sign(secret: str, items) -> str:
+    encoded_str = "&".join(f"{k}={v}" for k, v in sorted(items))
+    return hmac.new(secret.encode("utf-8"), encoded_str.encode("utf-8"), hashlib.sha512).hexdigest()
+
+
+def make_app(args) -> FastAPI:
+    state = {"client": None, "tasks": set()}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        if state["client"] is not None:
+            await state["client"].aclose()
+
+    app = FastAPI(title="Mock payment provider", lifespan=lifespan)
+    stats = Counter()
+    callback_ms = []
+
+    async def delay():
+        if args.latency_ms or args.jitter_ms:
+            await asyncio.sleep(max(0.0, random.gauss(args.latency_ms, args.jitter_ms)) / 1000)
+
+    def failed() -> bool:
+        return random.random() < args.fail_rate
+
+    def declined() -> bool:
+        return random.random() < args.decline_rate
+
+    async def deliver(path: str, form: dict, headers: dict):
+        # Провайдер шлёт колбэк асинхронно, после ответа на создание платежа
+        if state["client"] is None:
+            state["client"] = httpx.AsyncClient(timeout=30)
+        await asyncio.sleep(args.ipn_delay_ms / 1000)
+        for attempt in range(3):
+            started = time.perf_counter()
+            try:
+                resp = await state["client"].post(f"{args.callback_url}{path}", data=form, headers=headers)
+                status = resp.status_code
+            except httpx.HTTPError:
+                status = "error"
+            callback_ms.append((time.perf_counter() - started) * 1000)
+            stats[f"callback_{status}"] += 1
+            if status == 200:
+                stats["ipn_delivered"] += 1
+                return
+            await asyncio.sleep(0.5 * (attempt + 1))
+        stats["ipn_failed"] += 1
+
+    def schedule(path: str, form: dict, headers: dict):
+        # --ipn-duplicates: тот же колбэк несколько раз одновременно, как при ретраях провайдера
+        for _ in range(args.ipn_duplicates):
+            stats["ipn_scheduled"] += 1
+            task = asyncio.create_task(deliver(path, form, headers))
+            state["tasks"].add(task)
+            task.add_done_callback(state["tasks"].discard)
+
+    @app.post("/mock/create")
+    async def mock_create(request: Request):
+        form = await request.form()
+        await delay()
+        stats["mock_create"] += 1
+        if failed():
+            stats["api_503"] += 1
+            return Response(status_code=503)
+        txn_id = uuid.uuid4().hex
+        ipn = {"order_id": form["order_id"], "txn_id": txn_id, "amount": form["amount"],
+               "status": "failed" if declined() else "paid"}
+        schedule("/api/payment/callback/mock/", ipn, {"X-Signature": sha256_sign(args.secret, ipn.items())})
+        return {"txn_id": txn_id, "checkout_url": f"http://mock/pay/{txn_id}"}
+
+    @app.post("/api.php")
+    async def coinpayments_api(request: Request):
+        form = await request.form()
+        await delay()
+        stats["coinpayments_create"] += 1
+        if failed():
+            stats["api_503"] += 1
+            return Response(status_code=503)
+        txn_id = f"CP{uuid.uuid4().hex[:16].upper()}"
+        ipn = {"ipn_mode": "hmac", "merchant": "mock", "txn_id": txn_id, "custom": form["custom"],
+               "amount1": form["amount"], "status": "-1" if declined() else "100",
+               "ipn_secret": args.ipn_secret}
+        schedule("/api/payment/coinpayments_callback/", ipn, {"HMAC": sha512_sign(args.private_key, ipn.items())})
+        return {"error": "ok", "result": {"txn_id": txn_id,
+                                          "checkout_url": f"http://mock/checkout?id={txn_id}"}}
+
+    @app.get("/Merchant/Index.aspx")
+    async def robokassa_pay(InvId: str, OutSum: str):
+        await delay()
+        stats["robokassa_pay"] += 1
+        if failed():
+            stats["api_503"] += 1
+            return Response(status_code=503)
+        if not declined():  # при отказе Robokassa ResultURL не вызывает
+            signature = hashlib.md5(f"{OutSum}:{InvId}:{args.password2}".encode()).hexdigest()
+            schedule("/api/payment/robokassa_callback/",
+                     {"InvId": InvId, "OutSum": OutSum, "SignatureValue": signature}, {})
+        return Response("OK")
+
+    @app.get("/stats")
+    async def get_stats():
+        timings = sorted(callback_ms)
+        return JSONResponse({
+            **stats,
+            "ipn_in_flight": len(state["tasks"]),
+            "callback_p50_ms": round(timings[len(timings) // 2], 2) if timings else None,
+            "callback_p99_ms": round(timings[max(0, int(len(timings) * 0.99) - 1)], 2) if timings else None,
+        })
+
+    app.state.stats = stats
+    app.state.tasks = state["tasks"]
+    return app
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Мок платёжных провайдеров")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--callback-url", default="http://127.0.0.1:8000", help="адрес API для колбэков")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0, help="доля ответов 503 от API провайдера")
+    parser.add_argument("--decline-rate", type=float, default=0, help="доля отказов в оплате")
+    parser.add_argument("--ipn-delay-ms", type=float, default=0)
+    parser.add_argument("--ipn-duplicates", type=int, default=1, help="сколько раз слать каждый колбэк")
+    parser.add_argument("--secret", default="mock-secret", help="ключ подписи IPN провайдера mock")
+    parser.add_argument("--private-key", default="mock-private", help="private_key CoinPayments")
+    parser.add_argument("--ipn-secret", default="mock-ipn", help="ipn_secret CoinPayments")
+    parser.add_argument("--password2", default="mock-password2", help="password2 Robokassa")
+    return parser
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parser().parse_args()
+    uvicorn.run(make_app(args), host=args.host, port=args.port, log_level="warning")